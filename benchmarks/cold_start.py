@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: time to first served video from a snapshot vs a full fetch
+
+Serves a synthetic manifest from a local HTTP server, then measures a fresh
+VideoManager answering its first get_next_video() either after a blocking
+fetch_videos() or straight from an on-disk catalog snapshot.
+
+    python -m benchmarks.cold_start --videos 100000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from aiohttp import web
+
+from benchmarks.memory_layout import make_urls
+from redis_storage import RedisStorage
+from video_manager import VideoManager
+
+
+def make_manager(url: str, snapshot_dir: str) -> VideoManager:
+    return VideoManager(url, redis_storage=RedisStorage.disabled(), snapshot_dir=snapshot_dir)
+
+
+async def serve(body: bytes):
+    async def handler(request):
+        return web.Response(body=body, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/videos.json", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/videos.json"
+
+
+async def time_first_video(url: str, snapshot_dir: str, from_snapshot: bool) -> float:
+    manager = make_manager(url, snapshot_dir)
+    start = time.perf_counter()
+    if not (from_snapshot and manager.load_snapshot()):
+        await manager.fetch_videos()
+    await manager.get_next_video(1)
+    elapsed = time.perf_counter() - start
+    await manager.close()
+    return elapsed
+
+
+async def run(videos: int, repeat: int) -> dict:
+    body = json.dumps(make_urls(videos)).encode()
+    runner, url = await serve(body)
+    try:
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            # Prime the snapshot with one fetch
+            manager = make_manager(url, snapshot_dir)
+            await manager.fetch_videos()
+            await manager.close()
+
+            results = {"videos": videos, "manifest_bytes": len(body), "repeat": repeat}
+            for name, from_snapshot in (("fetch", False), ("snapshot", True)):
+                timings = [await time_first_video(url, snapshot_dir, from_snapshot) for _ in range(repeat)]
+                results[f"{name}_ms"] = min(timings) * 1000
+            return results
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.videos, args.repeat))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"📊 {args.videos} videos ({results['manifest_bytes'] / 2**20:.1f} MB manifest), best of {args.repeat}")
+    print(f"fetch:    {results['fetch_ms']:>8.1f} ms to first video")
+    print(f"snapshot: {results['snapshot_ms']:>8.1f} ms to first video")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+End-to-end load harness: drives the real bot handlers with synthetic interactions
+
+Simulated users open a card with /randomvideo, then keep clicking Next (or
+switching source, for --switch-mix of their clicks) at --click-rate clicks
+per second each, with Poisson arrivals. Everything below the Discord API is
+real: the handlers in bot.py, the per-user action queue, VideoManager, a
+local HTTP catalog server and Redis (--redis-url, or fakeredis). Discord
+itself is replaced by stand-ins that answer after --discord-latency-ms.
+
+Reports p50/p95/p99 handler latency per action, event-loop lag, and process
+memory sampled over the run.
+
+    python -m benchmarks.load --users 500 --click-rate 0.5 --duration 30 --switch-mix 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+
+import discord
+from aiohttp import web
+
+from benchmarks.memory_layout import make_urls
+from redis_storage import RedisStorage
+from user_actions import UserActionQueue
+from video_manager import VideoManager
+from video_sources import VideoSource
+
+# bot.py builds the bot from config at import time
+os.environ.setdefault("DISCORD_BOT_TOKEN", "load-test")
+import bot as bot_module  # noqa: E402
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeMessage:
+    """A posted card; edits take one simulated Discord round trip"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.edits += 1
+
+
+class FakeFollowup:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+
+
+class FakeResponse:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def defer(self):
+        await asyncio.sleep(self.latency)
+
+
+class FakeInteraction(discord.Interaction):
+    """Stand-in for a discord.Interaction: passes isinstance() checks, no gateway behind it"""
+
+    response = None
+    followup = None
+    message = None
+
+    def __init__(self, user_id: int, message: FakeMessage, latency: float):
+        self.user = FakeUser(user_id)
+        self.message = message
+        self.response = FakeResponse(latency)
+        self.followup = FakeFollowup(latency)
+
+
+class Recorder:
+    """Latency samples per action plus loop lag and memory over time"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.loop_lag: List[float] = []
+        self.memory: List[dict] = []
+
+    def record(self, action: str, seconds: float):
+        self.latencies.setdefault(action, []).append(seconds)
+
+    def error(self, action: str):
+        self.errors[action] = self.errors.get(action, 0) + 1
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def rss_mb() -> float:
+    """Current resident memory (falls back to peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+async def monitor_loop_lag(recorder: Recorder, interval: float = 0.05):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        recorder.loop_lag.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def sample_memory(recorder: Recorder, manager: VideoManager, started: float, interval: float = 1.0):
+    while True:
+        recorder.memory.append({
+            "t": round(time.perf_counter() - started, 1),
+            "rss_mb": round(rss_mb(), 1),
+            "users_in_memory": len(manager.user_queues)
+        })
+        await asyncio.sleep(interval)
+
+
+async def serve_catalogs(sources: Dict[str, List[str]]):
+    app = web.Application()
+    for name, urls in sources.items():
+        body = json.dumps(urls).encode()
+
+        async def handler(request, body=body):
+            return web.Response(body=body, content_type="application/json")
+
+        app.router.add_get(f"/{name}.json", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, {name: f"http://127.0.0.1:{port}/{name}.json" for name in sources}
+
+
+async def timed(recorder: Recorder, action: str, call):
+    start = time.perf_counter()
+    try:
+        await call
+    except Exception:
+        recorder.error(action)
+    recorder.record(action, time.perf_counter() - start)
+
+
+async def simulate_user(user_id: int, args, sources: List[VideoSource], deadline: float, recorder: Recorder):
+    latency = args.discord_latency_ms / 1000
+    message = FakeMessage(latency)
+    await timed(recorder, "randomvideo", bot_module.send_random_video(FakeInteraction(user_id, message, latency)))
+
+    pending = set()
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        # Never sleep past the deadline: the run's elapsed time feeds clicks_per_sec
+        await asyncio.sleep(min(random.expovariate(args.click_rate), remaining))
+        if time.perf_counter() >= deadline:
+            break
+        interaction = FakeInteraction(user_id, message, latency)
+        source = bot_module.bot.video_manager.source_configs[bot_module.bot.video_manager.source_for(user_id)]
+        if random.random() < args.switch_mix:
+            target = random.choice(sources)
+            button = bot_module.SelectSourceButton(user_id, target.name, target.label, target.emoji)
+            call = timed(recorder, "switch", button.callback(interaction))
+        else:
+            call = timed(recorder, "next", bot_module.NextButton(user_id, source.name).callback(interaction))
+        # Clicks do not wait for the previous one, as on Discord
+        task = asyncio.create_task(call)
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+
+
+def make_storage(redis_url: Optional[str]) -> RedisStorage:
+    if redis_url:
+        from redis import asyncio as aioredis
+        return RedisStorage(client=aioredis.Redis.from_url(redis_url, decode_responses=False))
+    try:
+        import fakeredis
+    except ImportError:
+        return RedisStorage.disabled()
+    return RedisStorage(client=fakeredis.FakeAsyncRedis(decode_responses=False))
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    runner, urls = await serve_catalogs({"default": make_urls(args.videos), "streamable": make_urls(args.videos // 2)})
+    sources = [VideoSource("default", urls["default"], label="默认源", emoji="📹"),
+               VideoSource("streamable", urls["streamable"], label="Streamable源", emoji="💻")]
+
+    storage = make_storage(args.redis_url)
+    manager = VideoManager(urls["default"], redis_storage=storage, sources=sources,
+                           flush_interval=args.flush_interval)
+    await manager.connect()
+    await manager.fetch_all()
+    bot = bot_module.bot
+    bot.video_manager = manager
+    bot.actions = UserActionQueue(debounce=args.debounce_ms / 1000, max_concurrent=1)
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    background = [asyncio.create_task(monitor_loop_lag(recorder)),
+                  asyncio.create_task(sample_memory(recorder, manager, started))]
+    deadline = started + args.duration
+    try:
+        # Users arrive spread over the first tenth of the run
+        async def arrive(user_id):
+            await asyncio.sleep(random.uniform(0, args.duration / 10))
+            await simulate_user(user_id, args, sources, deadline, recorder)
+
+        await asyncio.gather(*(arrive(user_id) for user_id in range(args.users)))
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        action_stats = bot.actions.get_stats()
+        await bot.actions.close()
+        await manager.close()
+        await runner.cleanup()
+
+    handlers = {}
+    for action, samples in recorder.latencies.items():
+        handlers[action] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(action, 0),
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "max_ms": max(samples) * 1000
+        }
+    return {
+        "params": {key: value for key, value in vars(args).items() if key != "json"},
+        "elapsed_s": elapsed,
+        "clicks_per_sec": sum(len(samples) for samples in recorder.latencies.values()) / elapsed,
+        "handlers": handlers,
+        "coalesced_clicks": action_stats["coalesced"],
+        "loop_lag": {
+            "p50_ms": percentile(recorder.loop_lag, 0.50) * 1000,
+            "p99_ms": percentile(recorder.loop_lag, 0.99) * 1000,
+            "max_ms": max(recorder.loop_lag, default=0.0) * 1000
+        },
+        "memory": recorder.memory
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--click-rate", type=float, default=0.5, help="Clicks per second per user")
+    parser.add_argument("--switch-mix", type=float, default=0.05, help="Fraction of clicks that switch source")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds")
+    parser.add_argument("--videos", type=int, default=10_000)
+    parser.add_argument("--discord-latency-ms", type=float, default=50, help="Simulated Discord API round trip")
+    parser.add_argument("--debounce-ms", type=float, default=250, help="Next-click coalescing window")
+    parser.add_argument("--flush-interval", type=float, default=2, help="Write-behind interval (0 = write-through)")
+    parser.add_argument("--redis-url", help="Real local Redis (default: fakeredis)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"📊 {args.users} users x {args.click_rate:g} clicks/s for {results['elapsed_s']:.0f}s "
+          f"({results['clicks_per_sec']:.0f} actions/s, {results['coalesced_clicks']} clicks coalesced)")
+    print(f"{'action':<12} {'count':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for action, r in results["handlers"].items():
+        print(f"{action:<12} {r['count']:>8} {r['errors']:>7} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    lag = results["loop_lag"]
+    print(f"event loop lag: p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, max {lag['max_ms']:.2f} ms")
+    memory = results["memory"]
+    if memory:
+        print(f"memory: {memory[0]['rss_mb']:.1f} MB -> {memory[-1]['rss_mb']:.1f} MB RSS, "
+              f"{memory[-1]['users_in_memory']} users in memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: URL-list user queues vs interned integer-ID queues
+
+Measures per-user memory of each queue layout on a sample of users with
+tracemalloc and extrapolates to the full user count, together with the
+Redis payload size of each layout. Defaults model 10k videos x 50k users.
+
+    python -m benchmarks.memory_layout --videos 10000 --users 50000
+"""
+import argparse
+import json
+import random
+import tracemalloc
+
+from catalog import Catalog
+from video_manager import PermutationQueue, UserQueue
+
+
+def make_urls(count: int) -> list:
+    """Synthetic catalog with realistic URL lengths"""
+    return [f"https://videos.vistru.cn/videos/{i:06d}_%E8%A7%86%E9%A2%91_clip_{random.getrandbits(32):08x}.mp4"
+            for i in range(count)]
+
+
+def measure(build, sample_users: int) -> int:
+    """Bytes allocated per user by build()"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queues = [build() for _ in range(sample_users)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del queues
+    return (after - before) // sample_users
+
+
+def legacy_queue(urls: list) -> list:
+    """Old layout: every user holds a shuffled copy of the URL list"""
+    queue = urls.copy()
+    random.shuffle(queue)
+    return queue
+
+
+def run(videos: int, users: int, sample_users: int) -> dict:
+    urls = make_urls(videos)
+    catalog = Catalog(urls)
+
+    results = {"videos": videos, "users": users, "sample_users": sample_users, "layouts": {}}
+    layouts = {
+        "url_list": (lambda: legacy_queue(urls),
+                     lambda q: len(json.dumps({"queue": q, "current_index": 0}))),
+        "id_array": (lambda: UserQueue(catalog),
+                     lambda q: len(q.to_dict()["ids"]) + len(json.dumps({}))),
+        "permutation": (lambda: PermutationQueue(catalog),
+                        lambda q: len(json.dumps({k: v for k, v in q.to_dict().items() if k != "current_index"}))),
+    }
+
+    for name, (build, payload) in layouts.items():
+        per_user = measure(build, sample_users)
+        payload_bytes = payload(build())
+        results["layouts"][name] = {
+            "bytes_per_user": per_user,
+            "projected_process_mb": per_user * users / 2**20,
+            "redis_payload_bytes_per_user": payload_bytes,
+            "projected_redis_mb": payload_bytes * users / 2**20,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--videos", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--sample-users", type=int, default=200,
+                        help="Users actually allocated; results are extrapolated to --users")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.videos, args.users, args.sample_users)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"📊 {args.videos} videos x {args.users} users (sampled {args.sample_users})")
+    print(f"{'layout':<12} {'B/user':>10} {'process MB':>12} {'redis B/user':>14} {'redis MB':>10}")
+    for name, r in results["layouts"].items():
+        print(f"{name:<12} {r['bytes_per_user']:>10} {r['projected_process_mb']:>12.1f} "
+              f"{r['redis_payload_bytes_per_user']:>14} {r['projected_redis_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for queue construction, next-video throughput, catalog merges and persistence
+
+Every case is timed best-of-N at a given catalog size and user count.
+Results are written as JSON so runs can be compared to catch regressions:
+
+    python -m benchmarks.micro --videos 10000 --users 1000 -o before.json
+    python -m benchmarks.micro --videos 10000 --users 1000 -o after.json --compare before.json
+
+Persistence cases run against --redis-url, or an in-process fakeredis when
+it is installed (otherwise they are skipped).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.memory_layout import make_urls
+from catalog import Catalog
+from redis_storage import RedisStorage
+from video_manager import PermutationQueue, UserQueue, VideoManager
+
+SOURCE_URL = "https://videos.vistru.cn/videos.json"
+
+# (added, removed) as fractions of the catalog
+MERGE_RATIOS = ((0.01, 0.0), (0.0, 0.01), (0.1, 0.1), (0.5, 0.0), (0.0, 0.5))
+
+
+def summarize(timings: List[float], ops: int) -> dict:
+    """Best-of-N timing of a case that performed ops operations per run"""
+    best = min(timings)
+    return {
+        "ops": ops,
+        "best_ms": best * 1000,
+        "median_ms": sorted(timings)[len(timings) // 2] * 1000,
+        "us_per_op": best / ops * 1e6 if ops else 0.0,
+        "ops_per_sec": ops / best if best else 0.0
+    }
+
+
+def time_sync(func: Callable[[], int], repeat: int) -> dict:
+    timings = []
+    ops = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings, ops)
+
+
+async def time_async(setup: Callable[[], Awaitable], func: Callable[[object], Awaitable[int]], repeat: int) -> dict:
+    """Time func(state) on a fresh setup() per run; setup is not timed"""
+    timings = []
+    ops = 0
+    for _ in range(repeat):
+        state = await setup()
+        start = time.perf_counter()
+        ops = await func(state)
+        timings.append(time.perf_counter() - start)
+        await getattr(state, "close", _noop)()
+    return summarize(timings, ops)
+
+
+async def _noop():
+    pass
+
+
+def memory_manager(urls: List[str], queue_mode: str = "shuffle") -> VideoManager:
+    manager = VideoManager(SOURCE_URL, redis_storage=RedisStorage.disabled(), queue_mode=queue_mode)
+    manager.all_videos = urls
+    return manager
+
+
+def bench_queue_construction(urls: List[str], users: int, repeat: int) -> dict:
+    catalog = Catalog(urls)
+    return {
+        "shuffle": time_sync(lambda: len([UserQueue(catalog) for _ in range(users)]), repeat),
+        "permutation": time_sync(lambda: len([PermutationQueue(catalog) for _ in range(users)]), repeat)
+    }
+
+
+async def bench_next_video(urls: List[str], users: int, clicks: int, repeat: int) -> dict:
+    results = {}
+    for mode in ("shuffle", "permutation"):
+        async def setup():
+            manager = memory_manager(urls, mode)
+            for user_id in range(users):  # Queues exist: measure steady-state clicks
+                await manager.get_next_video(user_id)
+            return manager
+
+        async def clicks_run(manager):
+            for _ in range(clicks):
+                for user_id in range(users):
+                    await manager.get_next_video(user_id)
+            return clicks * users
+
+        results[mode] = await time_async(setup, clicks_run, repeat)
+    return results
+
+
+def changed_catalog(urls: List[str], added: float, removed: float) -> List[str]:
+    keep = urls[int(len(urls) * removed):]
+    return keep + make_urls(int(len(urls) * added))
+
+
+async def bench_merge(urls: List[str], users: int, repeat: int) -> dict:
+    """_merge_new_videos itself plus the lazy catch-up it defers to each queue's next use"""
+    results = {}
+    for added, removed in MERGE_RATIOS:
+        new_urls = changed_catalog(urls, added, removed)
+
+        async def setup():
+            manager = memory_manager(urls)
+            for user_id in range(users):
+                await manager.get_next_video(user_id)
+            return manager
+
+        merge_timings, catch_up_timings = [], []
+        for _ in range(repeat):
+            manager = await setup()
+            start = time.perf_counter()
+            await manager._merge_new_videos(new_urls)
+            merge_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for user_id in range(users):
+                await manager.get_next_video(user_id)
+            catch_up_timings.append(time.perf_counter() - start)
+            await manager.close()
+
+        results[f"add{added:g}_remove{removed:g}"] = {
+            "merge": summarize(merge_timings, 1),
+            "first_click_after_merge": summarize(catch_up_timings, users)
+        }
+    return results
+
+
+async def bench_persistence(urls: List[str], users: int, repeat: int, client_factory) -> dict:
+    catalog = Catalog(urls)
+    queues = {mode: queue_cls(catalog).to_dict()
+              for mode, queue_cls in (("shuffle", UserQueue), ("permutation", PermutationQueue))}
+
+    async def setup():
+        storage = RedisStorage(client=client_factory())
+        await storage.connect()
+        await storage.redis_client.flushdb()
+        return storage
+
+    results = {}
+    for mode, queue in queues.items():
+        async def save_each(storage):
+            for user_id in range(users):
+                await storage.save_user_queue(user_id, queue, SOURCE_URL)
+            return users
+
+        async def save_batched(storage):
+            await storage.save_user_queues([(user_id, SOURCE_URL, queue) for user_id in range(users)])
+            return users
+
+        async def round_trip(storage):
+            for user_id in range(users):
+                await storage.save_user_queue(user_id, queue, SOURCE_URL)
+                await storage.load_user_queue(user_id, SOURCE_URL)
+            return users
+
+        async def advance(storage):
+            for user_id in range(users):
+                await storage.advance_user_cursor(user_id, SOURCE_URL)
+            return users
+
+        results[mode] = {
+            "save": await time_async(setup, save_each, repeat),
+            "save_batched": await time_async(setup, save_batched, repeat),
+            "save_load_round_trip": await time_async(setup, round_trip, repeat),
+            "advance_cursor": await time_async(setup, advance, repeat)
+        }
+    return results
+
+
+def redis_client_factory(redis_url: Optional[str]):
+    """Factory for fresh Redis clients, or None when no Redis is available"""
+    if redis_url:
+        from redis import asyncio as aioredis
+        return lambda: aioredis.Redis.from_url(redis_url, decode_responses=False)
+    try:
+        import fakeredis
+    except ImportError:
+        return None
+    server = fakeredis.FakeServer()
+    return lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=False)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(videos: int, users: int, clicks: int, repeat: int, redis_url: Optional[str],
+              only: Optional[List[str]] = None) -> dict:
+    random.seed(0)
+    urls = make_urls(videos)
+    client_factory = redis_client_factory(redis_url)
+    selected = set(only or ("construction", "next_video", "merge", "persistence"))
+
+    results: Dict[str, dict] = {}
+    if "construction" in selected:
+        results["queue_construction"] = bench_queue_construction(urls, users, repeat)
+    if "next_video" in selected:
+        results["get_next_video"] = await bench_next_video(urls, users, clicks, repeat)
+    if "merge" in selected:
+        results["merge_new_videos"] = await bench_merge(urls, users, repeat)
+    if "persistence" in selected and client_factory is not None:
+        results["persistence"] = await bench_persistence(urls, users, repeat, client_factory)
+
+    return {
+        "meta": {
+            "videos": videos,
+            "users": users,
+            "clicks": clicks,
+            "repeat": repeat,
+            "redis": "url" if redis_url else ("fakeredis" if client_factory else None),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "revision": git_revision(),
+            "timestamp": time.time()
+        },
+        "results": results
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    """{"case.variant.metric": value} for every us_per_op entry"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if "us_per_op" in value:
+                flat[prefix + key] = value["us_per_op"]
+            else:
+                flat.update(flatten(value, f"{prefix}{key}."))
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Cases whose per-op time grew by more than tolerance (e.g. 0.2 = 20%) over the baseline"""
+    regressions = []
+    before = flatten(baseline["results"])
+    for name, now in flatten(current["results"]).items():
+        then = before.get(name)
+        if then and now > then * (1 + tolerance):
+            regressions.append(f"{name}: {then:.2f} -> {now:.2f} us/op ({now / then - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--videos", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--clicks", type=int, default=5, help="Next clicks per user in the throughput case")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs")
+    parser.add_argument("--redis-url", help="Real Redis for persistence cases (default: fakeredis)")
+    parser.add_argument("--only", nargs="+", choices=["construction", "next_video", "merge", "persistence"])
+    parser.add_argument("-o", "--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.videos, args.users, args.clicks, args.repeat, args.redis_url, args.only))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠️  {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 import discord
 from discord.ext import commands
 from discord import app_commands
@@ -5,46 +6,131 @@ import logging
 from typing import Optional
 
 from config import config
+from metrics import DISCORD_SECONDS, MetricsServer, watch_video_manager
+from user_actions import UserActionQueue
 from video_manager import VideoManager
 
 logger = logging.getLogger(__name__)
 
 
-class VideoBot(commands.Bot):
-    """Discord bot for random video playback"""
+class VideoBot(commands.AutoShardedBot):
+    """Discord bot for random video playback
+
+    Runs all shards in one process by default; a sharded worker started by
+    the launcher in main.py only connects the shard IDs it was given. Queue
+    state lives in Redis, so any worker can serve any user.
+    """
 
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
 
+        shard_options = {}
+        if config.SHARD_COUNT:
+            shard_options["shard_count"] = config.SHARD_COUNT
+            if config.SHARD_IDS:
+                shard_options["shard_ids"] = config.SHARD_IDS
+
         super().__init__(
             command_prefix='!',
             intents=intents,
-            help_command=None
+            help_command=None,
+            **shard_options
         )
 
-        self.video_manager = VideoManager(config.VIDEO_JSON_URL)
+        self.video_manager = VideoManager(
+            config.VIDEO_JSON_URL,
+            sources=config.VIDEO_SOURCES,
+            refresh_concurrency=config.SOURCE_REFRESH_CONCURRENCY,
+            queue_mode=config.QUEUE_MODE,
+            flush_interval=config.QUEUE_FLUSH_INTERVAL,
+            flush_threshold=config.QUEUE_FLUSH_THRESHOLD,
+            snapshot_dir=config.CATALOG_SNAPSHOT_DIR,
+            cache_max_users=config.QUEUE_CACHE_MAX_USERS,
+            cache_max_bytes=int(config.QUEUE_CACHE_MAX_MB * 2**20),
+            cache_idle_seconds=config.QUEUE_CACHE_IDLE_MINUTES * 60,
+            leader_lease_seconds=config.CATALOG_LEADER_LEASE_SECONDS,
+            queue_coherence=config.QUEUE_COHERENCE,
+            prefetch_ahead=config.PREFETCH_AHEAD,
+            link_check_concurrency=config.LINK_CHECK_CONCURRENCY,
+            link_check_ttl=config.LINK_CHECK_TTL_MINUTES * 60
+        )
+        # Serializes each user's button clicks and merges bursts of Next clicks
+        self.actions = UserActionQueue(
+            debounce=config.NEXT_DEBOUNCE_MS / 1000,
+            max_concurrent=config.USER_MAX_CONCURRENT_ACTIONS
+        )
+        self.metrics_server: Optional[MetricsServer] = None
+        self._startup_fetch: Optional[asyncio.Task] = None
+        self._warmup: Optional[asyncio.Task] = None
 
     async def setup_hook(self):
         """Called when the bot is starting up"""
-        # Fetch videos on startup
-        success = await self.video_manager.fetch_videos()
-        if not success:
-            logger.error("Failed to fetch videos on startup")
-
-        # Start auto-refresh task (every 10 minutes)
-        await self.video_manager.start_auto_refresh(interval_minutes=10)
-
-        # Sync slash commands
-        try:
-            synced = await self.tree.sync()
-            logger.info(f"Synced {len(synced)} command(s)")
-        except Exception as e:
-            logger.error(f"Failed to sync commands: {e}")
+        # Connect Redis pool before any queue is loaded
+        await self.video_manager.connect()
+
+        # Optional Prometheus endpoint on this event loop
+        if config.METRICS_PORT:
+            watch_video_manager(self.video_manager)
+            self.metrics_server = MetricsServer(config.METRICS_HOST, config.METRICS_PORT)
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.error(f"❌ Failed to start metrics endpoint: {e}")
+                self.metrics_server = None
+
+        # All sources stay resident so users can switch without a refetch.
+        # Serve from the on-disk snapshots right away and reconcile with the live
+        # catalogs in the background; without snapshots, fetch before serving
+        loaded = self.video_manager.load_snapshots()
+        if len(loaded) == len(self.video_manager.sources):
+            self._startup_fetch = asyncio.create_task(self.video_manager.fetch_all(merge_new=True))
+        else:
+            results = await self.video_manager.fetch_all(merge_new=True)
+            for source_url, success in results.items():
+                if not success:
+                    logger.error(f"Failed to fetch videos on startup: {source_url}")
+
+        # Buttons carry their state in custom_id: one registration serves every card, across restarts
+        self.add_dynamic_items(NextButton, SwitchSourceButton, SelectSourceButton)
+
+        # Start auto-refresh tasks (each source on its own schedule)
+        await self.video_manager.start_auto_refresh()
+
+        # Preload recently active users' queues in the background while commands sync
+        if config.WARMUP_MAX_USERS > 0:
+            self._warmup = asyncio.create_task(self.video_manager.warm_up(
+                max_age_seconds=config.WARMUP_MAX_AGE_HOURS * 3600,
+                max_users=config.WARMUP_MAX_USERS
+            ))
+
+        # Sync slash commands (global, so once per deployment: the first worker does it)
+        if config.WORKER_INDEX in (None, "0"):
+            try:
+                synced = await self.tree.sync()
+                logger.info(f"Synced {len(synced)} command(s)")
+            except Exception as e:
+                logger.error(f"Failed to sync commands: {e}")
+
+    async def close(self):
+        """Release video manager resources before disconnecting"""
+        # Startup work still running would reopen the HTTP session or touch Redis after close
+        for task in (self._startup_fetch, self._warmup):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        await self.actions.close()
+        await self.video_manager.close()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await super().close()
 
     async def on_ready(self):
         """Called when the bot is ready"""
-        logger.info(f'Bot logged in as {self.user} (ID: {self.user.id})')
+        logger.info(f'Bot logged in as {self.user} (ID: {self.user.id}), shards {sorted(self.shards)} of {self.shard_count}')
 
         # Set activity status based on type
         await self.update_activity()
@@ -100,171 +186,250 @@ async def send_random_video(interaction_or_ctx):
     # Get user ID
     user_id = interaction_or_ctx.user.id if is_interaction else interaction_or_ctx.author.id
 
-    # Get next video for this user
-    video_url = bot.video_manager.get_next_video(user_id)
+    # Get next video for this user (pinning the source for the card)
+    source_url = await bot.video_manager.restore_source(user_id)
+    video_url = await bot.video_manager.get_next_video(user_id, source_url)
 
     if not video_url:
         error_msg = "❌ 无法获取视频，请稍后重试"
         if is_interaction:
-            await interaction_or_ctx.followup.send(error_msg, ephemeral=True)
+            await send_followup(interaction_or_ctx, error_msg, ephemeral=True)
         else:
             await interaction_or_ctx.send(error_msg)
         return
 
-    # Create message with video and button
-    view = VideoView(video_url, user_id)
-    content = create_video_message(video_url)
+    # Create message with video and buttons (keeping the user's source)
+    view = VideoView(user_id, bot.video_manager.source_configs[source_url].name)
+    content = create_video_message(video_url, source_url)
 
     if is_interaction:
-        await interaction_or_ctx.followup.send(content=content, view=view)
+        await send_followup(interaction_or_ctx, content=content, view=view)
     else:
         await interaction_or_ctx.send(content=content, view=view)
 
 
-def create_video_message(video_url: str) -> str:
-    """Create message content with filename and video URL for Discord embed"""
-    filename = VideoManager.extract_filename(video_url)
+def create_video_message(video_url: str, source_url: Optional[str] = None) -> str:
+    """Message content with title and video URL for Discord embed (rendered once per catalog entry)"""
+    return bot.video_manager.video_message(video_url, source_url)
 
-    # Remove .mp4 extension if present
-    if filename.lower().endswith('.mp4'):
-        filename = filename[:-4]
 
-    # Replace underscores with spaces
-    filename = filename.replace('_', ' ')
+# Kept as module-level children so timing a Discord call is a single observe()
+DISCORD_EDIT_SECONDS = DISCORD_SECONDS.labels("edit")
+DISCORD_FOLLOWUP_SECONDS = DISCORD_SECONDS.labels("followup")
 
-    # Discord will automatically embed the video if we include the direct link
-    # We display the filename and the URL separately so Discord can create the embed
-    message = f"**📹 {filename}**\n{video_url}"
 
-    return message
+async def edit_card(interaction: discord.Interaction, **kwargs):
+    """Edit the message a button belongs to"""
+    with DISCORD_EDIT_SECONDS.time():
+        await interaction.message.edit(**kwargs)
 
 
-class VideoView(discord.ui.View):
-    """View with Next and Source Switch buttons"""
+async def send_followup(interaction: discord.Interaction, *args, **kwargs):
+    """Send a followup to a deferred interaction"""
+    with DISCORD_FOLLOWUP_SECONDS.time():
+        await interaction.followup.send(*args, **kwargs)
+
+
+NOT_YOUR_CARD = "❌ 这不是你的视频卡片，请使用 /randomvideo 获取自己的视频"
+
+
+async def check_card_owner(interaction: discord.Interaction, user_id: int) -> bool:
+    """Only the user a card was sent to may use its buttons"""
+    if interaction.user.id == user_id:
+        return True
+    await send_followup(interaction, NOT_YOUR_CARD, ephemeral=True)
+    return False
+
 
-    def __init__(self, current_video_url: str, user_id: int, current_source: str = "default"):
-        super().__init__(timeout=None)  # No timeout
-        self.current_video_url = current_video_url
+def resolve_source_url(user_id: int, source_name: str) -> str:
+    """Source URL for a name encoded in a button (the user's current source if it is gone)"""
+    source = bot.video_manager.get_source(source_name)
+    return source.url if source else bot.video_manager.source_for(user_id)
+
+
+class NextButton(discord.ui.DynamicItem[discord.ui.Button], template=r"rv:next:(?P<user_id>\d+):(?P<source>.+)"):
+    """Next button; owner and source live in the custom_id, so no per-message state is kept"""
+
+    def __init__(self, user_id: int, source: str):
         self.user_id = user_id
-        self.current_source = current_source  # "default" or "streamable"
+        self.source = source
+        super().__init__(discord.ui.Button(
+            label="下一个", style=discord.ButtonStyle.primary, emoji="⏭️",
+            custom_id=f"rv:next:{user_id}:{source}"
+        ))
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["user_id"]), match["source"])
 
-    @discord.ui.button(label="下一个", style=discord.ButtonStyle.primary, emoji="⏭️")
-    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def callback(self, interaction: discord.Interaction):
         """Handle next button click"""
         await interaction.response.defer()
-
-        # Only allow the original user to use the button
-        if interaction.user.id != self.user_id:
-            await interaction.followup.send("❌ 这不是你的视频卡片，请使用 /randomvideo 获取自己的视频", ephemeral=True)
+        if not await check_card_owner(interaction, self.user_id):
             return
 
-        # Get next video for this user
-        video_url = bot.video_manager.get_next_video(self.user_id)
+        # Clicks in quick succession are merged: one advance, one edit
+        source_url = resolve_source_url(self.user_id, self.source)
+        await bot.actions.submit(self.user_id, handle_next_clicks, (interaction, source_url))
 
-        if not video_url:
-            await interaction.followup.send("❌ 无法获取视频", ephemeral=True)
-            return
 
-        # Update the message with new video
-        self.current_video_url = video_url
-        content = create_video_message(video_url)
+class SwitchSourceButton(discord.ui.DynamicItem[discord.ui.Button], template=r"rv:switch:(?P<user_id>\d+):(?P<source>.+)"):
+    """Shows the source selection buttons on the card"""
 
-        # Create new view with updated video and same source
-        new_view = VideoView(video_url, self.user_id, self.current_source)
+    def __init__(self, user_id: int, source: str):
+        self.user_id = user_id
+        self.source = source
+        super().__init__(discord.ui.Button(
+            label="换源", style=discord.ButtonStyle.secondary, emoji="🔄",
+            custom_id=f"rv:switch:{user_id}:{source}"
+        ))
 
-        try:
-            # Edit the original message
-            await interaction.message.edit(content=content, view=new_view)
-        except Exception as e:
-            logger.error(f"Failed to update message: {e}")
-            await interaction.followup.send("❌ 更新失败", ephemeral=True)
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["user_id"]), match["source"])
 
-    @discord.ui.button(label="换源", style=discord.ButtonStyle.secondary, emoji="🔄")
-    async def switch_source_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def callback(self, interaction: discord.Interaction):
         """Handle source switch button click - show source selection"""
         await interaction.response.defer()
-
-        # Only allow the original user to use the button
-        if interaction.user.id != self.user_id:
-            await interaction.followup.send("❌ 这不是你的视频卡片，请使用 /randomvideo 获取自己的视频", ephemeral=True)
+        if not await check_card_owner(interaction, self.user_id):
             return
 
-        # Create source selection view
-        source_view = SourceSelectionView(self.current_video_url, self.user_id, self.current_source)
-
         try:
-            # Edit to show source selection buttons
-            content = create_video_message(self.current_video_url)
-            await interaction.message.edit(content=content, view=source_view)
+            # Only the buttons change; the video stays on the card
+            await edit_card(interaction, view=SourceSelectionView(self.user_id))
         except Exception as e:
             logger.error(f"Failed to show source selection: {e}")
-            await interaction.followup.send("❌ 切换失败", ephemeral=True)
+            await send_followup(interaction, "❌ 切换失败", ephemeral=True)
 
 
-class SourceSelectionView(discord.ui.View):
-    """View for selecting video source"""
+class SelectSourceButton(discord.ui.DynamicItem[discord.ui.Button], template=r"rv:source:(?P<user_id>\d+):(?P<source>.+)"):
+    """Switches the card owner to one source"""
 
-    def __init__(self, current_video_url: str, user_id: int, current_source: str):
-        super().__init__(timeout=None)
-        self.current_video_url = current_video_url
+    def __init__(self, user_id: int, source: str, label: Optional[str] = None, emoji: Optional[str] = None):
         self.user_id = user_id
-        self.current_source = current_source
-
-    @discord.ui.button(label="默认源", style=discord.ButtonStyle.success, emoji="📹")
-    async def default_source_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Switch to default source"""
+        self.source = source
+        super().__init__(discord.ui.Button(
+            label=label or source, style=discord.ButtonStyle.success, emoji=emoji,
+            custom_id=f"rv:source:{user_id}:{source}"
+        ))
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["user_id"]), match["source"])
+
+    async def callback(self, interaction: discord.Interaction):
+        """Switch this user to a source"""
         await interaction.response.defer()
+        if not await check_card_owner(interaction, self.user_id):
+            return
 
-        # Only allow the original user
-        if interaction.user.id != self.user_id:
-            await interaction.followup.send("❌ 这不是你的视频卡片", ephemeral=True)
+        source = bot.video_manager.get_source(self.source)
+        if source is None:
+            await send_followup(interaction, "❌ 切换失败", ephemeral=True)
             return
 
-        # Switch to default source
-        await bot.video_manager.switch_source(config.VIDEO_JSON_URL)
-        video_url = bot.video_manager.get_next_video(self.user_id)
+        # Ordered after any Next clicks still queued for this user
+        await bot.actions.submit(self.user_id, handle_source_switch, (interaction, source), coalesce=False)
 
-        if not video_url:
-            await interaction.followup.send("❌ 无法获取视频", ephemeral=True)
-            return
 
-        content = create_video_message(video_url)
-        new_view = VideoView(video_url, self.user_id, "default")
+class VideoView(discord.ui.View):
+    """Next and Source Switch buttons for a video card"""
 
-        try:
-            await interaction.message.edit(content=content, view=new_view)
-            await interaction.followup.send("✅ 已切换到默认源", ephemeral=True)
-        except Exception as e:
-            logger.error(f"Failed to switch source: {e}")
-            await interaction.followup.send("❌ 切换失败", ephemeral=True)
+    def __init__(self, user_id: int, current_source: str = "default"):
+        super().__init__(timeout=None)
+        self.add_item(NextButton(user_id, current_source))
+        self.add_item(SwitchSourceButton(user_id, current_source))
 
-    @discord.ui.button(label="Streamable源", style=discord.ButtonStyle.success, emoji="💻")
-    async def streamable_source_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Switch to Streamable source"""
-        await interaction.response.defer()
 
-        # Only allow the original user
-        if interaction.user.id != self.user_id:
-            await interaction.followup.send("❌ 这不是你的视频卡片", ephemeral=True)
-            return
+class SourceSelectionView(discord.ui.View):
+    """View for selecting video source (one button per configured source)"""
 
-        # Switch to streamable source
-        await bot.video_manager.switch_source(config.STREAMABLE_JSON_URL)
-        video_url = bot.video_manager.get_next_video(self.user_id)
+    def __init__(self, user_id: int):
+        super().__init__(timeout=None)
+        for source in bot.video_manager.source_configs.values():
+            self.add_item(SelectSourceButton(user_id, source.name, source.label, source.emoji))
 
-        if not video_url:
-            await interaction.followup.send("❌ 无法获取视频", ephemeral=True)
-            return
 
-        content = create_video_message(video_url)
-        new_view = VideoView(video_url, self.user_id, "streamable")
+async def handle_next_clicks(user_id: int, clicks):
+    """Serve one video for a burst of Next clicks and edit only the last clicked card"""
+    interaction, source_url = clicks[-1]
+    if len(clicks) > 1:
+        logger.debug(f"Coalesced {len(clicks)} Next clicks for user {user_id}")
 
-        try:
-            await interaction.message.edit(content=content, view=new_view)
-            await interaction.followup.send("✅ 已切换到 Streamable 源", ephemeral=True)
-        except Exception as e:
-            logger.error(f"Failed to switch source: {e}")
-            await interaction.followup.send("❌ 切换失败", ephemeral=True)
+    # The card's source wins (e.g. after a restart or on another replica)
+    bot.video_manager.switch_source(user_id, source_url)
+    video_url = await bot.video_manager.get_next_video(user_id, source_url)
+
+    if not video_url:
+        await send_followup(interaction, "❌ 无法获取视频", ephemeral=True)
+        return
+
+    content = create_video_message(video_url, source_url)
+    new_view = VideoView(user_id, bot.video_manager.source_configs[source_url].name)
+
+    try:
+        # Edit the original message
+        await edit_card(interaction, content=content, view=new_view)
+    except Exception as e:
+        logger.error(f"Failed to update message: {e}")
+        await send_followup(interaction, "❌ 更新失败", ephemeral=True)
+
+
+async def handle_source_switch(user_id: int, switches):
+    """Switch the user's source and show a video from it on the card"""
+    interaction, source = switches[0]
+
+    # Per-user choice: other users keep their own source, nothing is refetched
+    if not bot.video_manager.switch_source(user_id, source.url):
+        await send_followup(interaction, "❌ 切换失败", ephemeral=True)
+        return
+    video_url = await bot.video_manager.get_next_video(user_id, source.url)
+
+    if not video_url:
+        await send_followup(interaction, "❌ 无法获取视频", ephemeral=True)
+        return
+
+    content = create_video_message(video_url, source.url)
+    new_view = VideoView(user_id, source.name)
+
+    try:
+        await edit_card(interaction, content=content, view=new_view)
+        await send_followup(interaction, f"✅ 已切换到 {source.label}", ephemeral=True)
+    except Exception as e:
+        logger.error(f"Failed to switch source: {e}")
+        await send_followup(interaction, "❌ 切换失败", ephemeral=True)
+
+
+def format_source_status(user_id: int) -> str:
+    """Per-source health and refresh times plus the user's queue progress"""
+    manager = bot.video_manager
+    user_source = manager.source_for(user_id)
+    lines = ["**📊 视频源状态**"]
+    for source in manager.get_source_status():
+        icon = "✅" if source["healthy"] else ("⏳" if source["last_refresh"] is None else "⚠️")
+        last_success = f"<t:{int(source['last_success'])}:R>" if source["last_success"] else "从未"
+        line = f"{icon} **{source['label']}** - {source['videos']} 个视频，上次成功刷新 {last_success}"
+        if source["last_error"]:
+            line += f"（连续失败 {source['consecutive_failures']} 次：{source['last_error']}）"
+        if source["url"] == user_source:
+            line += " ← 当前"
+        lines.append(line)
+
+    queue = manager.get_queue_status(user_id)
+    lines.append(f"\n🎬 你的进度：{queue['current_position']}/{queue['queue_size']}，剩余 {queue['videos_remaining']} 个")
+    return "\n".join(lines)
+
+
+@bot.tree.command(name="status", description="查看视频源状态")
+async def status_slash(interaction: discord.Interaction):
+    """Slash command for source status"""
+    await interaction.response.send_message(format_source_status(interaction.user.id), ephemeral=True)
+
+
+@bot.command(name="status")
+async def status_text(ctx: commands.Context):
+    """Text command for source status"""
+    await ctx.send(format_source_status(ctx.author.id))
 
 
 @bot.event
@@ -0,0 +1,579 @@
+"""
+Interned video catalog: stable integer IDs for video URLs
+"""
+import codecs
+import hashlib
+import json
+import secrets
+import sys
+import logging
+import weakref
+from array import array
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+# Typecode for packed video ID arrays (unsigned 32-bit)
+ID_TYPECODE = 'I'
+# Compaction remaps send IDs that were not live to this value
+NO_ID = 0xFFFFFFFF
+
+
+def pack_ids(ids: array) -> bytes:
+    """Pack an ID array as little-endian uint32 bytes for Redis"""
+    if sys.byteorder == 'big':
+        ids = array(ID_TYPECODE, ids)
+        ids.byteswap()
+    return ids.tobytes()
+
+
+def unpack_ids(data: bytes) -> array:
+    """Inverse of pack_ids()"""
+    ids = array(ID_TYPECODE)
+    ids.frombytes(data)
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids
+
+
+def extract_filename(url: str) -> str:
+    """Extract and decode filename from URL"""
+    try:
+        # Get the last part of URL (filename) and decode URL encoding
+        return unquote(url.split('/')[-1])
+    except Exception as e:
+        logger.error(f"Error extracting filename from {url}: {e}")
+        return "视频.mp4"
+
+
+def video_title(url: str) -> str:
+    """Display title: decoded filename without .mp4, underscores as spaces"""
+    filename = extract_filename(url)
+    if filename.lower().endswith('.mp4'):
+        filename = filename[:-4]
+    return filename.replace('_', ' ')
+
+
+def render_video_message(url: str) -> str:
+    """Message body for a video card: title plus the bare URL so Discord embeds the player"""
+    return f"**📹 {video_title(url)}**\n{url}"
+
+
+class Catalog:
+    """Video catalog for one source with URLs interned to stable integer IDs
+
+    IDs are assigned on first sight and stay stable between compactions: a
+    URL removed from the source keeps its ID (its slot becomes None) and gets
+    it back if it reappears. User queues can therefore store compact ID
+    arrays that stay valid across refreshes.
+
+    Removed slots are reclaimed once they outnumber the live entries (and
+    COMPACT_MIN_TOMBSTONES): the next update first renumbers the live IDs
+    densely. id_count therefore stays below about twice the live count plus
+    one refresh's churn, which keeps permutation rounds constant time per
+    video and bounds the URL tables and snapshots.
+
+    Every committed change bumps version and is kept in a bounded delta log,
+    so queues can catch up from the version they were built against the
+    next time they are used instead of being rewritten on every refresh. A
+    compaction is logged the same way, as an old -> new ID map that queues
+    apply when they catch up past it.
+
+    fingerprint() identifies the ID space for state persisted elsewhere: a
+    random epoch plus version locate the delta log of this catalog lineage,
+    and a digest of the ID table tells whether stored IDs still mean the
+    same URLs (e.g. after a restart without a snapshot).
+
+    The rendered message body of every live entry is kept next to the URL
+    tables (filled in as entries are added, dropped when they are removed),
+    so serving a video is a dict lookup rather than URL parsing.
+    """
+
+    MAX_DELTAS = 64  # Queues further behind than this are repaired by a full diff
+    COMPACT_MIN_TOMBSTONES = 1024  # Small catalogs keep their removed slots
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._urls: List[Optional[str]] = []  # ID -> URL, None while removed from the source
+        self._ids: Dict[str, int] = {}        # URL -> ID
+        self.live_ids = array(ID_TYPECODE)    # IDs currently in the source, in source order
+        self._snapshot = None                 # Memory-mapped snapshot backing a lazy catalog
+        self.version = 0
+        self._deltas = deque(maxlen=self.MAX_DELTAS)  # (version, added IDs, removed IDs, ID remap or None)
+        self._remap_cache: Dict[int, array] = {}     # Compaction version -> composed map to current IDs
+        self._open_updates = weakref.WeakSet()       # Uncommitted updates holding IDs (blocks compaction)
+        self.epoch = secrets.token_hex(4)             # Identifies this catalog lineage (kept in snapshots)
+        self._id_digests: Dict[int, str] = {}         # ID table prefix length -> digest
+        self._fingerprint: Optional[dict] = None
+        self._messages: Dict[str, str] = {}           # Live URL -> rendered message body
+        self.update(urls)
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "Catalog":
+        """Serve straight from a memory-mapped snapshot; URL tables are built on first update"""
+        catalog = cls()
+        catalog._snapshot = snapshot
+        catalog.live_ids = snapshot.live_ids
+
+        saved = snapshot.meta.get("catalog") or {}
+        if saved.get("ids") == snapshot.id_count and saved.get("epoch"):
+            catalog.epoch = saved["epoch"]
+            catalog.version = int(saved.get("version", 0))
+            catalog._id_digests[snapshot.id_count] = saved["digest"]
+        return catalog
+
+    def close(self):
+        """Release the snapshot mapping of a catalog that will not be used again (no-op otherwise)"""
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None:
+            self.live_ids = array(ID_TYPECODE)
+            snapshot.close()
+
+    def _materialize(self):
+        """Decode a snapshot-backed catalog into in-memory URL tables"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+
+        urls: List[Optional[str]] = [None] * snapshot.id_count
+        ids: Dict[str, int] = {}
+        messages: Dict[str, str] = {}
+        rendered = self._messages  # Bodies already rendered by lookups against the snapshot
+        for video_id, url in snapshot.entries():
+            ids[url] = video_id
+            if snapshot.is_live(video_id):
+                urls[video_id] = url
+                messages[url] = rendered.get(url) or render_video_message(url)
+
+        self._urls, self._ids, self._messages, self._snapshot = urls, ids, messages, None
+        snapshot.close()
+
+    @property
+    def urls(self) -> List[Optional[str]]:
+        self._materialize()
+        return self._urls
+
+    @property
+    def ids(self) -> Dict[str, int]:
+        self._materialize()
+        return self._ids
+
+    def __len__(self) -> int:
+        return len(self.live_ids)
+
+    @property
+    def id_count(self) -> int:
+        """Number of IDs assigned, removed ones included (upper bound of the ID space)"""
+        if self._snapshot is not None:
+            return self._snapshot.id_count
+        return len(self._urls)
+
+    def url(self, video_id: int) -> Optional[str]:
+        """URL for an ID, or None if the ID is unknown or currently removed"""
+        if self._snapshot is not None:
+            return self._snapshot.url(video_id)
+        if 0 <= video_id < len(self._urls):
+            return self._urls[video_id]
+        return None
+
+    def message(self, url: str) -> str:
+        """Rendered message body for a video URL (rendered on the spot for unknown URLs)"""
+        message = self._messages.get(url)
+        if message is None:
+            message = render_video_message(url)
+            if self._snapshot is not None:
+                # Snapshot-backed catalogs render lazily; _materialize() fills in the rest
+                self._messages[url] = message
+        return message
+
+    def video_urls(self) -> List[str]:
+        """Live URLs in source order"""
+        return [self.url(video_id) for video_id in self.live_ids]
+
+    def entries(self) -> List[Optional[str]]:
+        """URL for every assigned ID (including removed ones), indexed by ID"""
+        if self._snapshot is not None:
+            strings: List[Optional[str]] = [None] * self._snapshot.id_count
+            for video_id, url in self._snapshot.entries():
+                strings[video_id] = url
+            return strings
+
+        strings = [None] * len(self._urls)
+        for url, video_id in self._ids.items():
+            strings[video_id] = url
+        return strings
+
+    def _record_delta(self, added_ids: List[int], removed_ids: Set[int], remap: Optional[array] = None):
+        self.version += 1
+        self._deltas.append((self.version, array(ID_TYPECODE, added_ids), frozenset(removed_ids), remap))
+
+    def steps_since(self, version: int) -> Optional[List[Tuple[Optional[array], List[int], Set[int]]]]:
+        """Catch-up steps from version to now; None if the log no longer reaches back
+
+        One step per compaction in between: (old -> new ID map to apply
+        first, or None; net added IDs; net removed IDs). Net changes assume
+        the caller held exactly the live IDs of that version: an ID removed
+        and re-added in between is simply kept, one added and then removed
+        never shows up.
+        """
+        if version > self.version or version < self.version - len(self._deltas):
+            return None
+
+        steps = []
+        remap = None
+        added: Dict[int, None] = {}  # Insertion-ordered set
+        removed: Set[int] = set()
+        for delta_version, delta_added, delta_removed, delta_remap in self._deltas:
+            if delta_version <= version:
+                continue
+            if delta_remap is not None:
+                steps.append((remap, list(added), removed))
+                remap, added, removed = delta_remap, {}, set()
+                continue
+            for video_id in delta_removed:
+                if video_id in added:
+                    del added[video_id]
+                else:
+                    removed.add(video_id)
+            for video_id in delta_added:
+                if video_id in removed:
+                    removed.discard(video_id)
+                else:
+                    added[video_id] = None
+        steps.append((remap, list(added), removed))
+        return steps
+
+    def changes_since(self, version: int) -> Optional[Tuple[List[int], Set[int]]]:
+        """Net (added IDs, removed IDs) between version and now; None if unknown or IDs were renumbered since"""
+        steps = self.steps_since(version)
+        if steps is None or len(steps) > 1:
+            return None
+        _, added, removed = steps[0]
+        return added, removed
+
+    def remap_since(self, version: int) -> Optional[array]:
+        """Map from the IDs of version to current ones (NO_ID if gone); None if no compaction since
+
+        Raises KeyError once the delta log no longer reaches back to version.
+        """
+        if version < self.version - len(self._deltas):
+            raise KeyError(version)
+        first = next((delta_version for delta_version, _, _, remap in self._deltas
+                      if remap is not None and delta_version > version), None)
+        if first is None:
+            return None
+
+        composed = self._remap_cache.get(first)
+        if composed is None:
+            for delta_version, _, _, remap in self._deltas:
+                if remap is None or delta_version < first:
+                    continue
+                if composed is None:
+                    composed = remap
+                else:
+                    composed = array(ID_TYPECODE, (NO_ID if video_id == NO_ID else remap[video_id]
+                                                   for video_id in composed))
+            self._remap_cache[first] = composed
+        return composed
+
+    def _sparse(self) -> bool:
+        removed = len(self._urls) - len(self.live_ids)
+        return removed > max(len(self.live_ids), self.COMPACT_MIN_TOMBSTONES)
+
+    def _compact(self):
+        """Renumber live IDs densely in their current order, dropping removed slots"""
+        old_count = len(self._urls)
+        remap = array(ID_TYPECODE, [NO_ID]) * old_count
+        urls: List[Optional[str]] = []
+        for video_id, url in enumerate(self._urls):
+            if url is not None:
+                remap[video_id] = len(urls)
+                urls.append(url)
+
+        self._urls = urls
+        self._ids = {url: video_id for video_id, url in enumerate(urls)}
+        self.live_ids = array(ID_TYPECODE, (remap[video_id] for video_id in self.live_ids))
+        self._id_digests.clear()
+        self._remap_cache.clear()
+        self._record_delta([], set(), remap)
+        logger.info(f"🧹 Compacted catalog IDs: {old_count} -> {len(urls)}")
+
+    def id_digest(self, id_count: int) -> Optional[str]:
+        """Digest of the first id_count entries of the ID table; None if fewer IDs exist"""
+        if id_count > self.id_count:
+            return None
+        digest = self._id_digests.get(id_count)
+        if digest is None:
+            hasher = hashlib.sha256()
+            for url in self.entries()[:id_count]:
+                hasher.update((url or "").encode())
+                hasher.update(b"\n")
+            digest = self._id_digests[id_count] = hasher.hexdigest()[:16]
+        return digest
+
+    def fingerprint(self) -> dict:
+        """Identity of the current catalog state, stored alongside persisted queues (shared, do not mutate)"""
+        id_count = self.id_count
+        cached = self._fingerprint
+        if cached is None or cached["version"] != self.version or cached["ids"] != id_count:
+            cached = self._fingerprint = {"epoch": self.epoch, "version": self.version, "ids": id_count,
+                                          "digest": self.id_digest(id_count)}
+        return cached
+
+    def steps_since_fingerprint(self, fingerprint: dict) -> Optional[List[Tuple[Optional[array], List[int], Set[int]]]]:
+        """Catch-up steps since a fingerprint was taken, if this lineage's delta log covers it"""
+        if fingerprint.get("epoch") != self.epoch:
+            return None
+        return self.steps_since(int(fingerprint.get("version", -1)))
+
+    def ids_compatible(self, fingerprint: dict) -> bool:
+        """Whether IDs stored under fingerprint still name the same URLs here"""
+        try:
+            return self.id_digest(int(fingerprint["ids"])) == fingerprint["digest"]
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def update(self, urls: Iterable[str]) -> Tuple[List[int], Set[int]]:
+        """Replace the live catalog; returns (added IDs in source order, removed IDs)"""
+        update = self.begin_update()
+        for url in urls:
+            update.add(url)
+        return update.commit()
+
+    def apply_changes(self, added_urls: Iterable[str], removed_urls: Iterable[str]) -> Tuple[List[int], Set[int]]:
+        """Apply a delta given as URLs (e.g. computed by another process, whose IDs differ)
+
+        Added URLs go after the current live entries; returns (added IDs, removed IDs).
+        """
+        removed = set(removed_urls)
+        update = self.begin_update()
+        for url in self.video_urls():
+            if url not in removed:
+                update.add(url)
+        for url in added_urls:
+            update.add(url)
+        return update.commit()
+
+    def begin_update(self) -> "CatalogUpdate":
+        """Start an incremental replacement of the live set (for streamed sources)
+
+        Compacts the ID space first when it is sparse and no other update is
+        still interning URLs under the current IDs.
+        """
+        self._materialize()
+        if not self._open_updates and self._sparse():
+            self._compact()
+        update = CatalogUpdate(self)
+        self._open_updates.add(update)
+        return update
+
+
+class CatalogUpdate:
+    """Incrementally builds a catalog's next live set and its added/removed diff
+
+    URLs are interned as they arrive, so an update never holds a second copy
+    of the catalog: existing URLs only cost a dict lookup, and membership is
+    tracked in one-byte-per-ID flags. Nothing becomes visible to queues until
+    commit(). An update that will not be committed should be discard()ed,
+    which releases the IDs it interned; any it cannot release (another
+    update interned after them) are reclaimed by the next compaction.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self.live = array(ID_TYPECODE)
+        self._seen = bytearray(catalog.id_count)
+        self._was_live = bytearray(catalog.id_count)
+        for video_id in catalog.live_ids:
+            self._was_live[video_id] = 1
+        self._added: List[Tuple[int, str]] = []
+        self._interned: List[str] = []  # URLs that got a new ID from this update
+        self.removed_urls: List[str] = []  # Filled in by commit()
+
+    def __len__(self) -> int:
+        return len(self.live)
+
+    def add(self, url: str):
+        """Add the next URL of the source"""
+        catalog = self.catalog
+        video_id = catalog.ids.get(url)
+        if video_id is None:
+            video_id = len(catalog.urls)
+            catalog.ids[url] = video_id
+            catalog.urls.append(None)  # Published on commit()
+            self._interned.append(url)
+
+        if video_id >= len(self._seen):
+            # IDs interned after this update started (e.g. by a concurrent update)
+            grow = catalog.id_count - len(self._seen)
+            self._seen.extend(bytes(grow))
+            self._was_live.extend(bytes(grow))
+
+        if self._seen[video_id]:
+            return  # Duplicate entry in the source
+        self._seen[video_id] = 1
+        self.live.append(video_id)
+        if not self._was_live[video_id]:
+            self._added.append((video_id, url))
+
+    def commit(self) -> Tuple[List[int], Set[int]]:
+        """Publish the new live set; returns (added IDs in source order, removed IDs)"""
+        catalog = self.catalog
+        catalog._open_updates.discard(self)
+        self._interned = []
+        messages = catalog._messages
+        for video_id, url in self._added:
+            catalog.urls[video_id] = url
+            messages[url] = render_video_message(url)
+
+        removed = {video_id for video_id in catalog.live_ids
+                   if video_id >= len(self._seen) or not self._seen[video_id]}
+        for video_id in removed:
+            url = catalog.urls[video_id]
+            messages.pop(url, None)
+            self.removed_urls.append(url)
+            catalog.urls[video_id] = None
+
+        catalog.live_ids = self.live
+        added = [video_id for video_id, _ in self._added]
+        if added or removed:
+            catalog._record_delta(added, removed)
+        return added, removed
+
+    def discard(self):
+        """Abandon the update (no-op after commit()), releasing the IDs it interned when they are the last ones"""
+        catalog = self.catalog
+        catalog._open_updates.discard(self)
+        interned, self._interned = self._interned, []
+        if not interned or catalog._open_updates:
+            return
+        first = catalog._ids.get(interned[0])
+        urls = catalog._urls
+        if first is None or first + len(interned) != len(urls) or any(url is not None for url in urls[first:]):
+            return
+        for url in interned:
+            del catalog._ids[url]
+        del urls[first:]
+        for id_count in [id_count for id_count in catalog._id_digests if id_count > first]:
+            del catalog._id_digests[id_count]
+
+
+class CatalogStreamParser:
+    """Incremental parser for video manifests: a JSON array or JSON Lines
+
+    feed() takes decoded text as it arrives and returns the URLs completed so
+    far, keeping only the unparsed tail buffered. The format is sniffed from
+    the first non-whitespace character ('[' means JSON array). JSON Lines
+    entries may be JSON strings or bare URLs. Non-string entries are skipped.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._mode: Optional[str] = None  # "array" or "lines"
+        self._state = "start"             # array states: start, first, value, sep, done
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> List[str]:
+        """Parse whatever is left at end of stream"""
+        urls = self._parse(final=True)
+        if self._mode == "array" and self._state != "done":
+            raise ValueError("Truncated JSON array in video manifest")
+        return urls
+
+    def _parse(self, final: bool) -> List[str]:
+        if self._mode is None:
+            stripped = self._buffer.lstrip("\ufeff \t\r\n")
+            if not stripped:
+                return []
+            self._mode = "array" if stripped[0] == "[" else "lines"
+            self._buffer = stripped
+
+        urls: List[str] = []
+        if self._mode == "array":
+            self._parse_array(final, urls)
+        else:
+            self._parse_lines(final, urls)
+        return urls
+
+    def _parse_lines(self, final: bool, urls: List[str]):
+        lines = self._buffer.split("\n")
+        self._buffer = "" if final else lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            self._emit(json.loads(line) if line[0] in '"[{' else line, urls)
+
+    def _parse_array(self, final: bool, urls: List[str]):
+        buffer = self._buffer
+        pos = 0
+        size = len(buffer)
+
+        while True:
+            while pos < size and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos >= size:
+                break
+
+            char = buffer[pos]
+            if self._state == "start":
+                if char != "[":
+                    raise ValueError("Video manifest must be a JSON array")
+                pos += 1
+                self._state = "first"
+            elif self._state in ("first", "value"):
+                if self._state == "first" and char == "]":
+                    pos += 1
+                    self._state = "done"
+                    continue
+                try:
+                    value, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # Value continues in the next chunk
+                # Numbers and literals are only complete once a delimiter follows
+                lookahead = end
+                while lookahead < size and buffer[lookahead] in " \t\r\n":
+                    lookahead += 1
+                if lookahead >= size and not final:
+                    break
+                self._emit(value, urls)
+                pos = end
+                self._state = "sep"
+            elif self._state == "sep":
+                if char == ",":
+                    self._state = "value"
+                elif char == "]":
+                    self._state = "done"
+                else:
+                    raise ValueError(f"Unexpected {char!r} in video manifest")
+                pos += 1
+            else:
+                raise ValueError("Trailing data after video manifest array")
+
+        self._buffer = buffer[pos:]
+
+    @staticmethod
+    def _emit(value, urls: List[str]):
+        if isinstance(value, str):
+            urls.append(value)
+        else:
+            logger.debug(f"Skipping non-string manifest entry: {value!r}")
+
+
+async def iter_catalog_urls(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Stream video URLs out of a manifest delivered as byte chunks"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = CatalogStreamParser()
+    async for chunk in chunks:
+        for url in parser.feed(decoder.decode(chunk)):
+            yield url
+    parser.feed(decoder.decode(b"", final=True))
+    for url in parser.close():
+        yield url
@@ -0,0 +1,192 @@
+"""
+On-disk catalog snapshots for instant cold start and offline fallback
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+from catalog import Catalog, ID_TYPECODE, pack_ids, unpack_ids
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DRVCATS\x00"
+FORMAT_VERSION = 1
+
+# magic, format version, reserved, payload length, id count, live count, sha256(payload)
+_HEADER = struct.Struct("<8sHHQII32s")
+_U32 = struct.Struct("<I")
+
+# Payload layout (all integers little-endian uint32):
+#   meta length | meta JSON | offsets[id_count + 1] | live flags[id_count] (1 byte each)
+#   | live IDs[live_count] in source order | UTF-8 URL blob
+# Every assigned ID keeps its URL (removed ones included) so IDs survive restarts.
+
+
+def capture_snapshot(catalog: Catalog) -> Tuple[List[Optional[str]], array]:
+    """Copy what a snapshot needs; cheap enough to run on the event loop before writing off-thread"""
+    return catalog.entries(), array(ID_TYPECODE, catalog.live_ids)
+
+
+def write_snapshot(path: str, strings: List[Optional[str]], live_ids: array, meta: dict) -> int:
+    """Atomically write a snapshot file; returns its size in bytes
+
+    Each call writes its own temporary file, so processes sharing the
+    snapshot directory can save the same source concurrently: the last
+    complete file wins.
+    """
+    encoded = [(s or "").encode() for s in strings]
+    offsets = array(ID_TYPECODE, [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    flags = bytearray(len(strings))
+    for video_id in live_ids:
+        flags[video_id] = 1
+    meta_bytes = json.dumps(meta).encode()
+
+    hasher = hashlib.sha256()
+    payload_len = 0
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * _HEADER.size)  # Filled in once the checksum is known
+
+            def put(data: bytes):
+                nonlocal payload_len
+                f.write(data)
+                hasher.update(data)
+                payload_len += len(data)
+
+            put(_U32.pack(len(meta_bytes)))
+            put(meta_bytes)
+            put(pack_ids(offsets))
+            put(bytes(flags))
+            put(pack_ids(live_ids))
+            for data in encoded:
+                put(data)
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, payload_len, len(strings), len(live_ids),
+                                 hasher.digest()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return _HEADER.size + payload_len
+
+
+class CatalogSnapshot:
+    """Read-only memory-mapped view of a snapshot file
+
+    The header version and payload checksum are verified on open; URLs are
+    decoded from the mapping on demand, so a catalog can serve its first
+    video without decoding the whole table.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty snapshot file {path}")
+
+        try:
+            self._open(path)
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self, path: str):
+        view = memoryview(self._mmap)
+        self._views = [view]
+        if len(view) < _HEADER.size:
+            raise ValueError(f"Truncated snapshot {path}")
+
+        magic, version, _, payload_len, id_count, live_count, digest = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"Not a catalog snapshot: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} (expected {FORMAT_VERSION})")
+
+        payload = view[_HEADER.size:_HEADER.size + payload_len]
+        self._views.append(payload)
+        if len(payload) != payload_len or hashlib.sha256(payload).digest() != digest:
+            raise ValueError(f"Snapshot checksum mismatch: {path}")
+
+        pos = 0
+        (meta_len,) = _U32.unpack_from(payload, pos)
+        pos += _U32.size
+        self.meta = json.loads(bytes(payload[pos:pos + meta_len]))
+        pos += meta_len
+
+        offsets_len = (id_count + 1) * 4
+        offsets = payload[pos:pos + offsets_len]
+        pos += offsets_len
+        if sys.byteorder == "little":
+            self._offsets = offsets.cast(ID_TYPECODE)
+            self._views.append(offsets)
+            self._views.append(self._offsets)
+        else:
+            self._offsets = unpack_ids(bytes(offsets))
+
+        self._flags = payload[pos:pos + id_count]
+        self._views.append(self._flags)
+        pos += id_count
+
+        self.live_ids = unpack_ids(bytes(payload[pos:pos + live_count * 4]))
+        pos += live_count * 4
+
+        self._blob = payload[pos:]
+        self._views.append(self._blob)
+        self.id_count = id_count
+
+    def is_live(self, video_id: int) -> bool:
+        return 0 <= video_id < self.id_count and self._flags[video_id] == 1
+
+    def url(self, video_id: int) -> Optional[str]:
+        """URL for a live ID decoded straight from the mapping"""
+        if not self.is_live(video_id):
+            return None
+        return bytes(self._blob[self._offsets[video_id]:self._offsets[video_id + 1]]).decode()
+
+    def entries(self) -> Iterator[Tuple[int, str]]:
+        """(ID, URL) for every assigned ID, removed ones included"""
+        offsets, blob = self._offsets, self._blob
+        for video_id in range(self.id_count):
+            yield video_id, bytes(blob[offsets[video_id]:offsets[video_id + 1]]).decode()
+
+    def close(self):
+        """Release the mapping (all views must be released first)"""
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+def load_snapshot(path: str) -> Optional[CatalogSnapshot]:
+    """Open a snapshot, or None if it is missing, corrupt or from another format version"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return CatalogSnapshot(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️  Ignoring catalog snapshot {path}: {e}")
+        return None
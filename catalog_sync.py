@@ -0,0 +1,300 @@
+"""
+Cross-replica catalog refresh: one leader per source fetches, followers apply its deltas
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import socket
+import zlib
+from typing import Dict, List, Optional
+
+from redis.exceptions import WatchError
+
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Per-source keys, suffixed with RedisStorage's source key
+LEASE_KEY_PREFIX = "catalog_leader:"
+# Hash with the leader's current catalog: "version" (counter) and "urls" (zlib, one URL per line)
+MANIFEST_KEY_PREFIX = "catalog_manifest:"
+UPDATES_CHANNEL = "catalog_updates"
+
+# A lease key expires LEASE_TTL_FRACTION of the advertised lease period after
+# its last renewal, and every instance retries each lease_seconds / RENEWALS_PER_LEASE.
+# A crashed leader is then replaced within 2/3 + 1/6 of a period, and a live one
+# gets three renewal attempts before its key lapses.
+LEASE_TTL_FRACTION = 2 / 3
+RENEWALS_PER_LEASE = 6
+
+# Deltas larger than this are announced without their URLs; followers pull the manifest instead
+MAX_DELTA_URLS = 5000
+
+
+def make_instance_id() -> str:
+    """Identifies one bot process among the replicas sharing a Redis"""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+
+def encode_manifest(urls: List[str]) -> bytes:
+    return zlib.compress("\n".join(urls).encode(), 1)
+
+
+def decode_manifest(data: bytes) -> List[str]:
+    text = zlib.decompress(data).decode()
+    return text.split("\n") if text else []
+
+
+class RefreshLease:
+    """Lease on refreshing one source, held by at most one instance at a time
+
+    SET NX PX acquires it; renewals and release are WATCH/MULTI transactions
+    that only touch the key while it still names this owner, so an instance
+    whose lease already expired can never extend or delete its successor's.
+    """
+
+    def __init__(self, client, key: str, owner: str, ttl_seconds: float):
+        self.client = client
+        self.key = key
+        self.owner = owner.encode()
+        self.lease_ms = max(1, int(ttl_seconds * 1000))  # Key expiry after each (re)acquire
+        self.held = False
+
+    async def acquire(self) -> bool:
+        """Take the lease if it is free, or renew it if we hold it; returns whether we hold it"""
+        if await self.client.set(self.key, self.owner, nx=True, px=self.lease_ms):
+            self.held = True
+        else:
+            self.held = await self._if_owner(lambda pipe: pipe.pexpire(self.key, self.lease_ms))
+        return self.held
+
+    async def release(self):
+        """Give the lease up early so another instance can take over without waiting for expiry"""
+        if self.held:
+            self.held = False
+            await self._if_owner(lambda pipe: pipe.delete(self.key))
+
+    async def _if_owner(self, command) -> bool:
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.key)
+                if await pipe.get(self.key) != self.owner:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                command(pipe)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+
+class CatalogSync:
+    """Leader election and catalog fan-out for replicas sharing one Redis
+
+    Each source has its own lease. The holder refreshes that source from the
+    origin as before; after every change it stores the full URL list under a
+    version counter in Redis and publishes {version, prev, added, removed}
+    on UPDATES_CHANNEL. Other instances skip the origin: they apply a
+    published delta when it follows the version they hold, and otherwise
+    (missed messages, large deltas, startup) reload the stored manifest.
+    Their own refresh schedule only checks the manifest version.
+
+    Deltas carry URLs rather than catalog IDs, which are local to each
+    process. Lease keys expire well inside lease_seconds and are retried
+    several times per period, so a crashed leader's source is taken over at
+    most one lease period after its last renewal. If Redis cannot be
+    reached every instance falls back to fetching on its own.
+    """
+
+    def __init__(self, manager, client, lease_seconds: float = 30.0, instance_id: Optional[str] = None):
+        self.manager = manager
+        self.client = client
+        self.lease_seconds = lease_seconds
+        self.instance_id = instance_id or make_instance_id()
+        self.leases: Dict[str, RefreshLease] = {}
+        self.versions: Dict[str, int] = {}  # Manifest version each local catalog matches
+        self.degraded = False  # Redis unreachable at the last renewal: fetch locally
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._pubsub = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "published": 0,
+            "deltas_applied": 0,
+            "manifest_loads": 0,
+            "leader_changes": 0
+        }
+
+    def is_leader(self, source_url: str) -> bool:
+        """Whether this instance should refresh the source from its origin"""
+        if self.degraded:
+            return True
+        lease = self.leases.get(source_url)
+        return lease is not None and lease.held
+
+    async def start(self):
+        """Subscribe to updates and take part in the election (leases are tried right away)"""
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(UPDATES_CHANNEL)
+        await self.renew_leases()
+        self._tasks = [asyncio.create_task(self._lease_loop()), asyncio.create_task(self._listen_loop())]
+
+    async def stop(self, release: bool = True):
+        """Stop renewing and listening; held leases are released unless release is False"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if release:
+            for lease in self.leases.values():
+                try:
+                    await lease.release()
+                except Exception as e:
+                    logger.warning(f"⚠️  Could not release catalog lease {lease.key}: {e}")
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing catalog pub/sub: {e}")
+            self._pubsub = None
+
+    def _lease(self, source_url: str) -> RefreshLease:
+        lease = self.leases.get(source_url)
+        if lease is None:
+            key = LEASE_KEY_PREFIX + self.manager.redis_storage._get_source_key(source_url)
+            lease = self.leases[source_url] = RefreshLease(self.client, key, self.instance_id,
+                                                             self.lease_seconds * LEASE_TTL_FRACTION)
+        return lease
+
+    def _lock(self, source_url: str) -> asyncio.Lock:
+        return self._locks.setdefault(source_url, asyncio.Lock())
+
+    async def renew_leases(self):
+        """Acquire or renew the lease of every configured source (and drop those of removed sources)"""
+        try:
+            for source_url in list(self.leases):
+                if source_url not in self.manager.source_configs:
+                    await self.leases.pop(source_url).release()
+            for source_url in self.manager.sources:
+                lease = self._lease(source_url)
+                was_leader = lease.held
+                if await lease.acquire() == was_leader:
+                    continue
+                self.stats["leader_changes"] += 1
+                if lease.held:
+                    logger.info(f"👑 Now refreshing {source_url} for all replicas")
+                    # Start from the last published catalog; the next fetch must not trust old validators
+                    await self.pull(source_url)
+                else:
+                    logger.warning(f"⚠️  Lost the refresh lease for {source_url}, following the new leader")
+        except Exception as e:
+            ERRORS.labels("redis").inc()
+            if not self.degraded:
+                logger.warning(f"⚠️  Catalog leader election unavailable ({e}), refreshing locally")
+            self.degraded = True
+            return
+        if self.degraded:
+            logger.info("✅ Catalog leader election restored")
+        self.degraded = False
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / RENEWALS_PER_LEASE)
+            await self.renew_leases()
+
+    async def publish(self, source_url: str, added_urls: List[str], removed_urls: List[str]):
+        """Store the leader's catalog as the next manifest version and announce the change"""
+        key = MANIFEST_KEY_PREFIX + self.manager.redis_storage._get_source_key(source_url)
+        blob = encode_manifest(self.manager._catalog_for(source_url).video_urls())
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hincrby(key, "version", 1)
+                pipe.hset(key, "urls", blob)
+                version, _ = await pipe.execute()
+
+            message = {"instance": self.instance_id, "source": source_url, "version": version,
+                       "prev": version - 1}
+            if len(added_urls) + len(removed_urls) <= MAX_DELTA_URLS and version > 1:
+                message["added"] = added_urls
+                message["removed"] = removed_urls
+            await self.client.publish(UPDATES_CHANNEL, json.dumps(message))
+        except Exception as e:
+            ERRORS.labels("redis").inc()
+            logger.error(f"❌ Failed to publish catalog update for {source_url}: {e}")
+            return
+
+        self.versions[source_url] = version
+        self.stats["published"] += 1
+        logger.info(f"📣 Published catalog version {version} for {source_url} "
+                    f"(+{len(added_urls)} / -{len(removed_urls)})")
+
+    async def ensure_published(self, source_url: str):
+        """Publish the leader's catalog if no manifest matches it yet (e.g. served from a snapshot and a 304)"""
+        if source_url not in self.versions and len(self.manager._catalog_for(source_url)):
+            await self.publish(source_url, [], [])
+
+    async def pull(self, source_url: str) -> bool:
+        """Bring the local catalog up to the stored manifest; False if no leader has stored one yet"""
+        key = MANIFEST_KEY_PREFIX + self.manager.redis_storage._get_source_key(source_url)
+        async with self._lock(source_url):
+            version = await self.client.hget(key, "version")
+            if version is None:
+                return False
+            version = int(version)
+            if version == self.versions.get(source_url):
+                return True
+
+            version, blob = await self.client.hmget(key, ["version", "urls"])
+            if blob is None:
+                return False
+            urls = await asyncio.to_thread(decode_manifest, blob)
+            await self.manager.apply_remote_catalog(source_url, urls=urls)
+            self.versions[source_url] = int(version)
+            self.stats["manifest_loads"] += 1
+            logger.info(f"📥 Loaded catalog version {int(version)} for {source_url} ({len(urls)} videos)")
+            return True
+
+    async def _listen_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    await self._handle_update(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                ERRORS.labels("redis").inc()
+                logger.error(f"❌ Error handling catalog update: {e}")
+                await asyncio.sleep(1)
+
+    async def _handle_update(self, update: dict):
+        source_url = update.get("source")
+        if update.get("instance") == self.instance_id or source_url not in self.manager.source_configs:
+            return
+        if self.is_leader(source_url):
+            return  # Only possible around a failover; our own next refresh decides
+
+        if "added" in update:
+            async with self._lock(source_url):
+                if self.versions.get(source_url) == update["prev"]:
+                    await self.manager.apply_remote_catalog(source_url, added=update["added"],
+                                                            removed=update["removed"])
+                    self.versions[source_url] = update["version"]
+                    self.stats["deltas_applied"] += 1
+                    return
+                if self.versions.get(source_url, 0) >= update["version"]:
+                    return
+        # Gap in the version sequence, or a delta sent without URLs
+        await self.pull(source_url)
+
+    def get_stats(self) -> dict:
+        """Election role per source plus publish / apply counters"""
+        return {
+            **self.stats,
+            "degraded": self.degraded,
+            "leader_of": [source_url for source_url in self.manager.sources if self.is_leader(source_url)],
+            "versions": dict(self.versions)
+        }
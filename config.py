@@ -2,6 +2,9 @@ import os
 from dotenv import load_dotenv
 import logging
 
+from sharding import parse_shard_ids
+from video_sources import default_sources, parse_sources
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +28,49 @@ class Config:
         self.DISCORD_ACTIVITY_NAME = os.getenv('DISCORD_ACTIVITY_NAME', '随机视频')
         self.DISCORD_ACTIVITY_TYPE = os.getenv('DISCORD_ACTIVITY_TYPE', 'watching').lower()
         self.DISCORD_ACTIVITY_URL = os.getenv('DISCORD_ACTIVITY_URL')
+        self.QUEUE_MODE = os.getenv('QUEUE_MODE', 'shuffle').lower()
+        # Write-behind persistence: max seconds a queue change may stay unsaved (0 = save immediately)
+        self.QUEUE_FLUSH_INTERVAL = float(os.getenv('QUEUE_FLUSH_INTERVAL', '2'))
+        self.QUEUE_FLUSH_THRESHOLD = int(os.getenv('QUEUE_FLUSH_THRESHOLD', '100'))
+        # Replicas sharing Redis drop cached queues another replica wrote and only write queues still
+        # at the revision they loaded (pub/sub invalidations plus WATCH/MULTI per write). Costs a
+        # PUBLISH and two extra round trips per write, so it is off for a single process; sharded
+        # workers turn it on. Stale clicks are re-served at once only when QUEUE_FLUSH_INTERVAL=0;
+        # with write-behind the flush discards them instead of overwriting the newer queue
+        self.QUEUE_COHERENCE = os.getenv('QUEUE_COHERENCE', 'false').lower() in ('1', 'true', 'yes')
+        # On-disk catalog snapshots for instant cold start (empty disables)
+        self.CATALOG_SNAPSHOT_DIR = os.getenv('CATALOG_SNAPSHOT_DIR', '.catalog_snapshots') or None
+        # Max catalog refreshes running at once across all sources
+        self.SOURCE_REFRESH_CONCURRENCY = int(os.getenv('SOURCE_REFRESH_CONCURRENCY', '4'))
+        self.VIDEO_SOURCES = self._load_sources()
+        # Replicas sharing Redis elect one refreshing instance per source; the others apply its
+        # published catalog deltas. A crashed leader is replaced within one lease (0 = all fetch)
+        self.CATALOG_LEADER_LEASE_SECONDS = float(os.getenv('CATALOG_LEADER_LEASE_SECONDS', '30'))
+        # Rapid Next clicks within the debounce window are coalesced into one advance and one edit
+        self.NEXT_DEBOUNCE_MS = float(os.getenv('NEXT_DEBOUNCE_MS', '250'))
+        # Background HEAD checks of each active user's next PREFETCH_AHEAD videos; known-dead links
+        # are skipped when serving (0 = disabled)
+        self.PREFETCH_AHEAD = int(os.getenv('PREFETCH_AHEAD', '3'))
+        self.LINK_CHECK_CONCURRENCY = int(os.getenv('LINK_CHECK_CONCURRENCY', '4'))
+        self.LINK_CHECK_TTL_MINUTES = float(os.getenv('LINK_CHECK_TTL_MINUTES', '30'))
+        self.USER_MAX_CONCURRENT_ACTIONS = int(os.getenv('USER_MAX_CONCURRENT_ACTIONS', '1'))
+        # Sharding: WORKER_PROCESSES > 1 makes main.py a launcher that runs one process per
+        # shard range (SHARD_COUNT shards in total, default one per worker). Workers get
+        # SHARD_IDS / WORKER_INDEX from the launcher; SHARD_COUNT=0 lets discord.py decide
+        self.WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '1'))
+        self.SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0'))
+        self.SHARD_IDS = parse_shard_ids(os.getenv('SHARD_IDS'))
+        self.WORKER_INDEX = os.getenv('WORKER_INDEX')
+        # Prometheus metrics endpoint served from the bot's event loop (0 = disabled)
+        self.METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+        self.METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+        # Bounded in-memory queue cache in front of Redis (0 = unbounded / never expire)
+        self.QUEUE_CACHE_MAX_USERS = int(os.getenv('QUEUE_CACHE_MAX_USERS', '50000'))
+        self.QUEUE_CACHE_MAX_MB = float(os.getenv('QUEUE_CACHE_MAX_MB', '128'))
+        self.QUEUE_CACHE_IDLE_MINUTES = float(os.getenv('QUEUE_CACHE_IDLE_MINUTES', '60'))
+        # Startup warm-up of recently active users' queues (0 users disables it)
+        self.WARMUP_MAX_AGE_HOURS = float(os.getenv('WARMUP_MAX_AGE_HOURS', '72'))
+        self.WARMUP_MAX_USERS = int(os.getenv('WARMUP_MAX_USERS', '10000'))
 
         # Validate required settings
         if not self.DISCORD_BOT_TOKEN:
@@ -36,14 +82,34 @@ class Config:
             logger.warning(f"Invalid activity type '{self.DISCORD_ACTIVITY_TYPE}', using 'watching'")
             self.DISCORD_ACTIVITY_TYPE = 'watching'
 
+        # Validate queue mode
+        valid_modes = ['shuffle', 'permutation']
+        if self.QUEUE_MODE not in valid_modes:
+            logger.warning(f"Invalid queue mode '{self.QUEUE_MODE}', using 'shuffle'")
+            self.QUEUE_MODE = 'shuffle'
+
         logger.info(f"Configuration loaded - Activity: {self.DISCORD_ACTIVITY_TYPE} {self.DISCORD_ACTIVITY_NAME}, Video URL: {self.VIDEO_JSON_URL}")
 
+    def _load_sources(self):
+        """VIDEO_SOURCES (JSON list) if set, otherwise VIDEO_JSON_URL + STREAMABLE_JSON_URL"""
+        raw = os.getenv('VIDEO_SOURCES')
+        if raw:
+            try:
+                sources = parse_sources(raw)
+                # The first configured source is the default one
+                self.VIDEO_JSON_URL = sources[0].url
+                return sources
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Invalid VIDEO_SOURCES ({e}), using VIDEO_JSON_URL/STREAMABLE_JSON_URL")
+        return default_sources(self.VIDEO_JSON_URL, self.STREAMABLE_JSON_URL)
+
     def has_changed(self) -> bool:
         """Check if environment variables have changed (for cloud deployment)"""
         current_values = {
             'DISCORD_BOT_TOKEN': os.getenv('DISCORD_BOT_TOKEN'),
             'VIDEO_JSON_URL': os.getenv('VIDEO_JSON_URL', 'https://videos.vistru.cn/videos.json'),
             'STREAMABLE_JSON_URL': os.getenv('STREAMABLE_JSON_URL', 'https://videos.vistru.cn/streamable.json'),
+            'VIDEO_SOURCES': os.getenv('VIDEO_SOURCES'),
             'DISCORD_ACTIVITY_NAME': os.getenv('DISCORD_ACTIVITY_NAME', '随机视频'),
             'DISCORD_ACTIVITY_TYPE': os.getenv('DISCORD_ACTIVITY_TYPE', 'watching').lower(),
             'DISCORD_ACTIVITY_URL': os.getenv('DISCORD_ACTIVITY_URL')
@@ -58,6 +124,7 @@ class Config:
         changed = (
             current_values['VIDEO_JSON_URL'] != self._cached_values.get('VIDEO_JSON_URL') or
             current_values['STREAMABLE_JSON_URL'] != self._cached_values.get('STREAMABLE_JSON_URL') or
+            current_values['VIDEO_SOURCES'] != self._cached_values.get('VIDEO_SOURCES') or
             current_values['DISCORD_ACTIVITY_NAME'] != self._cached_values.get('DISCORD_ACTIVITY_NAME') or
             current_values['DISCORD_ACTIVITY_TYPE'] != self._cached_values.get('DISCORD_ACTIVITY_TYPE') or
             current_values['DISCORD_ACTIVITY_URL'] != self._cached_values.get('DISCORD_ACTIVITY_URL')
@@ -0,0 +1,150 @@
+"""
+Shared pytest fixtures
+"""
+import asyncio
+import json
+import os
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from redis_storage import RedisStorage
+from video_manager import VideoManager
+
+
+@pytest.fixture
+async def redis_clients():
+    """Factory for async Redis clients sharing one local stand-in (or TEST_REDIS_URL if set)
+
+    Each call returns a separate client, as separate bot processes would have.
+    """
+    test_url = os.getenv('TEST_REDIS_URL')
+    if test_url:
+        from redis import asyncio as aioredis
+
+        def make():
+            return aioredis.Redis.from_url(test_url, decode_responses=False)
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+
+        def make():
+            return fakeredis.FakeAsyncRedis(server=server, decode_responses=False)
+
+    clients = []
+
+    def factory():
+        client = make()
+        clients.append(client)
+        return client
+
+    await factory().flushdb()
+    yield factory
+    await clients[0].flushdb()
+    for client in clients:
+        await client.aclose()
+
+
+@pytest.fixture
+async def redis_client(redis_clients):
+    """Async Redis client backed by a local stand-in (or TEST_REDIS_URL if set)"""
+    return redis_clients()
+
+
+@pytest.fixture
+def redis_storage(redis_clients):
+    """Factory for connected RedisStorages on a given client (default: a new client to the shared Redis)"""
+    async def make(client=None) -> RedisStorage:
+        storage = RedisStorage(client=client if client is not None else redis_clients())
+        assert await storage.connect()
+        return storage
+
+    return make
+
+
+@pytest.fixture
+def offline_manager():
+    """Factory for VideoManagers running without Redis; videos, if given, fill the default source"""
+    def make(url: str, videos=None, **kwargs) -> VideoManager:
+        manager = VideoManager(url, redis_storage=RedisStorage.disabled(), **kwargs)
+        if videos is not None:
+            manager.all_videos = list(videos)
+        return manager
+
+    return make
+
+
+@pytest.fixture
+def redis_manager(redis_clients):
+    """Factory for connected VideoManagers, each with its own client to the shared Redis (like replicas)"""
+    async def make(url: str, videos=None, **kwargs) -> VideoManager:
+        manager = VideoManager(url, redis_storage=RedisStorage(client=redis_clients()), **kwargs)
+        await manager.connect()
+        if videos is not None:
+            manager.all_videos = list(videos)
+        return manager
+
+    return make
+
+
+@pytest.fixture
+def wait_for():
+    """Poll a condition until it holds or the timeout passes; returns its last value"""
+    async def wait(condition, timeout: float = 3.0) -> bool:
+        for _ in range(int(timeout / 0.02)):
+            if condition():
+                return True
+            await asyncio.sleep(0.02)
+        return condition()
+
+    return wait
+
+
+class CatalogServer:
+    """Serves a mutable video list, optionally with ETag support
+
+    delay (seconds) and status can be set to simulate slow or failing origins.
+    """
+
+    def __init__(self, videos, use_etag: bool = True):
+        self.videos = videos
+        self.use_etag = use_etag
+        self.delay = 0.0
+        self.status = 200
+        self.requests = 0
+        self.conditional_requests = 0
+
+    def etag(self) -> str:
+        return f'"{hash(tuple(self.videos)) & 0xffffffff:x}"'
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        if "If-None-Match" in request.headers:
+            self.conditional_requests += 1
+            if self.use_etag and request.headers["If-None-Match"] == self.etag():
+                return web.Response(status=304)
+
+        headers = {"ETag": self.etag()} if self.use_etag else {}
+        return web.Response(body=json.dumps(self.videos), content_type="application/json", headers=headers)
+
+
+@pytest.fixture
+async def catalog_server():
+    """Factory starting local aiohttp stand-ins that serve a video list"""
+    servers = []
+
+    async def start(videos, use_etag: bool = True):
+        catalog = CatalogServer(videos, use_etag)
+        app = web.Application()
+        app.router.add_get("/videos.json", catalog.handle)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        return catalog, str(server.make_url("/videos.json"))
+
+    yield start
+    for server in servers:
+        await server.close()
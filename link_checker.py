@@ -0,0 +1,147 @@
+"""
+Background reachability checks for upcoming videos (HEAD requests behind a TTL cache)
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+
+from metrics import LINK_CHECKS
+
+logger = logging.getLogger(__name__)
+
+
+class LinkChecker:
+    """Checks video URLs before users reach them so known-dead links can be skipped
+
+    schedule() only enqueues URLs that have no fresh result; a fixed pool of
+    workers sends HEAD requests through the caller's pooled session, so at
+    most `concurrency` checks are in flight. Results are cached for ttl
+    seconds (LRU-bounded). Only definitive answers mark a link dead (404 /
+    410): timeouts, 5xx and rate limits leave it unknown for a short while,
+    so a flaky host never hides videos. Hosts that reject HEAD count as
+    alive.
+    """
+
+    DEAD_STATUSES = frozenset({404, 410})
+    HEAD_UNSUPPORTED = frozenset({405, 501})
+    UNKNOWN_TTL_SECONDS = 60.0  # Retry delay after an inconclusive check
+
+    def __init__(self, session_factory: Callable[[], aiohttp.ClientSession], concurrency: int = 4,
+                 ttl: float = 1800.0, timeout: float = 5.0, max_entries: int = 100_000, max_pending: int = 10_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self._session_factory = session_factory
+        self.concurrency = max(1, concurrency)
+        self.ttl = ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self._clock = clock
+        # URL -> (alive: True / False / None for unknown, expires at)
+        self._results: "OrderedDict[str, Tuple[Optional[bool], float]]" = OrderedDict()
+        self._pending: asyncio.Queue = asyncio.Queue()
+        self._queued: Set[str] = set()
+        self._workers: List[asyncio.Task] = []
+        self.stats = {
+            "checks": 0,
+            "alive": 0,
+            "dead": 0,
+            "unknown": 0,
+            "dropped": 0,
+            "skipped": 0
+        }
+
+    def status(self, url: str) -> Optional[bool]:
+        """Cached reachability: True / False, or None if unchecked, inconclusive or expired"""
+        result = self._results.get(url)
+        if result is None or result[1] <= self._clock():
+            return None
+        return result[0]
+
+    def is_dead(self, url: str) -> bool:
+        return self.status(url) is False
+
+    def schedule(self, urls: Iterable[str]):
+        """Queue background checks for URLs without a fresh result (never blocks)"""
+        now = self._clock()
+        for url in urls:
+            if url in self._queued:
+                continue
+            result = self._results.get(url)
+            if result is not None and result[1] > now:
+                continue
+            if len(self._queued) >= self.max_pending:
+                self.stats["dropped"] += 1
+                continue
+            self._queued.add(url)
+            self._pending.put_nowait(url)
+        if self._queued:
+            self._ensure_workers()
+
+    def record_skip(self):
+        self.stats["skipped"] += 1
+
+    def _ensure_workers(self):
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            url = await self._pending.get()
+            try:
+                self._store(url, await self.check(url))
+            except Exception as e:
+                logger.error(f"❌ Error checking {url}: {e}")
+            finally:
+                self._queued.discard(url)
+                self._pending.task_done()
+
+    async def check(self, url: str) -> Optional[bool]:
+        """One HEAD request: True if reachable, False if gone, None if inconclusive"""
+        self.stats["checks"] += 1
+        try:
+            async with self._session_factory().head(url, allow_redirects=True, timeout=self.timeout) as response:
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"Link check failed for {url}: {e!r}")
+            return None
+
+        if status in self.DEAD_STATUSES:
+            return False
+        if status < 400 or status in self.HEAD_UNSUPPORTED:
+            return True
+        return None
+
+    def _store(self, url: str, alive: Optional[bool]):
+        result = "unknown" if alive is None else ("alive" if alive else "dead")
+        self.stats[result] += 1
+        LINK_CHECKS.labels(result).inc()
+        if alive is False:
+            logger.info(f"💀 Dead link found: {url}")
+
+        ttl = self.ttl if alive is not None else min(self.ttl, self.UNKNOWN_TTL_SECONDS)
+        self._results[url] = (alive, self._clock() + ttl)
+        self._results.move_to_end(url)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def join(self):
+        """Wait until every scheduled check has finished"""
+        await self._pending.join()
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def get_stats(self) -> dict:
+        """Check outcomes, dead links skipped when serving, cache size and checks queued"""
+        stats = dict(self.stats)
+        stats["cached"] = len(self._results)
+        stats["pending"] = len(self._queued)
+        return stats
@@ -15,6 +15,7 @@ from watchdog.events import FileSystemEventHandler
 
 from config import config
 from bot import run_bot, bot
+from sharding import WorkerSupervisor, launcher_argv, plan_shards, worker_env
 
 # Setup logging
 logging.basicConfig(
@@ -63,13 +64,13 @@ class EnvFileHandler(FileSystemEventHandler):
                 await bot.update_activity()
                 logger.info(f"✅ Configuration reloaded - Activity: {config.DISCORD_ACTIVITY_TYPE} {config.DISCORD_ACTIVITY_NAME}")
 
-            # Update video manager URL
-            bot.video_manager.json_url = config.VIDEO_JSON_URL
-            await bot.video_manager.fetch_videos()
+            # Update video manager sources
+            bot.video_manager.set_sources(config.VIDEO_JSON_URL, config.VIDEO_SOURCES)
+            await bot.video_manager.fetch_all(merge_new=True)
 
-            # Restart auto-refresh task with new source
+            # Restart auto-refresh tasks with the new sources
             bot.video_manager.stop_auto_refresh()
-            await bot.video_manager.start_auto_refresh(interval_minutes=10)
+            await bot.video_manager.start_auto_refresh()
 
             logger.info(f"✅ Video source updated: {config.VIDEO_JSON_URL}")
 
@@ -115,13 +116,13 @@ async def cloud_env_monitor():
                     await bot.update_activity()
                     logger.info(f"✅ Bot activity updated: {config.DISCORD_ACTIVITY_TYPE} {config.DISCORD_ACTIVITY_NAME}")
 
-                # Update video manager
-                bot.video_manager.json_url = config.VIDEO_JSON_URL
-                await bot.video_manager.fetch_videos()
+                # Update video manager sources
+                bot.video_manager.set_sources(config.VIDEO_JSON_URL, config.VIDEO_SOURCES)
+                await bot.video_manager.fetch_all(merge_new=True)
 
-                # Restart auto-refresh task with new source
+                # Restart auto-refresh tasks with the new sources
                 bot.video_manager.stop_auto_refresh()
-                await bot.video_manager.start_auto_refresh(interval_minutes=10)
+                await bot.video_manager.start_auto_refresh()
 
                 logger.info(f"✅ Video source updated: {config.VIDEO_JSON_URL}")
 
@@ -140,6 +141,20 @@ async def run_bot_async():
         await bot.start(config.DISCORD_BOT_TOKEN)
 
 
+async def run_launcher():
+    """Spawn one worker process per shard range and supervise them until shutdown"""
+    shard_count = config.SHARD_COUNT or config.WORKER_PROCESSES
+    plan = plan_shards(shard_count, config.WORKER_PROCESSES)
+    envs = [worker_env(os.environ, index, shard_ids, shard_count) for index, shard_ids in enumerate(plan)]
+    supervisor = WorkerSupervisor(launcher_argv(), envs)
+    logger.info(f"🧩 Launching {len(plan)} workers for {shard_count} shards: {plan}")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(supervisor.stop()))
+    await supervisor.run()
+
+
 def signal_handler(sig, frame):
     """Handle shutdown signals"""
     logger.info("🛑 Shutting down bot...")
@@ -148,7 +163,16 @@ def signal_handler(sig, frame):
 
 def main():
     """Main entry point"""
+    # Sharded deployment: this process only supervises the workers
+    if config.WORKER_PROCESSES > 1 and config.WORKER_INDEX is None:
+        logger.info("🚀 Starting Discord Random Video Bot launcher")
+        asyncio.run(run_launcher())
+        logger.info("👋 All workers stopped")
+        return
+
     logger.info("🚀 Starting Discord Random Video Bot")
+    if config.WORKER_INDEX is not None:
+        logger.info(f"🧩 Worker {config.WORKER_INDEX}: shards {config.SHARD_IDS} of {config.SHARD_COUNT}")
     logger.info(f"📋 {config}")
     logger.info(f"🌍 Environment: {'Cloud' if IS_CLOUD else 'Local'}")
 
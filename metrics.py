@@ -0,0 +1,331 @@
+"""
+Lightweight in-process metrics with a Prometheus text endpoint
+
+Counters and histograms are plain Python objects updated inline: an
+observation is a bisect plus two additions (well under a microsecond), so
+the hot path is instrumented unconditionally and the HTTP endpoint is the
+only optional part. Values derived from existing state (cache size, catalog
+sizes, ...) are read by collectors at scrape time instead of being tracked.
+"""
+import functools
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Seconds; tuned for sub-millisecond hot-path calls up to multi-second fetches
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (labels, value) pairs of one metric family, as produced by collectors
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    """Base for labelled metric families; labels() children are cached"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh child holding one label combination's value"""
+
+    def labels(self, *values: str):
+        """Child for one label combination (keep the result on hot paths)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _only_child(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use labels()")
+        return self._children[()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(dict(zip(self.labelnames, key)), child))
+        return lines
+
+    def _render_child(self, labels: Dict[str, str], child) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._only_child().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._only_child().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("_upper", "counts", "sum")
+
+    def __init__(self, upper: Tuple[float, ...]):
+        self._upper = upper
+        self.counts = [0] * (len(upper) + 1)  # Per bucket (not cumulative), last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self._upper, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def time(self) -> "_Timer":
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies in seconds) over fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._only_child().observe(value)
+
+    def time(self) -> _Timer:
+        return self._only_child().time()
+
+    def _render_child(self, labels: Dict[str, str], child: _HistogramChild) -> List[str]:
+        lines = []
+        cumulative = 0
+        for upper, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(upper)})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+def timed(child: _HistogramChild):
+    """Decorator observing the duration of every call of a coroutine function"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# collector() -> [(name, type, help, samples)], evaluated at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, Samples]]]
+
+
+class Registry:
+    """All metric families plus scrape-time collectors, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Collector):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"❌ Metrics collector failed: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Hot path
+NEXT_VIDEO_SECONDS = Histogram("randomvideo_next_video_seconds", "Latency of VideoManager.get_next_video")
+REDIS_SECONDS = Histogram("randomvideo_redis_op_seconds", "Latency of RedisStorage operations", ["op"])
+DISCORD_SECONDS = Histogram("randomvideo_discord_call_seconds", "Latency of Discord message edits and followups",
+                            ["call"])
+
+# Catalog refresh
+FETCH_SECONDS = Histogram("randomvideo_fetch_seconds", "Latency of a source catalog fetch (fetch_videos)",
+                          ["source"])
+MERGE_SECONDS = Histogram("randomvideo_catalog_merge_seconds", "Latency of committing a fetched catalog change",
+                          ["source"])
+REFRESHES = Counter("randomvideo_catalog_refreshes_total", "Catalog fetches by outcome", ["source", "result"])
+
+# Link prefetch
+LINK_CHECKS = Counter("randomvideo_link_checks_total", "Prefetch reachability checks by result", ["result"])
+DEAD_LINKS_SKIPPED = Counter("randomvideo_dead_links_skipped_total", "Known-dead videos skipped when serving")
+
+ERRORS = Counter("randomvideo_errors_total", "Errors by component", ["component"])
+
+
+def watch_video_manager(manager, registry: Registry = REGISTRY) -> Collector:
+    """Expose a VideoManager's cache, write-behind and catalog state at scrape time"""
+    def collect():
+        cache = manager.get_cache_stats()
+        flush = manager.get_flush_stats()
+        yield ("randomvideo_users_in_memory", "gauge", "Users with queues in the in-memory cache",
+               [({}, cache["users"])])
+        yield ("randomvideo_queue_cache_bytes", "gauge", "Approximate size of the in-memory queue cache",
+               [({}, cache["bytes"])])
+        yield ("randomvideo_queue_cache_lookups_total", "counter", "Queue cache lookups by result",
+               [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+        yield ("randomvideo_queue_cache_evictions_total", "counter", "Users evicted from the queue cache by reason",
+               [({"reason": "size"}, cache["evictions"]), ({"reason": "idle"}, cache["expired"])])
+        yield ("randomvideo_pending_queue_writes", "gauge", "Queues waiting for the write-behind flush",
+               [({}, flush["pending"] + cache["pending_write_back"])])
+        yield ("randomvideo_catalog_videos", "gauge", "Live videos per source catalog",
+               [({"source": source["name"]}, source["videos"]) for source in manager.get_source_status()])
+
+    registry.add_collector(collect)
+    return collect
+
+
+class MetricsServer:
+    """Serves /metrics from the bot's own event loop (aiohttp, no extra thread)"""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 9100, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 binds an ephemeral port; report the real one
+        sockets = getattr(site._server, "sockets", None) or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        logger.info(f"📈 Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,176 @@
+"""
+Bounded in-memory cache of user queues (LRU + idle TTL) in front of Redis
+"""
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough per-queue cost beyond its ID array: object, dicts and cache bookkeeping
+QUEUE_OVERHEAD_BYTES = 400
+
+
+def estimate_queue_bytes(queue) -> int:
+    """Approximate resident size of one queue (dominated by its ID arrays, if any)
+
+    Besides the current round, a shuffled queue near its end may already
+    hold the next round's order.
+    """
+    size = QUEUE_OVERHEAD_BYTES
+    for attribute in ("queue", "_next_round"):
+        ids = getattr(queue, attribute, None)
+        if ids is not None:
+            size += sys.getsizeof(ids)
+    return size
+
+
+class UserQueueCache:
+    """User queues keyed by user then source, evicted least-recently-used first
+
+    Entries are whole users (all their sources plus their source choice),
+    ordered by last access, so per-user state is bounded by the same limits.
+    The choice is only known once set (by a switch, or restored from Redis
+    after a miss); a user without one is served the default source.
+    evict() drops users while the cache is over max_users or max_bytes, or
+    while the least recently used one has been idle longer than idle_ttl
+    seconds; the caller writes evicted queues back to Redis. A limit of 0
+    disables that bound. Plain lookups (get, [], in) neither touch the LRU
+    order nor count as hits; get_queue() does both.
+    """
+
+    def __init__(self, max_users: int = 0, max_bytes: int = 0, idle_ttl: float = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[int, Dict[str, object]]" = OrderedDict()
+        self._last_used: Dict[int, float] = {}
+        self._sizes: Dict[int, int] = {}
+        self._sources: Dict[int, Optional[str]] = {}  # Users' known source choices (None: default)
+        self.bytes = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def __getitem__(self, user_id: int) -> Dict[str, object]:
+        return self._entries[user_id]
+
+    def get(self, user_id: int, default=None):
+        return self._entries.get(user_id, default)
+
+    def items(self) -> List[Tuple[int, Dict[str, object]]]:
+        return list(self._entries.items())
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        self._last_used.clear()
+        self._sizes.clear()
+        self._sources.clear()
+        self.bytes = 0
+
+    def get_queue(self, user_id: int, source_url: str):
+        """Cached queue (marking the user as recently used), or None on a miss"""
+        source_queues = self._entries.get(user_id)
+        queue = source_queues.get(source_url) if source_queues else None
+        if queue is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        self._touch(user_id)
+        return queue
+
+    def put_queue(self, user_id: int, source_url: str, queue):
+        """Insert or replace a queue; call evict() afterwards to enforce the bounds"""
+        self._entries.setdefault(user_id, {})[source_url] = queue
+        self._touch(user_id)
+
+    def discard_queue(self, user_id: int, source_url: str) -> bool:
+        """Drop one queue (the user stays cached while it has others or a non-default source choice)"""
+        source_queues = self._entries.get(user_id)
+        if not source_queues or source_queues.pop(source_url, None) is None:
+            return False
+        if not source_queues and self._sources.get(user_id) is None:
+            self.pop(user_id)
+        return True
+
+    def get_source(self, user_id: int) -> Optional[str]:
+        """The user's source choice (None: default source, or not known since the user was cached)"""
+        return self._sources.get(user_id)
+
+    def has_source(self, user_id: int) -> bool:
+        """Whether the user's source choice is known (else it may still be stored in Redis)"""
+        return user_id in self._sources
+
+    def set_source(self, user_id: int, source_url: Optional[str]):
+        """Remember a source choice (None for the default); call evict() afterwards"""
+        if source_url is None:
+            if not self._entries.get(user_id):
+                # Nothing else to keep: not worth an entry of its own
+                self.pop(user_id)
+                return
+            self._sources[user_id] = None
+            self._touch(user_id)
+            return
+        self._entries.setdefault(user_id, {})
+        self._sources[user_id] = source_url
+        self._touch(user_id)
+
+    def pop(self, user_id: int) -> Optional[Dict[str, object]]:
+        source_queues = self._entries.pop(user_id, None)
+        self._sources.pop(user_id, None)
+        self._last_used.pop(user_id, None)
+        self.bytes -= self._sizes.pop(user_id, 0)
+        return source_queues
+
+    def _touch(self, user_id: int):
+        self._entries.move_to_end(user_id)
+        self._last_used[user_id] = self._clock()
+        # Sizes change with rounds and catalog updates: re-measure on use
+        size = sum(estimate_queue_bytes(queue) for queue in self._entries[user_id].values())
+        self.bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    def _over_capacity(self) -> bool:
+        return ((self.max_users and len(self._entries) > self.max_users) or
+                (self.max_bytes and self.bytes > self.max_bytes))
+
+    def evict(self, allow_idle: bool = True) -> List[Tuple[int, Dict[str, object]]]:
+        """Remove users over the bounds or idle too long; returns (user_id, {source_url: queue})"""
+        evicted = []
+        cutoff = self._clock() - self.idle_ttl if self.idle_ttl and allow_idle else None
+        while self._entries:
+            user_id = next(iter(self._entries))
+            if self._over_capacity():
+                self.stats["evictions"] += 1
+            elif cutoff is not None and self._last_used[user_id] < cutoff:
+                self.stats["expired"] += 1
+            else:
+                break
+            evicted.append((user_id, self.pop(user_id)))
+        return evicted
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["users"] = len(self._entries)
+        stats["queues"] = sum(len(source_queues) for source_queues in self._entries.values())
+        stats["bytes"] = self.bytes
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,96 @@
+"""
+Cross-replica user queue coherence: cached queues are dropped when another replica writes them
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from catalog_sync import make_instance_id
+from metrics import ERRORS
+from redis_storage import INVALIDATION_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class QueueInvalidations:
+    """Listens for queue writes by other replicas and drops the local copies
+
+    With an instance ID set on the storage, every queue write publishes its
+    key on INVALIDATION_CHANNEL inside the write's own MULTI/EXEC, so the
+    announcement costs no extra round trip. A replica receiving a write it
+    did not make drops its cached copy and reloads it on the next click.
+
+    Messages can arrive after a click has already used the stale copy; the
+    revision each write returns closes that gap (see VideoManager): a write
+    that finds the stored revision moved on is a conflict, and the click is
+    served again from the stored state. A user served by one replica only
+    never sees a message from elsewhere and keeps its cached queue.
+    """
+
+    def __init__(self, manager, client, instance_id: Optional[str] = None):
+        self.manager = manager
+        self.client = client
+        self.instance_id = instance_id or make_instance_id()
+        self._sources: Dict[str, str] = {}  # RedisStorage source key -> source URL
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "received": 0,
+            "invalidated": 0
+        }
+
+    async def start(self):
+        """Subscribe, then announce our own writes (so no write of ours is missed by the others)"""
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(INVALIDATION_CHANNEL)
+        self.manager.redis_storage.instance_id = self.instance_id
+        self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self):
+        self.manager.redis_storage.instance_id = None
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing queue invalidation pub/sub: {e}")
+            self._pubsub = None
+
+    async def _listen_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                ERRORS.labels("redis").inc()
+                logger.error(f"❌ Error handling queue invalidation: {e}")
+                await asyncio.sleep(1)
+
+    def handle(self, data: bytes):
+        """Apply one "{instance_id}|user_queue:{user_id}:{source_key}" announcement"""
+        instance_id, _, key = data.decode().partition("|")
+        if instance_id == self.instance_id:
+            return
+        self.stats["received"] += 1
+        _, user_id, source_key = key.split(":", 2)
+        source_url = self._source_url(source_key)
+        if source_url is not None and self.manager.invalidate_queue(int(user_id), source_url):
+            self.stats["invalidated"] += 1
+
+    def _source_url(self, source_key: str) -> Optional[str]:
+        source_url = self._sources.get(source_key)
+        if source_url is None or source_url not in self.manager.source_configs:
+            # Sources can be reconfigured at runtime: rebuild the mapping on a miss
+            storage = self.manager.redis_storage
+            self._sources = {storage._get_source_key(url): url for url in self.manager.sources}
+            source_url = self._sources.get(source_key)
+        return source_url
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
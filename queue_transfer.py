@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Export / import user queues as NDJSON (one queue per line)
+
+Streams through Redis in pipelined batches, so neither side ever holds the
+whole keyspace in memory. Useful to migrate state between Redis instances:
+
+    python queue_transfer.py export -o queues.ndjson
+    python queue_transfer.py import -i queues.ndjson --redis-url redis://new-host:6379
+
+Without --redis-url the usual REDIS_URL / REDISHOST settings are used.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import sys
+from typing import Dict, Optional
+
+from redis import asyncio as aioredis
+
+from redis_storage import IDS_FIELD, RedisStorage
+
+logger = logging.getLogger(__name__)
+
+
+def encode_record(record: Dict) -> str:
+    """One NDJSON line; packed ID arrays are base64 encoded"""
+    queue = dict(record["queue"])
+    if isinstance(queue.get(IDS_FIELD), bytes):
+        queue[IDS_FIELD] = base64.b64encode(queue[IDS_FIELD]).decode()
+    return json.dumps({**record, "queue": queue}, ensure_ascii=False)
+
+
+def decode_record(line: str) -> Dict:
+    """Inverse of encode_record()"""
+    record = json.loads(line)
+    queue = record["queue"]
+    if isinstance(queue.get(IDS_FIELD), str):
+        queue[IDS_FIELD] = base64.b64decode(queue[IDS_FIELD])
+    return record
+
+
+async def connect(redis_url: Optional[str]) -> RedisStorage:
+    client = aioredis.Redis.from_url(redis_url, decode_responses=False) if redis_url else None
+    storage = RedisStorage(client=client)
+    if not await storage.connect():
+        raise SystemExit("❌ Redis not available")
+    return storage
+
+
+async def export_queues(storage: RedisStorage, out, batch_size: int) -> int:
+    count = 0
+    async for record in storage.iter_user_queues(batch_size=batch_size):
+        out.write(encode_record(record) + "\n")
+        count += 1
+    return count
+
+
+async def import_queues(storage: RedisStorage, lines, batch_size: int) -> int:
+    count = 0
+    batch = []
+    for line in lines:
+        if not line.strip():
+            continue
+        batch.append(decode_record(line))
+        if len(batch) >= batch_size:
+            count += await write_batch(storage, batch)
+            batch = []
+    if batch:
+        count += await write_batch(storage, batch)
+    return count
+
+
+async def write_batch(storage: RedisStorage, batch) -> int:
+    if not await storage.write_user_queues(batch):
+        raise SystemExit(f"❌ Import failed after writing some queues (batch of {len(batch)})")
+    return len(batch)
+
+
+async def run(args) -> int:
+    storage = await connect(args.redis_url)
+    try:
+        if args.command == "export":
+            out = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+            try:
+                return await export_queues(storage, out, args.batch_size)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+
+        source = open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin
+        try:
+            return await import_queues(storage, source, args.batch_size)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    finally:
+        await storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--redis-url", help="Redis to use instead of the configured one")
+    parser.add_argument("--batch-size", type=int, default=500, help="Queues per pipelined round trip")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write all queues as NDJSON")
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    import_parser = commands.add_parser("import", help="Load queues from NDJSON")
+    import_parser.add_argument("-i", "--input", default="-", help="Input file (default: stdin)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    count = asyncio.run(run(args))
+    print(f"✅ {args.command.capitalize()}ed {count} queues", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
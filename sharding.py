@@ -0,0 +1,127 @@
+"""
+Multi-process sharded deployment: shard planning and worker supervision
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Mapping, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Restart backoff for crashed workers; a worker that stayed up this long starts over at the minimum
+RESTART_DELAY_SECONDS = 5.0
+MAX_RESTART_DELAY_SECONDS = 300.0
+STABLE_RUN_SECONDS = 60.0
+
+
+def plan_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Split shard IDs 0..shard_count-1 into contiguous ranges, one per worker process"""
+    if shard_count < 1 or workers < 1:
+        raise ValueError("shard_count and workers must be at least 1")
+    workers = min(workers, shard_count)
+    base, extra = divmod(shard_count, workers)
+    plan = []
+    start = 0
+    for index in range(workers):
+        size = base + (1 if index < extra else 0)
+        plan.append(list(range(start, start + size)))
+        start += size
+    return plan
+
+
+def worker_env(base_env: Mapping[str, str], index: int, shard_ids: Sequence[int], shard_count: int) -> Dict[str, str]:
+    """Environment for one worker process
+
+    Besides its shard range, a worker defaults to write-through queue saves
+    with queue coherence (Redis holds the authoritative queue state once
+    several processes serve users, and a user may click in guilds served by
+    different workers) and no startup warm-up (a worker only caches users
+    it serves).
+    An explicit setting in the environment always wins. Metrics ports are
+    offset by the worker index so every worker can be scraped.
+    """
+    env = dict(base_env)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    env["WORKER_INDEX"] = str(index)
+    env.setdefault("QUEUE_FLUSH_INTERVAL", "0")
+    env.setdefault("QUEUE_COHERENCE", "true")
+    env.setdefault("WARMUP_MAX_USERS", "0")
+    if int(env.get("METRICS_PORT") or 0):
+        env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + index)
+    return env
+
+
+def parse_shard_ids(raw: Optional[str]) -> Optional[List[int]]:
+    """SHARD_IDS: comma separated shard IDs ("0,1,2"); None if unset"""
+    if not raw:
+        return None
+    return [int(part) for part in raw.split(",") if part.strip()]
+
+
+class WorkerSupervisor:
+    """Runs one child process per shard range and restarts those that exit
+
+    Crashed workers are restarted with exponential backoff. stop() sends
+    SIGTERM to every worker and waits for them to exit.
+    """
+
+    def __init__(self, argv: Sequence[str], envs: Sequence[Mapping[str, str]],
+                 restart_delay: float = RESTART_DELAY_SECONDS,
+                 max_restart_delay: float = MAX_RESTART_DELAY_SECONDS,
+                 stop_timeout: float = 30.0):
+        self.argv = list(argv)
+        self.envs = [dict(env) for env in envs]
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stop_timeout = stop_timeout
+        self.processes: Dict[int, asyncio.subprocess.Process] = {}
+        self.restarts = [0] * len(self.envs)
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        """Supervise all workers until stop() is called"""
+        await asyncio.gather(*(self._supervise(index) for index in range(len(self.envs))))
+
+    async def _supervise(self, index: int):
+        delay = self.restart_delay
+        env = self.envs[index]
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(*self.argv, env=env)
+            self.processes[index] = process
+            logger.info(f"🚀 Worker {index} (shards {env.get('SHARD_IDS')}) started with PID {process.pid}")
+            code = await process.wait()
+            if self._stopping.is_set():
+                break
+
+            self.restarts[index] += 1
+            if time.monotonic() - started >= STABLE_RUN_SECONDS:
+                delay = self.restart_delay
+            logger.error(f"❌ Worker {index} exited with code {code}, restarting in {delay:.0f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_restart_delay)
+
+    async def stop(self):
+        """Terminate every worker (SIGTERM, then SIGKILL after stop_timeout)"""
+        self._stopping.set()
+        running = [process for process in self.processes.values() if process.returncode is None]
+        for process in running:
+            process.terminate()
+        for process in running:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=self.stop_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️  Worker PID {process.pid} did not stop, killing it")
+                process.kill()
+                await process.wait()
+
+
+def launcher_argv() -> List[str]:
+    """Command a worker runs: this interpreter on the same entry point"""
+    return [sys.executable, os.path.abspath(sys.argv[0])]
@@ -38,7 +38,7 @@ async def test_video_merging():
 
     # Create a user queue and get 1 video
     user_id = 123
-    video1 = manager.get_next_video(user_id)
+    video1 = await manager.get_next_video(user_id)
     print(f"\n👤 User {user_id} watched: {video1}")
 
     print(f"\n📊 Queue status before update:")
@@ -61,9 +61,10 @@ async def test_video_merging():
     print(f"  Total: {status['total_videos']}, Remaining: {status['videos_remaining']}")
 
     # Get user queue
-    user_queue = manager.user_queues[user_id]
+    user_queue = manager.user_queues[user_id][manager.json_url]
     print(f"\n📜 Current user queue:")
-    for i, v in enumerate(user_queue.queue):
+    for i, video_id in enumerate(user_queue.queue):
+        v = manager.catalog.url(video_id)
         played = "✅" if i < user_queue.current_index else "⏳"
         print(f"  {played} [{i}] {v}")
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test the interned catalog and streaming manifest ingestion
+"""
+import json
+import pytest
+from catalog import NO_ID, Catalog, CatalogStreamParser, iter_catalog_urls, render_video_message
+
+
+def parse_in_chunks(text: str, size: int) -> list:
+    parser = CatalogStreamParser()
+    urls = []
+    for i in range(0, len(text), size):
+        urls += parser.feed(text[i:i + size])
+    return urls + parser.close()
+
+
+def test_ids_are_stable_across_updates():
+    catalog = Catalog(["a", "b", "c"])
+    ids = dict(catalog.ids)
+
+    added, removed = catalog.update(["c", "d", "a"])
+    assert added == [catalog.ids["d"]]
+    assert removed == {ids["b"]}
+    assert catalog.url(ids["b"]) is None
+
+    # A returning URL gets its old ID back
+    added, _ = catalog.update(["a", "b", "c", "d"])
+    assert added == [ids["b"]]
+    assert catalog.url(ids["b"]) == "b"
+    assert catalog.video_urls() == ["a", "b", "c", "d"]
+
+
+def test_uncommitted_update_is_invisible():
+    catalog = Catalog(["a"])
+    update = catalog.begin_update()
+    update.add("a")
+    update.add("new")
+
+    assert catalog.url(catalog.ids["new"]) is None
+    assert len(catalog) == 1
+
+    update.commit()
+    assert catalog.url(catalog.ids["new"]) == "new"
+
+
+def test_messages_rendered_at_ingestion_and_kept_in_sync():
+    url = "https://example.com/%E8%A7%86%E9%A2%91_one.mp4"
+    catalog = Catalog([url, "https://example.com/two.webm"])
+    assert catalog._messages[url] == f"**📹 视频 one**\n{url}"
+    assert catalog.message(url) is catalog._messages[url]
+
+    catalog.update(["https://example.com/two.webm", "https://example.com/three.MP4"])
+    assert url not in catalog._messages
+    assert catalog.message("https://example.com/three.MP4").startswith("**📹 three**")
+    # URLs outside the catalog still render, without being cached
+    assert catalog.message(url) == render_video_message(url)
+    assert len(catalog._messages) == len(catalog)
+
+
+def test_delta_log_composes_changes_since_a_version():
+    catalog = Catalog(["a", "b", "c"])
+    base = catalog.version
+    a, b, c = (catalog.ids[u] for u in "abc")
+
+    catalog.update(["a", "c", "d"])       # -b +d
+    catalog.update(["a", "b", "c", "d"])  # +b (re-added)
+    catalog.update(["a", "b", "d", "e"])  # -c +e
+    d, e = catalog.ids["d"], catalog.ids["e"]
+
+    assert catalog.version == base + 3
+    assert catalog.changes_since(base) == ([d, e], {c})
+    assert catalog.changes_since(catalog.version) == ([], set())
+
+    # An update without changes does not bump the version
+    catalog.update(["a", "b", "d", "e"])
+    assert catalog.version == base + 3
+
+
+def test_delta_log_is_bounded():
+    catalog = Catalog(["a"])
+    base = catalog.version
+    for i in range(Catalog.MAX_DELTAS + 1):
+        catalog.update(["a", f"v{i}"])
+
+    assert catalog.changes_since(base) is None
+    assert catalog.changes_since(catalog.version - Catalog.MAX_DELTAS) is not None
+
+
+def test_discarded_update_releases_its_ids():
+    catalog = Catalog(["a"])
+    update = catalog.begin_update()
+    update.add("a")
+    update.add("new")
+    update.discard()
+    assert catalog.id_count == 1 and "new" not in catalog.ids
+
+    # IDs interned by a later update are left for compaction instead
+    first, second = catalog.begin_update(), catalog.begin_update()
+    first.add("x")
+    second.add("y")
+    first.discard()
+    assert catalog.id_count == 3
+    second.commit()
+    assert catalog.video_urls() == ["y"]
+
+
+def test_churn_keeps_id_space_compact(monkeypatch):
+    monkeypatch.setattr(Catalog, "COMPACT_MIN_TOMBSTONES", 0)
+    catalog = Catalog(f"r0-{i}" for i in range(100))
+    for generation in range(1, 51):
+        catalog.update(f"r{generation}-{i}" for i in range(100))
+        assert catalog.id_count <= 3 * len(catalog)
+    assert len(catalog.ids) == catalog.id_count
+
+
+def test_compaction_is_logged_as_an_id_remap(monkeypatch):
+    monkeypatch.setattr(Catalog, "COMPACT_MIN_TOMBSTONES", 0)
+    catalog = Catalog(["a", "b", "c", "d"])
+    base = catalog.version
+    old_c = catalog.ids["c"]
+
+    catalog.update(["c"])       # Three removed slots, one live
+    catalog.update(["c", "e"])  # Compacts before interning "e"
+    assert catalog.entries() == ["c", "e"]
+
+    remap = catalog.remap_since(base)
+    assert remap[old_c] == catalog.ids["c"] and remap[0] == NO_ID
+    assert catalog.changes_since(base) is None  # IDs were renumbered in between
+    (_, _, removed), (step_remap, added, _) = catalog.steps_since(base)
+    assert removed == {0, 1, 3} and step_remap is remap and added == [catalog.ids["e"]]
+    assert catalog.remap_since(catalog.version) is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64, 10_000])
+def test_json_array_parsed_across_chunk_boundaries(chunk_size):
+    urls = [f"https://example.com/视频_{i}.mp4" for i in range(20)] + ['quote"and\\\\slash']
+    text = json.dumps(urls, ensure_ascii=chunk_size % 2 == 0, indent=chunk_size % 3 or None)
+
+    assert parse_in_chunks(text, chunk_size) == urls
+
+
+def test_json_lines_manifest():
+    text = 'https://example.com/a.mp4\n"https://example.com/b.mp4"\n\nhttps://example.com/c.mp4'
+    assert parse_in_chunks(text, 3) == [
+        "https://example.com/a.mp4", "https://example.com/b.mp4", "https://example.com/c.mp4"
+    ]
+
+
+def test_non_string_entries_skipped():
+    assert parse_in_chunks('[1, "a", {"x": 2}, null, "b"]', 4) == ["a", "b"]
+
+
+def test_truncated_array_rejected():
+    with pytest.raises(ValueError):
+        parse_in_chunks('["a", "b"', 3)
+
+
+async def test_iter_catalog_urls_handles_split_utf8():
+    data = json.dumps(["视频一", "视频二"], ensure_ascii=False).encode()
+
+    async def chunks():
+        for i in range(len(data)):
+            yield data[i:i + 1]
+
+    assert [url async for url in iter_catalog_urls(chunks())] == ["视频一", "视频二"]
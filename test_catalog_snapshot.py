@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test on-disk catalog snapshots (cold start and offline fallback)
+"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from catalog import Catalog
+from catalog_snapshot import FORMAT_VERSION, capture_snapshot, load_snapshot, write_snapshot
+
+
+def save(catalog: Catalog, path: str, meta: dict = None):
+    strings, live_ids = capture_snapshot(catalog)
+    write_snapshot(path, strings, live_ids, meta or {})
+
+
+def test_roundtrip_preserves_ids_and_removed_entries(tmp_path):
+    catalog = Catalog(["a", "b", "视频c"])
+    catalog.update(["a", "视频c", "d"])
+    path = str(tmp_path / "cat.bin")
+    save(catalog, path, {"source_url": "x"})
+
+    snapshot = load_snapshot(path)
+    restored = Catalog.from_snapshot(snapshot)
+    assert snapshot.meta == {"source_url": "x"}
+    assert list(restored.live_ids) == list(catalog.live_ids)
+    assert restored.url(catalog.ids["视频c"]) == "视频c"
+    assert restored.url(catalog.ids["b"]) is None
+
+    # The first update decodes the tables; removed URLs keep their IDs
+    added, _ = restored.update(["a", "b"])
+    assert added == [catalog.ids["b"]]
+    assert restored.ids == catalog.ids
+
+
+def test_snapshot_catalog_renders_messages_lazily(tmp_path):
+    catalog = Catalog(["https://example.com/a_b.mp4", "https://example.com/c.mp4"])
+    path = str(tmp_path / "cat.bin")
+    save(catalog, path)
+
+    restored = Catalog.from_snapshot(load_snapshot(path))
+    assert restored.message("https://example.com/a_b.mp4") == catalog.message("https://example.com/a_b.mp4")
+    assert len(restored._messages) == 1
+
+    restored.update(["https://example.com/c.mp4", "https://example.com/d.mp4"])
+    # Materializing fills in the remaining live entries and drops removed ones
+    assert sorted(restored._messages) == ["https://example.com/c.mp4", "https://example.com/d.mp4"]
+
+
+def test_corrupt_snapshot_ignored(tmp_path):
+    path = str(tmp_path / "cat.bin")
+    save(Catalog(["a", "b"]), path)
+
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"X")
+
+    assert load_snapshot(path) is None
+
+
+def test_concurrent_writers_never_clash(tmp_path):
+    path = str(tmp_path / "cat.bin")
+    catalogs = [Catalog(f"v{i}-{j}" for j in range(2000)) for i in range(4)]
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda catalog: save(catalog, path), catalogs * 3))
+
+    snapshot = load_snapshot(path)
+    assert snapshot is not None and snapshot.id_count == 2000
+    snapshot.close()
+    assert os.listdir(tmp_path) == ["cat.bin"]
+
+
+def test_other_format_version_ignored(tmp_path):
+    path = str(tmp_path / "cat.bin")
+    save(Catalog(["a"]), path)
+
+    with open(path, "r+b") as f:
+        f.seek(8)
+        f.write(struct.pack("<H", FORMAT_VERSION + 1))
+
+    assert load_snapshot(path) is None
+    assert load_snapshot(str(tmp_path / "missing.bin")) is None
+
+
+async def test_fetch_saves_snapshot_and_cold_start_serves_from_it(catalog_server, tmp_path, offline_manager):
+    server, url = await catalog_server(["a.mp4", "b.mp4", "c.mp4"])
+    manager = offline_manager(url, snapshot_dir=str(tmp_path))
+    assert await manager.fetch_videos()
+    await manager.close()
+
+    restarted = offline_manager(url, snapshot_dir=str(tmp_path))
+    assert restarted.load_snapshot()
+    assert await restarted.get_next_video(1) in {"a.mp4", "b.mp4", "c.mp4"}
+
+    # Reconciling fetch reuses the snapshot's validators
+    assert await restarted.fetch_videos(merge_new=True)
+    assert restarted.get_fetch_stats()["not_modified"] == 1
+    await restarted.close()
+
+
+async def test_snapshot_of_other_source_not_loaded(catalog_server, tmp_path, offline_manager):
+    server, url = await catalog_server(["a.mp4"])
+    manager = offline_manager(url, snapshot_dir=str(tmp_path))
+    await manager.fetch_videos()
+    await manager.close()
+
+    other = offline_manager(url + "?v=2", snapshot_dir=str(tmp_path))
+    assert not other.load_snapshot()
+
+
+async def test_ids_survive_restart_via_snapshot(catalog_server, tmp_path, offline_manager):
+    server, url = await catalog_server(["a.mp4", "b.mp4"])
+    manager = offline_manager(url, snapshot_dir=str(tmp_path))
+    await manager.fetch_videos()
+    server.videos = ["b.mp4", "c.mp4"]
+    await manager.fetch_videos(merge_new=True)
+    ids = dict(manager.catalog.ids)
+    await manager.close()
+
+    restarted = offline_manager(url, snapshot_dir=str(tmp_path))
+    restarted.load_snapshot()
+    server.videos = ["a.mp4", "c.mp4", "b.mp4"]
+    await restarted.fetch_videos(merge_new=True)
+
+    assert restarted.catalog.ids == ids
+    await restarted.close()
+
+
+async def test_snapshot_mapping_released_with_its_catalog(catalog_server, tmp_path, offline_manager):
+    _, url = await catalog_server(["a.mp4"])
+    _, other_url = await catalog_server(["b.mp4"])
+    manager = offline_manager(url, sources=[other_url], snapshot_dir=str(tmp_path))
+    await manager.fetch_all()
+    await manager.close()
+
+    restarted = offline_manager(url, sources=[other_url], snapshot_dir=str(tmp_path))
+    assert restarted.load_snapshots() == [url, other_url]
+    dropped, kept = restarted._catalog_for(other_url)._snapshot, restarted.catalog._snapshot
+
+    restarted.set_sources(url, [])  # Dropped source
+    assert dropped._mmap is None and kept._mmap is not None
+    await restarted.close()
+    assert kept._mmap is None
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test refresh leader election and catalog fan-out between replicas sharing one Redis
+"""
+import asyncio
+from catalog import Catalog
+from catalog_sync import RefreshLease
+
+LEASE_SECONDS = 0.3
+
+
+def test_catalog_applies_url_deltas():
+    catalog = Catalog(["a", "b", "c"])
+    added, removed = catalog.apply_changes(["d"], ["b"])
+    assert catalog.video_urls() == ["a", "c", "d"]
+    assert [catalog.url(video_id) for video_id in added] == ["d"] and removed == {1}
+
+
+async def test_lease_is_exclusive_and_owner_checked(redis_clients):
+    client = redis_clients()
+    first = RefreshLease(client, "catalog_leader:test", "first", LEASE_SECONDS)
+    second = RefreshLease(client, "catalog_leader:test", "second", LEASE_SECONDS)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    assert await first.acquire()  # Renewal
+
+    await asyncio.sleep(LEASE_SECONDS * 1.5)  # Expired without renewal
+    assert await second.acquire()
+    await first.release()  # No longer the owner: must not delete the successor's lease
+    assert await client.get("catalog_leader:test") == b"second"
+
+
+async def test_only_the_leader_fetches_and_followers_apply_deltas(redis_manager, catalog_server, wait_for):
+    server, url = await catalog_server(["a.mp4", "b.mp4", "c.mp4"])
+    leader = await redis_manager(url, leader_lease_seconds=LEASE_SECONDS)
+    follower = await redis_manager(url, leader_lease_seconds=LEASE_SECONDS)
+    try:
+        assert leader.catalog_sync.is_leader(url)
+        assert not follower.catalog_sync.is_leader(url)
+
+        assert await leader.fetch_videos()
+        assert await follower.fetch_videos()  # Loads the published manifest
+        assert server.requests == 1
+        assert follower.all_videos == ["a.mp4", "b.mp4", "c.mp4"]
+
+        # A queue on the follower catches up with the applied delta like with a local refresh
+        await follower.get_next_video(1)
+        server.videos = ["a.mp4", "c.mp4", "d.mp4"]
+        assert await leader.fetch_videos(merge_new=True)
+        assert await wait_for(lambda: follower.all_videos == ["a.mp4", "c.mp4", "d.mp4"])
+        assert follower.catalog_sync.stats["deltas_applied"] == 1
+
+        assert await follower.fetch_videos(merge_new=True)  # Scheduled refresh: version check only
+        assert server.requests == 2
+        assert follower.get_queue_status(1)["queue_size"] == 3
+    finally:
+        await leader.close()
+        await follower.close()
+
+
+async def test_follower_resyncs_after_missing_updates(redis_manager, catalog_server):
+    server, url = await catalog_server(["a.mp4"])
+    leader = await redis_manager(url, leader_lease_seconds=LEASE_SECONDS)
+    follower = await redis_manager(url, leader_lease_seconds=LEASE_SECONDS)
+    try:
+        await leader.fetch_videos()
+        await follower.fetch_videos()
+
+        await follower.catalog_sync.stop(release=False)  # Deaf to pub/sub from here on
+        for videos in (["a.mp4", "b.mp4"], ["b.mp4", "c.mp4"]):
+            server.videos = videos
+            await leader.fetch_videos(merge_new=True)
+
+        assert await follower.fetch_videos(merge_new=True)
+        assert follower.all_videos == ["b.mp4", "c.mp4"]
+        assert server.requests == 3
+    finally:
+        await leader.close()
+        await follower.close()
+
+
+async def test_failover_within_one_lease_period(redis_manager, catalog_server, wait_for):
+    server, url = await catalog_server(["a.mp4", "b.mp4"])
+    leader = await redis_manager(url, leader_lease_seconds=LEASE_SECONDS)
+    follower = await redis_manager(url, leader_lease_seconds=LEASE_SECONDS)
+    try:
+        await leader.fetch_videos()
+        await follower.fetch_videos()
+
+        # Leader crashes: it stops renewing without releasing its lease
+        await leader.catalog_sync.stop(release=False)
+        start = asyncio.get_running_loop().time()
+        assert await wait_for(lambda: follower.catalog_sync.is_leader(url))
+        assert asyncio.get_running_loop().time() - start <= LEASE_SECONDS
+
+        server.videos = ["a.mp4", "b.mp4", "c.mp4"]
+        assert await follower.fetch_videos(merge_new=True)
+        assert server.requests == 2
+        assert follower.all_videos == ["a.mp4", "b.mp4", "c.mp4"]
+    finally:
+        await leader.close()
+        await follower.close()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test conditional catalog fetching against a local aiohttp stand-in server
+"""
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+async def test_not_modified_short_circuits(catalog_server, offline_manager):
+    catalog, url = await catalog_server(["a.mp4", "b.mp4"])
+    manager = offline_manager(url)
+
+    assert await manager.fetch_videos()
+    assert await manager.fetch_videos(merge_new=True)
+    assert await manager.fetch_videos(merge_new=True)
+
+    stats = manager.get_fetch_stats()
+    assert catalog.conditional_requests == 2
+    assert stats["not_modified"] == 2
+    assert stats["bytes_saved"] == 2 * stats["bytes_downloaded"]
+    assert stats["not_modified_rate"] == pytest.approx(2 / 3)
+    assert manager.all_videos == ["a.mp4", "b.mp4"]
+    await manager.close()
+
+
+async def test_changed_catalog_is_merged(catalog_server, offline_manager):
+    catalog, url = await catalog_server(["a.mp4", "b.mp4"])
+    manager = offline_manager(url)
+    await manager.fetch_videos()
+
+    catalog.videos = ["a.mp4", "c.mp4"]
+    assert await manager.fetch_videos(merge_new=True)
+
+    assert manager.all_videos == ["a.mp4", "c.mp4"]
+    assert manager.get_fetch_stats()["not_modified"] == 0
+    await manager.close()
+
+
+async def test_unchanged_body_skips_merge_without_etag(catalog_server, offline_manager):
+    catalog, url = await catalog_server(["a.mp4", "b.mp4"], use_etag=False)
+    manager = offline_manager(url)
+    await manager.fetch_videos()
+
+    merged = []
+    original_merge = manager._merge_new_videos
+
+    async def tracking_merge(videos):
+        merged.append(videos)
+        await original_merge(videos)
+
+    manager._merge_new_videos = tracking_merge
+    assert await manager.fetch_videos(merge_new=True)
+
+    assert merged == []
+    assert manager.get_fetch_stats()["unchanged_body"] == 1
+    await manager.close()
+
+
+async def test_session_is_reused(catalog_server, offline_manager):
+    _, url = await catalog_server(["a.mp4"])
+    manager = offline_manager(url)
+
+    await manager.fetch_videos()
+    session = manager._session
+    await manager.fetch_videos(merge_new=True)
+
+    assert manager._session is session
+    await manager.close()
+    assert session.closed
+
+
+async def test_http_error_reported(catalog_server, offline_manager):
+    _, url = await catalog_server(["a.mp4"])
+    manager = offline_manager(url.replace("/videos.json", "/missing.json"))
+
+    assert not await manager.fetch_videos()
+    assert manager.get_fetch_stats()["errors"] == 1
+    await manager.close()
+
+
+async def test_json_lines_manifest_streamed(offline_manager):
+    async def handle(request):
+        return web.Response(text="a.mp4\nb.mp4\nc.mp4\n", content_type="application/x-ndjson")
+
+    app = web.Application()
+    app.router.add_get("/videos.jsonl", handle)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        manager = offline_manager(str(server.make_url("/videos.jsonl")))
+        assert await manager.fetch_videos()
+        assert manager.all_videos == ["a.mp4", "b.mp4", "c.mp4"]
+        assert manager.get_fetch_stats()["bytes_downloaded"] == len("a.mp4\nb.mp4\nc.mp4\n")
+        await manager.close()
+    finally:
+        await server.close()
+
+
+async def test_broken_stream_releases_interned_ids(offline_manager):
+    async def handle(request):
+        return web.Response(text='["a.mp4", "b.mp4", "new1.mp4", "new2.mp4"', content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/videos.json", handle)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        manager = offline_manager(str(server.make_url("/videos.json")), ["a.mp4", "b.mp4"])
+        assert not await manager.fetch_videos(merge_new=True)  # Truncated JSON array
+        assert manager.catalog.id_count == 2
+        assert "new1.mp4" not in manager.catalog.ids
+        await manager.close()
+    finally:
+        await server.close()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test that catalog refreshes are applied lazily when a user queue is next used
+"""
+from catalog import Catalog
+from video_manager import PermutationQueue, UserQueue
+
+
+async def test_refresh_does_not_touch_user_queues(catalog_server, offline_manager):
+    server, url = await catalog_server(["a.mp4", "b.mp4", "c.mp4"])
+    manager = offline_manager(url)
+    await manager.fetch_videos()
+    for user_id in range(50):
+        await manager.get_next_video(user_id)
+
+    server.videos = ["a.mp4", "c.mp4", "d.mp4"]
+    await manager.fetch_videos(merge_new=True)
+
+    # Queues still reflect the old version until used
+    catalog = manager.catalog
+    queue = manager.user_queues[7][url]
+    assert queue.catalog_version == catalog.version - 1
+    assert len(queue.queue) == 3
+
+    served = {await manager.get_next_video(7) for _ in range(2)}
+    assert queue.catalog_version == catalog.version
+    assert catalog.ids["b.mp4"] not in queue.queue
+    assert catalog.ids["d.mp4"] in queue.queue
+    assert "b.mp4" not in served
+    await manager.close()
+
+
+def test_sync_catches_up_over_several_versions():
+    catalog = Catalog(["a", "b", "c", "d"])
+    queue = UserQueue(catalog)
+    queue.next_video(catalog)
+    queue.next_video(catalog)
+    played = [catalog.url(v) for v in queue.queue[:2]]
+
+    catalog.update(["a", "b", "c", "d", "e"])
+    catalog.update([u for u in ["a", "b", "c", "d", "e", "f"] if u != played[0]])
+
+    assert queue.sync(catalog)
+    assert sorted(catalog.url(v) for v in queue.queue) == sorted(catalog.video_urls())
+    assert queue.current_index == 1  # The removed played video shifts the cursor back
+    assert not queue.sync(catalog)
+
+
+def test_next_round_drawn_early_follows_later_changes():
+    catalog = Catalog(["a", "b", "c", "d"])
+    queue = UserQueue(catalog)
+    for _ in range(3):
+        queue.next_video(catalog)
+    drawn = queue.upcoming(catalog, 5)[1:]  # After this round's last video: the whole next round
+
+    catalog.update(["a", "b", "d", "e"])
+    queue.sync(catalog)
+    while not queue.exhausted:
+        queue.next_video(catalog)
+    next_round = [queue.next_video(catalog) for _ in range(4)]
+    # Drawn order kept for videos still live; new ones are shuffled in after them
+    assert next_round == [url for url in drawn if url != "c"] + ["e"]
+
+
+def test_queue_beyond_delta_log_is_repaired_by_diff():
+    catalog = Catalog(["a", "b", "c"])
+    queue = UserQueue(catalog)
+    queue.next_video(catalog)
+    for i in range(Catalog.MAX_DELTAS + 1):
+        catalog.update(["a", "c", f"v{i}"])
+
+    assert queue.sync(catalog)
+    assert sorted(queue.queue) == sorted(catalog.live_ids)
+    assert catalog.ids["b"] not in queue.queue
+
+
+def test_queue_keeps_progress_across_compaction(monkeypatch):
+    monkeypatch.setattr(Catalog, "COMPACT_MIN_TOMBSTONES", 0)
+    keep = [f"keep{i}" for i in range(10)]
+    catalog = Catalog(keep + [f"gone{i}" for i in range(30)])
+    queue = UserQueue(catalog)
+    watched = [queue.next_video(catalog) for _ in range(15)]
+
+    catalog.update(keep)
+    catalog.update(keep + ["new"])  # Compacted: every ID renumbered
+    assert catalog.id_count == 11
+
+    assert queue.sync(catalog)
+    unplayed = set(keep) - set(watched)
+    assert sorted(queue.next_video(catalog) for _ in range(len(unplayed) + 1)) == sorted(unplayed | {"new"})
+
+
+def test_permutation_queue_sync_is_free():
+    catalog = Catalog(["a", "b"])
+    queue = PermutationQueue(catalog)
+    catalog.update(["a", "b", "c"])
+
+    assert not queue.sync(catalog)
+    assert queue.catalog_version == catalog.version
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test background link checks and dead-link skipping against a local video host stand-in
+"""
+import asyncio
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from link_checker import LinkChecker
+from video_manager import UserQueue
+
+SOURCE_URL = "https://example.com/videos.json"
+
+
+class VideoHost:
+    """Answers HEAD requests: /ok/* with 200, /gone/* with 404, /flaky/* with 503"""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            status = {"ok": 200, "gone": 404, "flaky": 503}[request.match_info["kind"]]
+            return web.Response(status=status)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+async def video_host():
+    host = VideoHost()
+    app = web.Application()
+    app.router.add_route("HEAD", "/{kind}/{name}", host.handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield host, str(server.make_url("/"))
+    await server.close()
+
+
+@pytest.fixture
+async def session():
+    async with aiohttp.ClientSession() as client_session:
+        yield client_session
+
+
+async def test_results_are_cached_until_they_expire(video_host, session):
+    host, base = video_host
+    now = [0.0]
+    checker = LinkChecker(lambda: session, ttl=60, clock=lambda: now[0])
+    urls = [f"{base}ok/a.mp4", f"{base}gone/b.mp4", f"{base}flaky/c.mp4"]
+
+    checker.schedule(urls)
+    await checker.join()
+    assert [checker.status(url) for url in urls] == [True, False, None]
+    assert checker.is_dead(urls[1]) and not checker.is_dead(urls[2])
+
+    checker.schedule(urls[:2])  # Fresh results: nothing to do
+    await checker.join()
+    assert host.requests == 3
+
+    now[0] = 61  # Expired: checked again
+    checker.schedule(urls[:2])
+    await checker.join()
+    assert host.requests == 5
+    await checker.close()
+
+
+async def test_checks_are_bounded_and_deduplicated(video_host, session):
+    host, base = video_host
+    host.delay = 0.05
+    checker = LinkChecker(lambda: session, concurrency=3)
+    urls = [f"{base}ok/{i}.mp4" for i in range(12)]
+
+    checker.schedule(urls)
+    checker.schedule(urls)  # Already queued
+    await checker.join()
+    assert host.requests == 12
+    assert host.max_in_flight == 3
+    await checker.close()
+
+
+async def test_manager_skips_known_dead_links(video_host, offline_manager):
+    host, base = video_host
+    alive = [f"{base}ok/{i}.mp4" for i in range(6)]
+    dead = [f"{base}gone/{i}.mp4" for i in range(6)]
+    manager = offline_manager(f"{base}videos.json", alive + dead, prefetch_ahead=12)
+    catalog = manager.catalog
+    # Constructed order: the first pick is dead and unchecked, dead and alive alternate
+    order = [catalog.ids[url] for pair in zip(dead, alive) for url in pair]
+    manager._cache_queue(1, manager.json_url, UserQueue(catalog, order))
+
+    assert await manager.get_next_video(1) == dead[0]  # Unchecked yet, but it is checked now
+    await manager.link_checker.join()
+    assert host.requests == 12  # The served link, the rest of the round and the next round's start
+    assert manager.link_checker.is_dead(dead[0])
+
+    served = [await manager.get_next_video(1) for _ in range(10)]
+    assert all(url in alive for url in served)
+    assert manager.link_checker.get_stats()["skipped"] >= 5
+    await manager.close()
+
+
+@pytest.mark.parametrize("queue_mode", ["shuffle", "permutation"])
+async def test_prefetch_reaches_into_the_next_round(queue_mode, offline_manager):
+    videos = [f"https://example.com/video{i}.mp4" for i in range(8)]
+    manager = offline_manager(SOURCE_URL, videos, queue_mode=queue_mode)
+    catalog = manager.catalog
+    for _ in range(6):
+        await manager.get_next_video(1)
+    user_queue = manager.user_queues[1][SOURCE_URL]
+
+    upcoming = user_queue.upcoming(catalog, 5)
+    assert len(upcoming) == 5
+    # Two videos left in this round, then the start of the next one, in serving order
+    assert [user_queue.next_video(catalog) for _ in range(5)] == upcoming
+    await manager.close()
+
+
+async def test_link_checks_use_the_shared_session(video_host, offline_manager):
+    _, base = video_host
+    manager = offline_manager(f"{base}videos.json", [f"{base}ok/{i}.mp4" for i in range(4)], prefetch_ahead=2)
+
+    await manager.get_next_video(1)
+    await manager.link_checker.join()
+    session = manager._get_session()
+    await manager.get_next_video(1)
+    await manager.link_checker.join()
+    assert manager._get_session() is session
+    assert manager.link_checker.get_stats()["alive"] == 4  # Served videos are checked too
+    await manager.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test the metrics registry, Prometheus rendering, hot-path instrumentation and endpoint
+"""
+import time
+import aiohttp
+import pytest
+from metrics import (Counter, Histogram, MetricsServer, NEXT_VIDEO_SECONDS, REDIS_SECONDS, REFRESHES,
+                     Registry, _Metric, watch_video_manager)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = Histogram("demo_seconds", "Demo latency", ["op"], buckets=(0.1, 1.0), registry=registry)
+    child = histogram.labels('say "hi"')
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{op="say \\"hi\\"",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{op="say \\"hi\\"",le="1.0"} 3' in text
+    assert 'demo_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{op="say \\"hi\\""} 4' in text
+    assert child.sum == pytest.approx(3.65)
+
+
+def test_counter_labels_are_checked():
+    registry = Registry()
+    counter = Counter("demo_total", "Demo", ["result"], registry=registry)
+    counter.labels("ok").inc()
+    counter.labels("ok").inc(2)
+    assert "demo_total{result=\"ok\"} 3" in registry.render()
+
+    with pytest.raises(ValueError):
+        counter.labels("ok", "extra")
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        Counter("demo_total", "Duplicate", registry=registry)
+
+
+def test_metric_family_without_children_fails_on_creation():
+    class Incomplete(_Metric):
+        type_name = "untyped"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete_total", "Incomplete", registry=Registry())
+
+
+def test_observation_overhead_is_microseconds():
+    child = Histogram("overhead_seconds", "Overhead", registry=Registry()).labels()
+    rounds = 100_000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        child.observe(0.0003)
+    per_observation = (time.perf_counter() - start) / rounds
+    assert per_observation < 5e-6
+
+
+async def test_hot_path_and_refresh_are_instrumented(redis_manager, catalog_server):
+    server, url = await catalog_server(["a.mp4", "b.mp4"])
+    manager = await redis_manager(url)
+
+    refreshes = REFRESHES.labels(url, "ok").value
+    assert await manager.fetch_videos()
+    assert REFRESHES.labels(url, "ok").value == refreshes + 1
+
+    next_video = NEXT_VIDEO_SECONDS.labels()
+    load = REDIS_SECONDS.labels("load_user_queue")
+    calls, loads = next_video.count, load.count
+    await manager.get_next_video(1)
+    await manager.get_next_video(1)
+    assert next_video.count == calls + 2
+    assert load.count == loads + 1  # Second click is served from the cache
+    await manager.close()
+
+
+async def test_endpoint_serves_prometheus_text(catalog_server, offline_manager):
+    server, url = await catalog_server(["a.mp4", "b.mp4", "c.mp4"])
+    manager = offline_manager(url)
+    await manager.fetch_videos()
+    await manager.get_next_video(1)
+
+    registry = Registry()
+    watch_video_manager(manager, registry)
+    metrics_server = MetricsServer("127.0.0.1", 0, registry)
+    await metrics_server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{metrics_server.port}/metrics") as response:
+                assert response.status == 200
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                text = await response.text()
+    finally:
+        await metrics_server.stop()
+        await manager.close()
+
+    assert "randomvideo_users_in_memory 1" in text
+    assert f'randomvideo_catalog_videos{{source="{url}"}} 3' in text
+    assert 'randomvideo_queue_cache_lookups_total{result="miss"} 1' in text
@@ -23,8 +23,8 @@ async def test_multi_source_queues():
 
     # Get 2 videos from source 1
     print("📹 Source 1: https://example.com/videos.json")
-    video1 = manager.get_next_video(user_id)
-    video2 = manager.get_next_video(user_id)
+    video1 = await manager.get_next_video(user_id)
+    video2 = await manager.get_next_video(user_id)
     print(f"  Watched: {video1}, {video2}")
 
     status1 = manager.get_queue_status(user_id)
@@ -37,7 +37,7 @@ async def test_multi_source_queues():
 
     # Get 1 video from source 2 (should be fresh queue)
     print("\n📹 Source 2: https://example.com/streamable.json")
-    video3 = manager.get_next_video(user_id)
+    video3 = await manager.get_next_video(user_id)
     print(f"  Watched: {video3}")
 
     status2 = manager.get_queue_status(user_id)
@@ -50,7 +50,7 @@ async def test_multi_source_queues():
 
     # Get next video from source 1 (should resume from position 2)
     print("\n📹 Source 1 (resumed): https://example.com/videos.json")
-    video4 = manager.get_next_video(user_id)
+    video4 = await manager.get_next_video(user_id)
     print(f"  Watched: {video4}")
 
     status1_resumed = manager.get_queue_status(user_id)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test seeded permutation queues (O(1) state per user)
+"""
+import json
+import pytest
+from catalog import Catalog
+from redis_storage import RedisStorage
+from video_manager import PermutationQueue, PersistedQueue, VideoManager
+
+SOURCE_URL = "https://example.com/videos.json"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 17, 100, 1000])
+def test_permute_is_bijection(size):
+    queue = PermutationQueue(Catalog(str(i) for i in range(size)), seed=12345)
+    assert sorted(queue.permute(i) for i in range(size)) == list(range(size))
+
+
+def test_round_plays_every_video_once():
+    videos = [f"video{i}.mp4" for i in range(50)]
+    catalog = Catalog(videos)
+    queue = PermutationQueue(catalog)
+
+    first_round = [queue.next_video(catalog) for _ in range(len(videos))]
+    second_round = [queue.next_video(catalog) for _ in range(len(videos))]
+
+    assert sorted(first_round) == sorted(videos)
+    assert sorted(second_round) == sorted(videos)
+    # A new round uses a different permutation
+    assert first_round != second_round
+
+
+def test_state_size_independent_of_catalog():
+    small = PermutationQueue(Catalog(f"v{i}" for i in range(10)), seed=1)
+    large = PermutationQueue(Catalog(f"v{i}" for i in range(100_000)), seed=1)
+
+    assert set(small.to_dict()) == set(large.to_dict())
+    # Four integers plus the catalog fingerprint, whatever the catalog size
+    assert len(json.dumps(large.to_dict())) < 200
+
+
+def test_restore_continues_round():
+    videos = [f"video{i}.mp4" for i in range(20)]
+    catalog = Catalog(videos)
+    queue = PermutationQueue(catalog)
+    watched = [queue.next_video(catalog) for _ in range(8)]
+
+    restored = PermutationQueue.from_dict(catalog, json.loads(json.dumps(queue.to_dict())))
+    remaining = [restored.next_video(catalog) for _ in range(12)]
+
+    assert sorted(watched + remaining) == sorted(videos)
+
+
+def test_removed_videos_are_skipped_without_shifting_round():
+    videos = [f"video{i}.mp4" for i in range(30)]
+    catalog = Catalog(videos)
+    queue = PermutationQueue(catalog)
+    watched = [queue.next_video(catalog) for _ in range(10)]
+
+    # Remove a mix of played and unplayed videos
+    removed = set(videos[::3])
+    catalog.update(v for v in videos if v not in removed)
+    unplayed_live = set(videos) - removed - set(watched)
+
+    remaining = [queue.next_video(catalog) for _ in range(len(unplayed_live))]
+    assert set(remaining) == unplayed_live
+    assert len(remaining) == len(set(remaining))
+
+
+def test_round_spans_compaction(monkeypatch):
+    monkeypatch.setattr(Catalog, "COMPACT_MIN_TOMBSTONES", 0)
+    keep = [f"keep{i}" for i in range(20)]
+    catalog = Catalog(keep + [f"gone{i}" for i in range(60)])
+    queue = PermutationQueue(catalog, seed=7)
+    watched = [queue.next_video(catalog) for _ in range(30)]
+
+    catalog.update(keep)
+    catalog.update(keep + ["new"])  # Compacted before "new" is interned
+    assert catalog.id_count == 21
+    queue.sync(catalog)
+
+    saved = json.loads(json.dumps(queue.to_dict()))
+    restored = PermutationQueue.from_dict(catalog, saved)
+    assert restored.restore_sync(catalog, saved["catalog"])
+
+    unplayed = set(keep) - set(watched)
+    for round_queue in (queue, restored):
+        rest = [round_queue.next_video(catalog) for _ in range(len(unplayed))]
+        assert sorted(rest) == sorted(unplayed)
+        next_round = [round_queue.next_video(catalog) for _ in range(21)]
+        assert sorted(next_round) == sorted(keep + ["new"])
+        assert round_queue.size == 21
+
+
+async def test_manager_permutation_mode_persists(redis_client):
+    storage = RedisStorage(client=redis_client)
+    await storage.connect()
+    videos = [f"https://example.com/video{i}.mp4" for i in range(30)]
+
+    manager = VideoManager(SOURCE_URL, redis_storage=storage, queue_mode="permutation")
+    manager.all_videos = videos.copy()
+    watched = [await manager.get_next_video(1) for _ in range(10)]
+
+    saved = await storage.load_user_queue(1, SOURCE_URL)
+    assert saved["mode"] == "permutation"
+    assert saved["current_index"] == 10
+
+    restarted = VideoManager(SOURCE_URL, redis_storage=storage, queue_mode="permutation")
+    restarted.all_videos = videos.copy()
+    remaining = [await restarted.get_next_video(1) for _ in range(20)]
+    assert sorted(watched + remaining) == sorted(videos)
+
+
+def test_unknown_queue_mode_rejected():
+    with pytest.raises(ValueError):
+        VideoManager(SOURCE_URL, queue_mode="bogus")
+
+
+def test_incomplete_queue_class_fails_on_creation():
+    class CursorOnly(PersistedQueue):
+        position = 0
+
+    with pytest.raises(TypeError):
+        CursorOnly()
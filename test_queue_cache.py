@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test the bounded user-queue cache (LRU + idle TTL + write-back on eviction)
+"""
+import sys
+from catalog import Catalog
+from queue_cache import UserQueueCache, estimate_queue_bytes
+from video_manager import UserQueue
+
+SOURCE_URL = "https://example.com/videos.json"
+OTHER_URL = "https://example.com/streamable.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(10)]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_order_and_user_bound():
+    cache = UserQueueCache(max_users=2)
+    for user_id in (1, 2):
+        cache.put_queue(user_id, SOURCE_URL, object())
+    assert cache.get_queue(1, SOURCE_URL) is not None  # 1 is now most recent
+    cache.put_queue(3, SOURCE_URL, object())
+
+    evicted = cache.evict()
+    assert [user_id for user_id, _ in evicted] == [2]
+    assert 2 not in cache and 1 in cache and 3 in cache
+    assert cache.get_queue(2, SOURCE_URL) is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_byte_budget_and_idle_ttl():
+    clock = FakeClock()
+    per_queue = estimate_queue_bytes(object())
+    cache = UserQueueCache(max_bytes=3 * per_queue, idle_ttl=60, clock=clock)
+    for user_id in range(4):
+        clock.now += 10
+        cache.put_queue(user_id, SOURCE_URL, object())
+
+    assert [user_id for user_id, _ in cache.evict()] == [0]
+    assert cache.bytes == 3 * per_queue
+
+    clock.now += 55  # Users 1 (t=20) and 2 (t=30) are now idle > 60s
+    assert [user_id for user_id, _ in cache.evict()] == [1, 2]
+    assert cache.get_stats()["expired"] == 2
+    # Idle expiry can be suspended (e.g. when nothing could write the queue back)
+    clock.now += 1000
+    assert cache.evict(allow_idle=False) == []
+
+
+def test_estimate_counts_a_drawn_next_round():
+    catalog = Catalog(f"v{i}" for i in range(1000))
+    queue = UserQueue(catalog)
+    for _ in range(999):
+        queue.next_video(catalog)
+    one_round = estimate_queue_bytes(queue)
+
+    queue.upcoming(catalog, 3)  # Looks past the round's end: draws the next one
+    assert len(queue._next_round) == 1000
+    assert estimate_queue_bytes(queue) == one_round + sys.getsizeof(queue._next_round)
+
+
+async def test_evicted_progress_is_written_back_and_restored(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, flush_interval=60, flush_threshold=1000, cache_max_users=2)
+    watched = [await manager.get_next_video(1) for _ in range(3)]
+    await manager.get_next_video(2)
+    await manager.get_next_video(3)  # Evicts user 1 with unsaved progress
+
+    assert 1 not in manager.user_queues
+    assert manager.get_cache_stats()["pending_write_back"] == 1
+    await manager.flush_dirty()
+    assert manager.get_cache_stats()["pending_write_back"] == 0
+    assert (await manager.redis_storage.load_user_queue(1, SOURCE_URL))["current_index"] == 3
+
+    rest = [await manager.get_next_video(1) for _ in range(len(VIDEOS) - 3)]
+    assert sorted(watched + rest) == sorted(VIDEOS)
+    assert len(manager.user_queues) == 2
+    await manager.close()
+
+
+async def test_return_before_write_back_reuses_evicted_queue(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, flush_interval=60, flush_threshold=1000, cache_max_users=1)
+    await manager.get_next_video(1)
+    queue = manager.user_queues[1][SOURCE_URL]
+    await manager.get_next_video(2)
+
+    # Redis still holds nothing for user 1: the evicted queue itself comes back
+    await manager.get_next_video(1)
+    assert manager.user_queues[1][SOURCE_URL] is queue
+    assert queue.position == 2
+    await manager.close()
+
+
+async def test_without_redis_only_hard_bounds_apply(offline_manager):
+    manager = offline_manager(SOURCE_URL, VIDEOS, cache_max_users=3, cache_idle_seconds=0.001)
+    for user_id in range(5):
+        await manager.get_next_video(user_id)
+
+    assert len(manager.user_queues) == 3
+    assert manager.get_cache_stats()["pending_write_back"] == 0
+    await manager.close()
+
+
+def test_source_choice_lives_and_dies_with_the_user_entry():
+    cache = UserQueueCache(max_users=2)
+    cache.set_source(1, OTHER_URL)  # No queue yet: still counted against the bound
+    cache.put_queue(2, SOURCE_URL, object())
+    cache.put_queue(2, OTHER_URL, object())
+
+    assert cache.discard_queue(2, SOURCE_URL) and 2 in cache
+    cache.put_queue(3, SOURCE_URL, object())
+    assert [user_id for user_id, _ in cache.evict()] == [1]
+    assert cache.get_source(1) is None and not cache.has_source(1)
+
+    cache.set_source(3, OTHER_URL)
+    assert cache.discard_queue(3, SOURCE_URL) and 3 in cache  # Kept for its choice
+    cache.set_source(3, None)
+    assert 3 not in cache
+
+
+async def test_source_choices_are_bounded_by_the_cache(offline_manager):
+    manager = offline_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL], cache_max_users=3)
+    for user_id in range(10):
+        assert manager.switch_source(user_id, OTHER_URL)
+
+    assert len(manager.user_queues) == 3
+    assert manager.source_for(9) == OTHER_URL
+    assert manager.source_for(0) == SOURCE_URL  # Evicted with its entry, and nowhere to restore it from
+    await manager.close()
+
+
+async def test_evicted_source_choice_is_restored_from_redis(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL], cache_max_users=1)
+    manager._catalog_for(OTHER_URL).update(["s1.mp4", "s2.mp4"])
+    assert manager.switch_source(1, OTHER_URL)
+    assert await manager.get_next_video(1) in {"s1.mp4", "s2.mp4"}
+    await manager.get_next_video(2)  # Evicts user 1 and its choice
+    assert manager.source_for(1) == SOURCE_URL
+
+    assert await manager.restore_source(1) == OTHER_URL
+    assert await manager.get_next_video(1) in {"s1.mp4", "s2.mp4"}
+
+    # Choices survive a restart, including a return to the default source
+    assert manager.switch_source(1, SOURCE_URL)
+    assert manager.switch_source(3, OTHER_URL)
+    await manager.close()
+    restarted = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    assert await restarted.restore_source(1) == SOURCE_URL
+    assert await restarted.restore_source(3) == OTHER_URL
+    await restarted.close()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test cached queue coherence between two replicas sharing one Redis
+"""
+import asyncio
+from metrics import REDIS_SECONDS
+
+SOURCE_URL = "https://example.com/videos.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(20)]
+
+
+async def test_write_by_other_replica_invalidates_cached_queue(redis_manager, wait_for):
+    first = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    second = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    try:
+        served = [await first.get_next_video(1), await first.get_next_video(1)]
+        served.append(await second.get_next_video(1))
+
+        assert await wait_for(lambda: 1 not in first.user_queues)
+        served.append(await first.get_next_video(1))
+        assert len(set(served)) == 4
+        assert first.get_coherence_stats()["invalidated"] == 1
+        assert first.get_coherence_stats()["conflicts"] == 0
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_stale_click_is_served_again_from_stored_state(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    second = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    try:
+        served = [await first.get_next_video(1)]
+        await first.invalidations.stop()  # The invalidation will not arrive in time
+        served += [await second.get_next_video(1), await second.get_next_video(1)]
+
+        # first still caches cursor 1: its write finds a newer revision and it picks again
+        served.append(await first.get_next_video(1))
+        assert len(set(served)) == 4
+        assert first.get_coherence_stats()["conflicts"] == 1
+        assert first.get_coherence_stats()["retried_clicks"] == 1
+
+        stored = await first.redis_storage.load_user_queue(1, SOURCE_URL)
+        assert stored["current_index"] == 4  # The stale pick was never written
+        assert stored["rev"] == first._lookup_queue(1, SOURCE_URL).revision
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_round_boundary_race_keeps_one_round_order(redis_manager):
+    videos = VIDEOS[:4]
+    first = await redis_manager(SOURCE_URL, videos, queue_coherence=True)
+    second = await redis_manager(SOURCE_URL, videos, queue_coherence=True)
+    try:
+        # Neither replica hears of the other's writes: every click starts from a stale copy,
+        # and every fourth one finds it exhausted and draws a new round of its own
+        await first.invalidations.stop()
+        await second.invalidations.stop()
+        served = [await replica.get_next_video(1) for replica in (first, second) * 6]
+
+        for start in range(0, len(served), len(videos)):
+            assert sorted(served[start:start + len(videos)]) == sorted(videos)
+        stored = await first.redis_storage.load_user_queue(1, SOURCE_URL)
+        assert stored["current_index"] == len(videos)
+        assert stored["rev"] == second._lookup_queue(1, SOURCE_URL).revision
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_single_replica_per_user_keeps_its_cache(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    second = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    try:
+        load = REDIS_SECONDS.labels("load_user_queue")
+        loads = load.count
+        for _ in range(5):
+            await first.get_next_video(1)
+            await second.get_next_video(2)  # Other users' writes do not touch user 1's copy
+        await asyncio.sleep(0.1)
+
+        assert load.count == loads + 2  # One load per user, every other click served from memory
+        assert 1 in first.user_queues
+        assert first.get_coherence_stats()["invalidated"] == 0
+        assert first.get_coherence_stats()["messages_received"] >= 5
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_write_behind_flush_detects_conflict(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True, flush_interval=60)
+    second = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True)
+    try:
+        await first.get_next_video(1)
+        await first.flush_dirty()
+        await first.invalidations.stop()
+        await second.get_next_video(1)
+
+        # A click from the stale copy is only deferred: the flush finds the newer revision
+        await first.get_next_video(1)
+        await first.flush_dirty()
+        assert first.get_coherence_stats()["conflicts"] == 1
+        assert 1 not in first.user_queues  # Reloaded on the next click
+        stored = await first.redis_storage.load_user_queue(1, SOURCE_URL)
+        assert stored["current_index"] == 2  # The stale flush did not overwrite second's click
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_coherence_keeps_write_behind_for_a_single_replica(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, queue_coherence=True, flush_interval=60)
+    try:
+        for _ in range(3):
+            await manager.get_next_video(1)
+        assert manager.get_flush_stats()["pending"] == 1  # Deferred, not written per click
+
+        assert await manager.flush_dirty() == 1
+        stored = await manager.redis_storage.load_user_queue(1, SOURCE_URL)
+        assert stored["current_index"] == 3
+        assert stored["rev"] == manager._lookup_queue(1, SOURCE_URL).revision
+        assert manager.get_coherence_stats()["conflicts"] == 0
+    finally:
+        await manager.close()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test catalog fingerprints on restored queues and diff-based repair
+"""
+from catalog import Catalog
+from catalog_snapshot import capture_snapshot, load_snapshot, write_snapshot
+
+SOURCE_URL = "https://example.com/videos.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(10)]
+
+
+async def watch(manager, user_id: int, count: int) -> list:
+    return [await manager.get_next_video(user_id) for _ in range(count)]
+
+
+async def test_restore_after_catalog_change_keeps_progress(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS)
+    played = await watch(manager, 1, 4)
+    unplayed = [url for url in VIDEOS if url not in played]
+
+    # Same catalog lineage changes while the queue is not in memory
+    manager.user_queues.clear()
+    new_video = "https://example.com/new.mp4"
+    manager.all_videos = [url for url in VIDEOS if url not in (played[0], unplayed[0])] + [new_video]
+
+    rest = await watch(manager, 1, 6)
+    queue = manager.user_queues[1][SOURCE_URL]
+
+    assert queue.position == 3 + 6  # Cursor kept, minus the removed played video
+    assert sorted(rest) == sorted(unplayed[1:] + [new_video])
+    assert queue.catalog_fingerprint == manager.catalog.fingerprint()
+
+
+async def test_same_length_stale_queue_never_serves_removed_urls(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS)
+    played = await watch(manager, 1, 1)
+    manager.user_queues.clear()
+
+    # Swap an unplayed URL for another: the length alone would not notice
+    removed = next(url for url in VIDEOS if url not in played)
+    replacement = "https://example.com/replacement.mp4"
+    manager.all_videos = [replacement if url == removed else url for url in VIDEOS]
+
+    served = await watch(manager, 1, 9)
+    assert removed not in served
+    assert replacement in served
+
+
+async def test_restart_with_same_id_table_repairs_by_diff(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS)
+    played = await watch(first, 1, 3)
+
+    # A new process (new catalog epoch) assigns the same IDs to the same manifest
+    updated = VIDEOS + ["https://example.com/video10.mp4"]
+    second = await redis_manager(SOURCE_URL, VIDEOS)
+    second.all_videos = updated
+    assert second.catalog.epoch != first.catalog.epoch
+
+    rest = await watch(second, 1, 8)
+    assert second.user_queues[1][SOURCE_URL].position == 11
+    assert sorted(played + rest) == sorted(updated)
+
+
+async def test_restart_with_different_id_table_starts_fresh(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS)
+    await watch(first, 1, 3)
+
+    # Different manifest order: stored IDs would name other URLs
+    second = await redis_manager(SOURCE_URL, list(reversed(VIDEOS)))
+    await watch(second, 1, 1)
+    assert second.user_queues[1][SOURCE_URL].position == 1
+
+
+def test_snapshot_keeps_catalog_fingerprint(tmp_path):
+    catalog = Catalog(VIDEOS)
+    catalog.update(VIDEOS[1:])
+    path = str(tmp_path / "cat.bin")
+    strings, live_ids = capture_snapshot(catalog)
+    write_snapshot(path, strings, live_ids, {"catalog": catalog.fingerprint()})
+
+    restored = Catalog.from_snapshot(load_snapshot(path))
+    assert restored.fingerprint() == catalog.fingerprint()
+    assert restored._snapshot is not None  # Fingerprint did not force decoding
+
+    # Fingerprints from before the snapshot fall back to the ID table digest
+    assert restored.steps_since_fingerprint({"epoch": catalog.epoch, "version": 0}) is None
+    assert restored.ids_compatible({"ids": len(VIDEOS), "digest": catalog.id_digest(len(VIDEOS))})
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test streaming queue iteration and the NDJSON export/import tool
+"""
+import io
+import json
+import pytest
+from queue_transfer import export_queues, import_queues
+from video_manager import VideoManager
+
+SOURCE_URL = "https://example.com/videos.json"
+OTHER_URL = "https://example.com/streamable.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(10)]
+
+
+async def test_iter_user_queues_streams_per_source_records(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    for user_id in range(23):
+        await storage.save_user_queue(user_id, {"queue": ["a"], "current_index": user_id}, SOURCE_URL)
+    await storage.save_user_queue(0, {"queue": ["b"], "current_index": 0}, OTHER_URL)
+    # Legacy string key is read without being migrated
+    legacy_key = storage._get_queue_key(99, SOURCE_URL)
+    await redis_client.set(legacy_key, json.dumps({"queue": ["c"], "current_index": 1}))
+
+    records = [record async for record in storage.iter_user_queues(batch_size=5)]
+
+    assert len(records) == 25
+    by_key = {(r["user_id"], r["source_key"]): r for r in records}
+    assert by_key[(7, storage._get_source_key(SOURCE_URL))]["queue"]["current_index"] == 7
+    assert by_key[(0, storage._get_source_key(OTHER_URL))]["queue"]["queue"] == ["b"]
+    assert by_key[(99, storage._get_source_key(SOURCE_URL))]["queue"]["queue"] == ["c"]
+    assert all(r["ttl_ms"] > 0 for r in records if r["user_id"] != 99)
+    assert await redis_client.type(legacy_key) == b"string"
+
+    queues = await storage.get_all_user_queues()
+    assert len(queues[0]) == 2
+
+
+async def test_export_import_roundtrip(redis_client, redis_storage):
+    fakeredis = pytest.importorskip("fakeredis")
+    storage = await redis_storage(redis_client)
+    manager = VideoManager(SOURCE_URL, redis_storage=storage, queue_mode="shuffle")
+    manager.all_videos = VIDEOS.copy()
+    for user_id in range(12):
+        await manager.get_next_video(user_id)
+    originals = {uid: await storage.load_user_queue(uid, SOURCE_URL) for uid in range(12)}
+
+    out = io.StringIO()
+    assert await export_queues(storage, out, batch_size=5) == 12
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 12 and all(json.loads(line)["queue"]["ids"] for line in lines)
+
+    target_client = fakeredis.FakeAsyncRedis(decode_responses=False)
+    target = await redis_storage(target_client)
+    assert await import_queues(target, io.StringIO(out.getvalue()), batch_size=5) == 12
+
+    for user_id, queue in originals.items():
+        assert await target.load_user_queue(user_id, SOURCE_URL) == queue
+    key = target._get_queue_key(3, SOURCE_URL)
+    assert 0 < await target_client.pttl(key) <= await redis_client.pttl(key) + 1000
+    await target_client.aclose()
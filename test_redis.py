@@ -2,16 +2,17 @@
 """
 Test Redis connection and queue persistence
 """
+import asyncio
 import sys
-from redis_storage import RedisStorage
+from redis_storage import REV_FIELD, RedisStorage
 
-def test_redis():
+async def test_redis():
     """Test Redis connection and basic operations"""
     print("🧪 Testing Redis connection...")
 
     storage = RedisStorage()
 
-    if not storage.available:
+    if not await storage.connect():
         print("❌ Redis not available. Make sure Redis is running and environment variables are set.")
         return False
 
@@ -19,24 +20,26 @@ def test_redis():
 
     # Test save and load
     test_user_id = 12345
+    test_source_url = "https://example.com/videos.json"
     test_queue_data = {
         "queue": ["video1.mp4", "video2.mp4", "video3.mp4"],
         "current_index": 1
     }
 
     print(f"\n📝 Testing save operation for user {test_user_id}...")
-    success = storage.save_user_queue(test_user_id, test_queue_data)
-    if success:
+    revision = await storage.save_user_queue(test_user_id, test_queue_data, test_source_url)
+    if revision:
         print("✅ Save successful")
     else:
         print("❌ Save failed")
         return False
 
     print(f"\n📖 Testing load operation for user {test_user_id}...")
-    loaded_data = storage.load_user_queue(test_user_id)
+    loaded_data = await storage.load_user_queue(test_user_id, test_source_url)
     if loaded_data:
         print(f"✅ Load successful: {loaded_data}")
-        if loaded_data == test_queue_data:
+        # Loads also carry the queue's revision counter, bumped by every write
+        if loaded_data.pop(REV_FIELD, None) == revision and loaded_data == test_queue_data:
             print("✅ Data matches!")
         else:
             print(f"⚠️  Data mismatch. Expected: {test_queue_data}, Got: {loaded_data}")
@@ -45,23 +48,23 @@ def test_redis():
         return False
 
     print(f"\n🗑️  Testing delete operation...")
-    success = storage.delete_user_queue(test_user_id)
+    success = await storage.delete_user_queue(test_user_id, test_source_url)
     if success:
         print("✅ Delete successful")
     else:
         print("❌ Delete failed")
 
     # Verify deletion
-    loaded_data = storage.load_user_queue(test_user_id)
+    loaded_data = await storage.load_user_queue(test_user_id, test_source_url)
     if loaded_data is None:
         print("✅ Verified: Queue deleted successfully")
     else:
         print(f"⚠️  Queue still exists: {loaded_data}")
 
-    storage.close()
+    await storage.close()
     print("\n✅ All tests passed!")
     return True
 
 if __name__ == "__main__":
-    success = test_redis()
+    success = asyncio.run(test_redis())
     sys.exit(0 if success else 1)
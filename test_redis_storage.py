@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test the asyncio Redis storage backend against a local Redis stand-in
+"""
+import asyncio
+import json
+from redis_storage import REV_CONFLICT, RedisStorage
+from video_manager import VideoManager
+
+SOURCE_URL = "https://example.com/videos.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(10)]
+
+
+async def test_save_load_delete_roundtrip(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    queue_data = {"queue": ["video1.mp4", "video2.mp4"], "current_index": 1}
+
+    assert await storage.save_user_queue(123, queue_data, SOURCE_URL) == 1  # Revision
+    assert await storage.load_user_queue(123, SOURCE_URL) == {**queue_data, "rev": 1}
+
+    # Queues for other sources are independent
+    assert await storage.load_user_queue(123, "https://example.com/other.json") is None
+
+    assert await storage.delete_user_queue(123, SOURCE_URL)
+    assert await storage.load_user_queue(123, SOURCE_URL) is None
+
+
+async def test_save_sets_expiration(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    await storage.save_user_queue(123, {"queue": [], "current_index": 0}, SOURCE_URL)
+
+    key = f"user_queue:123:{storage._get_source_key(SOURCE_URL)}"
+    assert 0 < await redis_client.ttl(key) <= 30 * 24 * 60 * 60
+
+
+async def test_unavailable_storage_is_noop():
+    storage = RedisStorage.disabled()
+
+    assert not await storage.connect()
+    assert not await storage.save_user_queue(1, {"queue": [], "current_index": 0}, SOURCE_URL)
+    assert await storage.load_user_queue(1, SOURCE_URL) is None
+    assert await storage.get_all_user_queues() == {}
+
+
+async def test_get_all_user_queues(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    await storage.save_user_queue(1, {"queue": ["a"], "current_index": 0}, SOURCE_URL)
+    await storage.save_user_queue(2, {"queue": ["b"], "current_index": 1}, SOURCE_URL)
+
+    queues = await storage.get_all_user_queues()
+    assert set(queues) == {1, 2}
+
+
+async def test_manager_persists_and_restores_progress(redis_client, redis_storage):
+    manager = VideoManager(SOURCE_URL, redis_storage=await redis_storage(redis_client))
+    manager.all_videos = VIDEOS.copy()
+
+    watched = [await manager.get_next_video(42) for _ in range(3)]
+
+    # A fresh manager (e.g. after a restart) continues the same round
+    restarted = VideoManager(SOURCE_URL, redis_storage=await redis_storage(redis_client))
+    restarted.all_videos = VIDEOS.copy()
+    remaining = [await restarted.get_next_video(42) for _ in range(len(VIDEOS) - 3)]
+
+    assert sorted(watched + remaining) == sorted(VIDEOS)
+
+
+async def test_concurrent_clicks_share_one_queue(redis_client, redis_storage):
+    manager = VideoManager(SOURCE_URL, redis_storage=await redis_storage(redis_client))
+    manager.all_videos = VIDEOS.copy()
+
+    videos = await asyncio.gather(*(manager.get_next_video(7) for _ in range(len(VIDEOS))))
+
+    # Interleaved coroutines must not create duplicate queues for the same user
+    assert sorted(videos) == sorted(VIDEOS)
+    await manager.close()
+
+
+async def test_queue_stored_as_hash_with_cursor_field(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    await storage.save_user_queue(1, {"queue": ["a", "b", "c"], "current_index": 0}, SOURCE_URL)
+    key = storage._get_queue_key(1, SOURCE_URL)
+
+    assert await redis_client.type(key) == b"hash"
+    assert await storage.advance_user_cursor(1, SOURCE_URL) == (1, 2)
+    assert await storage.advance_user_cursor(1, SOURCE_URL, 2) == (3, 3)
+    assert await storage.load_user_queue(1, SOURCE_URL) == {"queue": ["a", "b", "c"], "current_index": 3, "rev": 3}
+    assert await redis_client.ttl(key) > 0
+
+
+async def test_conditional_writes_only_land_on_the_expected_revision(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    queue = {"queue": ["a", "b", "c"], "current_index": 0}
+    assert await storage.save_user_queue(1, queue, SOURCE_URL, expected_rev=1) == REV_CONFLICT
+    assert await storage.save_user_queue(1, queue, SOURCE_URL, expected_rev=0) == 1  # Missing key: revision 0
+    assert await storage.save_user_queue(1, {"current_index": 2}, SOURCE_URL, expected_rev=1) == 2
+
+    # A stale writer still at revision 1 changes nothing
+    assert await storage.save_user_queue(1, {"current_index": 1}, SOURCE_URL, expected_rev=1) == REV_CONFLICT
+    assert await storage.load_user_queue(1, SOURCE_URL) == {**queue, "current_index": 2, "rev": 2}
+
+    entries = [(1, SOURCE_URL, {"current_index": 3}), (2, SOURCE_URL, queue)]
+    assert await storage.save_user_queues(entries, [1, 0]) == [REV_CONFLICT, 1]
+    assert (await storage.load_user_queue(1, SOURCE_URL))["current_index"] == 2
+
+
+async def test_legacy_json_key_migrates_on_load(redis_client, redis_storage):
+    storage = await redis_storage(redis_client)
+    key = storage._get_queue_key(5, SOURCE_URL)
+    legacy = {"queue": ["a", "b"], "current_index": 1}
+    await redis_client.set(key, json.dumps(legacy))
+
+    assert await storage.load_user_queue(5, SOURCE_URL) == {**legacy, "rev": 1}
+    assert await redis_client.type(key) == b"hash"
+    assert await redis_client.ttl(key) > 0
+    assert await storage.load_user_queue(5, SOURCE_URL) == {**legacy, "rev": 1}
+
+
+async def test_clicks_only_advance_cursor(redis_client, redis_storage):
+    manager = VideoManager(SOURCE_URL, redis_storage=await redis_storage(redis_client))
+    manager.all_videos = VIDEOS.copy()
+    await manager.get_next_video(9)
+
+    key = manager.redis_storage._get_queue_key(9, SOURCE_URL)
+    body = await redis_client.hget(key, "body")
+    for _ in range(3):
+        await manager.get_next_video(9)
+
+    # Advancing within a round leaves the stored body untouched
+    assert await redis_client.hget(key, "body") == body
+    assert await redis_client.hget(key, "current_index") == b"4"
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test shard planning, worker environments and the worker supervisor
+"""
+import asyncio
+import sys
+import pytest
+from sharding import WorkerSupervisor, parse_shard_ids, plan_shards, worker_env
+
+
+def test_plan_shards_covers_every_shard_once():
+    assert plan_shards(4, 2) == [[0, 1], [2, 3]]
+    assert plan_shards(5, 3) == [[0, 1], [2, 3], [4]]
+    assert plan_shards(2, 4) == [[0], [1]]  # Never more workers than shards
+    with pytest.raises(ValueError):
+        plan_shards(0, 1)
+
+
+def test_worker_env_defaults_and_overrides():
+    env = worker_env({"METRICS_PORT": "9100"}, 2, [4, 5], 6)
+    assert env["SHARD_IDS"] == "4,5" and env["SHARD_COUNT"] == "6" and env["WORKER_INDEX"] == "2"
+    assert env["QUEUE_FLUSH_INTERVAL"] == "0" and env["WARMUP_MAX_USERS"] == "0"
+    assert env["QUEUE_COHERENCE"] == "true"
+    assert env["METRICS_PORT"] == "9102"
+
+    env = worker_env({"QUEUE_FLUSH_INTERVAL": "2", "METRICS_PORT": "0"}, 1, [1], 2)
+    assert env["QUEUE_FLUSH_INTERVAL"] == "2"
+    assert env["METRICS_PORT"] == "0"
+    assert parse_shard_ids(env["SHARD_IDS"]) == [1]
+    assert parse_shard_ids("") is None
+
+
+async def test_supervisor_restarts_crashed_workers():
+    argv = [sys.executable, "-c", "import sys; sys.exit(3)"]
+    supervisor = WorkerSupervisor(argv, [{}], restart_delay=0.01, max_restart_delay=0.02)
+    task = asyncio.create_task(supervisor.run())
+    for _ in range(200):
+        if supervisor.restarts[0] >= 2:
+            break
+        await asyncio.sleep(0.05)
+    await supervisor.stop()
+    await asyncio.wait_for(task, timeout=10)
+    assert supervisor.restarts[0] >= 2
+
+
+async def test_supervisor_stop_terminates_workers():
+    argv = [sys.executable, "-c", "import time; time.sleep(60)"]
+    supervisor = WorkerSupervisor(argv, [{}, {}], stop_timeout=5)
+    task = asyncio.create_task(supervisor.run())
+    for _ in range(100):
+        if len(supervisor.processes) == 2:
+            break
+        await asyncio.sleep(0.05)
+
+    await supervisor.stop()
+    await asyncio.wait_for(task, timeout=10)
+    assert all(process.returncode is not None for process in supervisor.processes.values())
+    assert supervisor.restarts == [0, 0]
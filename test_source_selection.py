@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test per-user source selection over resident catalogs
+"""
+
+
+async def test_fetch_all_keeps_every_source_resident(catalog_server, offline_manager):
+    _, default_url = await catalog_server(["a.mp4", "b.mp4"])
+    _, other_url = await catalog_server(["s1.mp4", "s2.mp4", "s3.mp4"])
+    manager = offline_manager(default_url, sources=[other_url])
+
+    results = await manager.fetch_all()
+
+    assert results == {default_url: True, other_url: True}
+    assert len(manager.catalogs[default_url]) == 2
+    assert len(manager.catalogs[other_url]) == 3
+    await manager.close()
+
+
+async def test_switch_is_per_user_and_never_refetches(catalog_server, offline_manager):
+    default_server, default_url = await catalog_server(["a.mp4", "b.mp4"])
+    other_server, other_url = await catalog_server(["s1.mp4", "s2.mp4", "s3.mp4"])
+    manager = offline_manager(default_url, sources=[other_url])
+    await manager.fetch_all()
+    requests_before = default_server.requests + other_server.requests
+
+    assert manager.switch_source(1, other_url)
+
+    assert await manager.get_next_video(1) in {"s1.mp4", "s2.mp4", "s3.mp4"}
+    assert await manager.get_next_video(2) in {"a.mp4", "b.mp4"}
+    assert manager.json_url == default_url
+    assert manager.get_queue_status(1)["total_videos"] == 3
+    assert default_server.requests + other_server.requests == requests_before
+
+    # Switching back resumes the user's default-source queue
+    await manager.get_next_video(1)
+    assert manager.switch_source(1, default_url)
+    assert manager.source_for(1) == default_url
+    assert await manager.get_next_video(1) in {"a.mp4", "b.mp4"}
+    assert manager.user_queues[1][other_url].position == 2
+    await manager.close()
+
+
+async def test_unknown_or_dropped_source_falls_back_to_default(catalog_server, offline_manager):
+    _, default_url = await catalog_server(["a.mp4"])
+    _, other_url = await catalog_server(["s1.mp4"])
+    manager = offline_manager(default_url, sources=[other_url])
+    await manager.fetch_all()
+
+    assert not manager.switch_source(1, "https://example.com/unknown.json")
+    assert manager.source_for(1) == default_url
+
+    manager.switch_source(1, other_url)
+    manager.set_sources(default_url, [])
+    assert other_url not in manager.catalogs
+    assert await manager.get_next_video(1) == "a.mp4"
+    await manager.close()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test per-user click serialization and coalescing of rapid Next clicks
+"""
+import asyncio
+import pytest
+from user_actions import UserActionQueue
+
+SOURCE_URL = "https://example.com/videos.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(10)]
+
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit(self, content=None, view=None):
+        self.edits.append((content, view))
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content, ephemeral=False):
+        self.sent.append(content)
+
+
+class FakeResponse:
+    async def defer(self):
+        pass
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeInteraction:
+    """Just what the click handlers touch on a discord.Interaction"""
+
+    def __init__(self, message: FakeMessage, user_id: int = 42):
+        self.message = message
+        self.user = FakeUser(user_id)
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+class Recorder:
+    def __init__(self, delay: float = 0.0):
+        self.calls = []
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, user_id, items):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            self.calls.append((user_id, list(items)))
+        finally:
+            self.running -= 1
+
+
+async def burst(actions: UserActionQueue, user_id: int, handler, items, coalesce=True):
+    tasks = []
+    for item in items:
+        tasks.append(asyncio.create_task(actions.submit(user_id, handler, item, coalesce=coalesce)))
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def test_burst_coalesces_behind_the_first_click_in_click_order():
+    actions = UserActionQueue(debounce=0.02)
+    handler = Recorder()
+    await asyncio.gather(*await burst(actions, 1, handler, range(5)))
+
+    # The first click runs at once; the rest of the burst becomes one batch
+    assert handler.calls == [(1, [0]), (1, [1, 2, 3, 4])]
+    stats = actions.get_stats()
+    assert (stats["actions"], stats["batches"], stats["coalesced"]) == (5, 2, 3)
+    await asyncio.sleep(0.05)
+    assert actions.get_stats()["active_users"] == 0  # Idle users hold no state
+
+
+async def test_single_click_is_not_delayed():
+    actions = UserActionQueue(debounce=10)
+    handler = Recorder()
+    await asyncio.wait_for(actions.submit(1, handler, "click"), timeout=1)
+
+    assert handler.calls == [(1, ["click"])]
+    await actions.close()
+
+
+async def test_non_coalescing_action_keeps_its_place():
+    actions = UserActionQueue(debounce=0.02)
+    next_handler, switch_handler = Recorder(), Recorder()
+    tasks = await burst(actions, 1, next_handler, ["n1", "n2", "n3"])
+    tasks += await burst(actions, 1, switch_handler, ["switch"], coalesce=False)
+    tasks += await burst(actions, 1, next_handler, ["n4"])
+    await asyncio.gather(*tasks)
+
+    assert next_handler.calls == [(1, ["n1"]), (1, ["n2", "n3"]), (1, ["n4"])]
+    assert switch_handler.calls == [(1, ["switch"])]
+
+
+@pytest.mark.parametrize("max_concurrent", [1, 2])
+async def test_per_user_concurrency_limit(max_concurrent):
+    actions = UserActionQueue(debounce=0, max_concurrent=max_concurrent)
+    handler = Recorder(delay=0.02)
+    tasks = await burst(actions, 1, handler, range(4), coalesce=False)
+    tasks += await burst(actions, 2, handler, range(4), coalesce=False)
+    await asyncio.gather(*tasks)
+
+    # Limits are per user: two users may each run max_concurrent batches at once
+    assert handler.max_running == 2 * max_concurrent
+    assert sorted(items for user_id, items in handler.calls if user_id == 1) == [[0], [1], [2], [3]]
+
+
+async def test_failed_batch_reaches_every_click():
+    actions = UserActionQueue(debounce=0.01)
+
+    async def failing(user_id, items):
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*await burst(actions, 1, failing, range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert actions.get_stats()["errors"] == 2  # The leading click, then the rest of the burst
+    assert actions.pending(1) == 0
+
+
+@pytest.fixture
+def bot_module(monkeypatch, offline_manager):
+    """The bot module wired to an in-memory VideoManager and a short debounce"""
+    monkeypatch.setenv("DISCORD_BOT_TOKEN", "test-token")
+    module = pytest.importorskip("bot")
+
+    manager = offline_manager(SOURCE_URL, VIDEOS)
+    monkeypatch.setattr(module.bot, "video_manager", manager)
+    monkeypatch.setattr(module.bot, "actions", UserActionQueue(debounce=0.02))
+    return module
+
+
+async def test_next_clicks_advance_once_and_edit_once(bot_module):
+    manager = bot_module.bot.video_manager
+    message = FakeMessage()
+    clicks = [FakeInteraction(message) for _ in range(5)]
+    await asyncio.gather(*[bot_module.bot.actions.submit(42, bot_module.handle_next_clicks, (click, SOURCE_URL))
+                           for click in clicks])
+
+    assert manager.get_queue_status(42)["current_position"] == 1
+    assert len(message.edits) == 1
+    content, view = message.edits[0]
+    assert content.startswith("**📹 video")
+    assert [item.custom_id for item in view.children] == [f"rv:next:42:{SOURCE_URL}", f"rv:switch:42:{SOURCE_URL}"]
+    assert all(not click.followup.sent for click in clicks)
+    await manager.close()
+
+
+async def test_buttons_rebuild_from_custom_id(bot_module):
+    view = bot_module.VideoView(42, SOURCE_URL)
+    for item in view.children:
+        match = item.__discord_ui_compiled_template__.fullmatch(item.custom_id)
+        rebuilt = await type(item).from_custom_id(None, item.item, match)
+        assert (rebuilt.user_id, rebuilt.source, rebuilt.custom_id) == (42, SOURCE_URL, item.custom_id)
+    await bot_module.bot.video_manager.close()
+
+
+async def test_buttons_reject_other_users(bot_module):
+    click = FakeInteraction(FakeMessage(), user_id=7)
+    await bot_module.NextButton(42, SOURCE_URL).callback(click)
+
+    assert click.followup.sent == [bot_module.NOT_YOUR_CARD]
+    assert not click.message.edits
+    assert bot_module.bot.video_manager.get_queue_status(7)["current_position"] == 0
+    await bot_module.bot.video_manager.close()
+
+
+async def test_select_source_button_switches_the_owner(bot_module):
+    manager = bot_module.bot.video_manager
+    manager.set_sources(SOURCE_URL, [SOURCE_URL, "https://example.com/other.json"])
+    manager._catalog_for("https://example.com/other.json").update(["https://example.com/other.mp4"])
+
+    click = FakeInteraction(FakeMessage())
+    await bot_module.SelectSourceButton(42, "https://example.com/other.json").callback(click)
+
+    assert manager.source_for(42) == "https://example.com/other.json"
+    content, view = click.message.edits[0]
+    assert "other.mp4" in content
+    assert view.children[0].custom_id == "rv:next:42:https://example.com/other.json"
+    await manager.close()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test the multi-source registry: config parsing, bounded concurrent refresh and health
+"""
+import asyncio
+import time
+import pytest
+from video_sources import VideoSource, default_sources, parse_sources
+
+
+def test_parse_sources():
+    sources = parse_sources('[{"name": "a", "url": "https://x/a.json", "label": "A源", "refresh_minutes": 5},'
+                            ' {"name": "b", "url": "https://x/b.json", "timeout": 3}]')
+
+    assert [s.name for s in sources] == ["a", "b"]
+    assert sources[0].label == "A源" and sources[0].refresh_minutes == 5
+    assert sources[1].label == "b" and sources[1].timeout == 3
+
+    for raw in ('[]', '{"name": "a"}', '[{"name": "a"}]', '[{"name": "a", "url": "u", "timeout": 0}]',
+                '[{"name": "a", "url": "u"}, {"name": "a", "url": "v"}]', 'not json',
+                '[{"name": "%s", "url": "u"}]' % ("n" * 65)):
+        with pytest.raises(ValueError):
+            parse_sources(raw)
+
+
+def test_default_sources_skip_duplicate_streamable():
+    assert [s.name for s in default_sources("https://x/v.json", "https://x/s.json")] == ["default", "streamable"]
+    assert [s.name for s in default_sources("https://x/v.json", "https://x/v.json")] == ["default"]
+
+
+async def test_slow_source_times_out_without_delaying_others(catalog_server, offline_manager):
+    slow_server, slow_url = await catalog_server(["slow.mp4"])
+    _, fast_url = await catalog_server(["fast.mp4"])
+    slow_server.delay = 5
+    sources = [VideoSource("slow", slow_url, timeout=0.2), VideoSource("fast", fast_url)]
+    manager = offline_manager(slow_url, sources=sources, refresh_concurrency=2)
+
+    start = time.perf_counter()
+    results = await manager.fetch_all()
+    elapsed = time.perf_counter() - start
+
+    assert results == {slow_url: False, fast_url: True}
+    assert elapsed < 2
+    status = {s["name"]: s for s in manager.get_source_status()}
+    assert status["fast"]["healthy"] and status["fast"]["videos"] == 1
+    assert not status["slow"]["healthy"]
+    assert status["slow"]["consecutive_failures"] == 1
+    assert status["slow"]["last_error"] == "TimeoutError"
+    assert status["slow"]["last_success"] is None
+    await manager.close()
+
+
+async def test_refresh_concurrency_is_bounded(catalog_server, offline_manager):
+    servers = [await catalog_server([f"{i}.mp4"]) for i in range(4)]
+    for server, _ in servers:
+        server.delay = 0.1
+    sources = [VideoSource(str(i), url) for i, (_, url) in enumerate(servers)]
+    manager = offline_manager(sources[0].url, sources=sources, refresh_concurrency=2)
+
+    start = time.perf_counter()
+    assert all((await manager.fetch_all()).values())
+
+    # Four 100ms fetches two at a time take at least two rounds
+    assert time.perf_counter() - start >= 0.2
+    await manager.close()
+
+
+async def test_sources_refresh_on_their_own_schedules(catalog_server, offline_manager):
+    fast_server, fast_url = await catalog_server(["a.mp4"])
+    slow_server, slow_url = await catalog_server(["b.mp4"])
+    sources = [VideoSource("fast", fast_url, refresh_minutes=0.05 / 60),
+               VideoSource("slow", slow_url, refresh_minutes=60)]
+    manager = offline_manager(fast_url, sources=sources)
+    await manager.fetch_all()
+    fast_server.status = 500
+
+    await manager.start_auto_refresh()
+    await asyncio.sleep(0.3)
+
+    assert fast_server.requests >= 3
+    assert slow_server.requests == 1
+    status = {s["name"]: s for s in manager.get_source_status()}
+    assert status["fast"]["last_error"] == "HTTP 500"
+    assert status["fast"]["last_success"] is not None
+    assert status["slow"]["healthy"]
+
+    manager.stop_auto_refresh()
+    assert not manager._refresh_tasks
+    await manager.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test startup warm-up of active user queues
+"""
+from redis_storage import ACTIVITY_KEY
+
+SOURCE_URL = "https://example.com/videos.json"
+OTHER_URL = "https://example.com/streamable.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(10)]
+
+
+async def test_writes_maintain_activity_index(redis_client, redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    await manager.get_next_video(1)
+    await manager.get_next_video(2)
+
+    active = await manager.redis_storage.get_active_users(3600, 10)
+    assert {user_id for user_id, _ in active} == {1, 2}
+
+    await manager.redis_storage.delete_user_queue(1, SOURCE_URL)
+    assert await redis_client.zcard(ACTIVITY_KEY) == 1
+
+
+async def test_warm_up_preloads_queues_in_batches(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    for user_id in range(25):
+        for _ in range(user_id % 4 + 1):
+            await first.get_next_video(user_id)
+
+    # Restart: same catalog, empty memory
+    second = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    loads = []
+    original = second.redis_storage.load_user_queues
+
+    async def counting_load(entries):
+        loads.append(len(entries))
+        return await original(entries)
+
+    second.redis_storage.load_user_queues = counting_load
+    stats = await second.warm_up(batch_size=10)
+
+    assert loads == [10, 10, 5]
+    assert stats["loaded"] == 25 and stats["load_rate"] == 1.0
+    assert second.user_queues[7][SOURCE_URL].position == 7 % 4 + 1
+
+    # First clicks are served from memory
+    await second.get_next_video(7)
+    await second.get_next_video(7)
+    await second.get_next_video(100)  # Never active: an ordinary miss, not a warm-up one
+    stats = second.get_warmup_stats()
+    assert stats["first_access_hits"] == 1
+    assert stats["first_access_misses"] == 0
+    assert stats["hit_rate"] == 1.0
+
+
+async def test_clicks_before_their_batch_count_as_warm_up_misses(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    for user_id in range(20):
+        await first.get_next_video(user_id)
+
+    second = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    original = second.redis_storage.load_user_queues
+    early = []
+
+    async def load_after_click(entries):
+        if not early:
+            # A candidate of a later batch clicks while the first batch loads
+            early.append(next(user_id for user_id in range(20) if (user_id, SOURCE_URL) not in entries))
+            await second.get_next_video(early[0])
+        return await original(entries)
+
+    second.redis_storage.load_user_queues = load_after_click
+    await second.warm_up(batch_size=10)
+    second.user_queues.clear()  # Reloads after warm-up are not warm-up misses either
+    await second.get_next_video(early[0])
+
+    stats = second.get_warmup_stats()
+    assert stats["loaded"] == 19
+    assert stats["first_access_misses"] == 1
+    assert stats["first_access_hits"] == 0
+
+
+async def test_warm_up_never_overwrites_live_queues(redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    await first.get_next_video(1)
+
+    second = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    await second.get_next_video(1)
+    await second.get_next_video(1)
+    live = second.user_queues[1][SOURCE_URL]
+
+    stats = await second.warm_up()
+    assert stats["candidates"] == 0
+    assert second.user_queues[1][SOURCE_URL] is live
+
+
+async def test_warm_up_skips_unloaded_sources_and_old_activity(redis_client, redis_manager):
+    first = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    first._catalog_for(OTHER_URL).update(["https://example.com/s.mp4"])
+    first.switch_source(1, OTHER_URL)
+    await first.get_next_video(1)
+    await first.get_next_video(2)
+    await redis_client.zadd(ACTIVITY_KEY, {f"3:{first.redis_storage._get_source_key(SOURCE_URL)}": 1})
+
+    # OTHER_URL's catalog is not loaded in the new process
+    second = await redis_manager(SOURCE_URL, VIDEOS, sources=[OTHER_URL])
+    stats = await second.warm_up(max_age_seconds=3600)
+
+    assert stats["loaded"] == 1
+    assert stats["skipped"] == 1
+    assert OTHER_URL not in second.user_queues.get(1, {})
+    # Activity older than the queue TTL is pruned from the index
+    assert await redis_client.zscore(ACTIVITY_KEY, f"3:{first.redis_storage._get_source_key(SOURCE_URL)}") is None
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test write-behind queue persistence (dirty set + pipelined flush)
+"""
+import asyncio
+from redis_storage import RedisStorage
+
+SOURCE_URL = "https://example.com/videos.json"
+VIDEOS = [f"https://example.com/video{i}.mp4" for i in range(20)]
+
+
+async def test_clicks_are_deferred_until_flush(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, flush_interval=60, flush_threshold=1000)
+
+    for _ in range(5):
+        await manager.get_next_video(1)
+
+    # Nothing written yet: the change is only marked dirty
+    assert await manager.redis_storage.load_user_queue(1, SOURCE_URL) is None
+    assert manager.get_flush_stats()["pending"] == 1
+
+    assert await manager.flush_dirty() == 1
+    saved = await manager.redis_storage.load_user_queue(1, SOURCE_URL)
+    assert saved["current_index"] == 5
+    await manager.close()
+
+
+async def test_threshold_triggers_flush(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, flush_interval=60, flush_threshold=3)
+
+    for user_id in range(3):
+        await manager.get_next_video(user_id)
+    await asyncio.sleep(0.05)
+
+    stats = manager.get_flush_stats()
+    assert stats["pending"] == 0
+    assert stats["queues_flushed"] == 3
+    assert stats["max_flush_size"] == 3
+    await manager.close()
+
+
+async def test_interval_bounds_staleness(redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, flush_interval=0.05, flush_threshold=1000)
+
+    await manager.get_next_video(1)
+    await asyncio.sleep(0.2)
+
+    assert await manager.redis_storage.load_user_queue(1, SOURCE_URL) is not None
+    await manager.close()
+
+
+async def test_close_forces_flush(redis_client, redis_manager):
+    manager = await redis_manager(SOURCE_URL, VIDEOS, flush_interval=60, flush_threshold=1000)
+    for user_id in range(10):
+        await manager.get_next_video(user_id)
+
+    await manager.close()
+
+    storage = RedisStorage(client=redis_client)
+    await storage.connect()
+    for user_id in range(10):
+        assert await storage.load_user_queue(user_id, SOURCE_URL) is not None
+
+
+async def test_batch_save_pipelines_entries(redis_client):
+    storage = RedisStorage(client=redis_client)
+    await storage.connect()
+    entries = [(user_id, SOURCE_URL, {"queue": [], "current_index": user_id}) for user_id in range(50)]
+
+    assert await storage.save_user_queues(entries)
+    assert (await storage.load_user_queue(49, SOURCE_URL))["current_index"] == 49
+    assert await redis_client.ttl(storage._get_queue_key(49, SOURCE_URL)) > 0
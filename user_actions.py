@@ -0,0 +1,157 @@
+"""
+Per-user serialized action queue that coalesces bursts of button clicks
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# handler(user_id, items) runs one batch; items are the submitted payloads in click order
+ActionHandler = Callable[[int, List[Any]], Awaitable[None]]
+
+
+class _Action:
+    __slots__ = ("handler", "item", "coalesce", "future")
+
+    def __init__(self, handler: ActionHandler, item: Any, coalesce: bool):
+        self.handler = handler
+        self.item = item
+        self.coalesce = coalesce
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _UserState:
+    __slots__ = ("pending", "workers", "window_end")
+
+    def __init__(self):
+        self.pending: List[_Action] = []
+        self.workers = 0
+        self.window_end = 0.0  # Loop time until which coalescing actions are held back
+
+
+class UserActionQueue:
+    """Runs each user's actions in click order, merging bursts into one batch
+
+    Debouncing is leading-edge: the first coalescing action of a burst runs
+    at once, and the ones that arrive within debounce seconds after it are
+    held until that window closes, then consecutive pending actions with the
+    same handler run as a single handler(user_id, items) call (e.g. one
+    cursor advance and one message edit for four trailing Next clicks). A
+    lone click is never delayed. Non-coalescing actions run on their own, in
+    order. At most max_concurrent batches run per user at a time (1 keeps
+    them strictly ordered). Users hold no state once their window is over.
+    """
+
+    def __init__(self, debounce: float = 0.25, max_concurrent: int = 1):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.debounce = debounce
+        self.max_concurrent = max_concurrent
+        self._users: Dict[int, _UserState] = {}
+        self._tasks = set()
+        self.stats = {
+            "actions": 0,
+            "batches": 0,
+            "coalesced": 0,  # Actions merged into another action's batch
+            "errors": 0
+        }
+
+    async def submit(self, user_id: int, handler: ActionHandler, item: Any, coalesce: bool = True):
+        """Queue an action and wait until the batch that carries it has run"""
+        action = _Action(handler, item, coalesce)
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState()
+        state.pending.append(action)
+        self.stats["actions"] += 1
+
+        if state.workers < self.max_concurrent:
+            state.workers += 1
+            task = asyncio.create_task(self._run_user(user_id, state))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        await action.future
+
+    def pending(self, user_id: int) -> int:
+        state = self._users.get(user_id)
+        return len(state.pending) if state else 0
+
+    async def _run_user(self, user_id: int, state: _UserState):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if state.pending and state.pending[0].coalesce and self.debounce > 0:
+                    delay = state.window_end - loop.time()
+                    if delay <= 0:
+                        # Leading edge: run now and hold back what follows
+                        state.window_end = loop.time() + self.debounce
+                        await self._run_batch(user_id, self._take_batch(state))
+                        continue
+                elif state.pending:
+                    await self._run_batch(user_id, self._take_batch(state))
+                    continue
+                else:
+                    delay = state.window_end - loop.time()
+                    if delay <= 0:
+                        break
+                # Let the rest of the burst arrive, then run it as the trailing batch
+                await asyncio.sleep(delay)
+        finally:
+            state.workers -= 1
+            if not state.workers and not state.pending and self._users.get(user_id) is state:
+                del self._users[user_id]
+
+    @staticmethod
+    def _take_batch(state: _UserState) -> List[_Action]:
+        """The head action plus the consecutive same-handler actions it absorbs"""
+        head = state.pending[0]
+        size = 1
+        if head.coalesce:
+            while (size < len(state.pending) and state.pending[size].coalesce
+                   and state.pending[size].handler is head.handler):
+                size += 1
+        batch = state.pending[:size]
+        del state.pending[:size]
+        return batch
+
+    async def _run_batch(self, user_id: int, batch: List[_Action]):
+        self.stats["batches"] += 1
+        self.stats["coalesced"] += len(batch) - 1
+        try:
+            await batch[0].handler(user_id, [action.item for action in batch])
+        except asyncio.CancelledError:
+            for action in batch:
+                if not action.future.done():
+                    action.future.cancel()
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"❌ Action for user {user_id} failed: {e}")
+            for action in batch:
+                if not action.future.done():
+                    action.future.set_exception(e)
+            return
+
+        for action in batch:
+            if not action.future.done():
+                action.future.set_result(None)
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["active_users"] = len(self._users)
+        return stats
+
+    async def close(self):
+        """Cancel running batches and drop everything still queued"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for state in self._users.values():
+            for action in state.pending:
+                if not action.future.done():
+                    action.future.cancel()
+        self._users.clear()
@@ -1,273 +1,1606 @@
 import random
 import aiohttp
 import asyncio
+import hashlib
 import logging
-from typing import List, Optional, Dict, Set
-from urllib.parse import unquote
-from redis_storage import RedisStorage
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Dict, Set, Tuple, Union
+from array import array
+from catalog import Catalog, ID_TYPECODE, NO_ID, extract_filename, iter_catalog_urls, pack_ids, unpack_ids
+from catalog_sync import CatalogSync, make_instance_id
+from catalog_snapshot import capture_snapshot, load_snapshot, write_snapshot
+from link_checker import LinkChecker
+from metrics import DEAD_LINKS_SKIPPED, ERRORS, FETCH_SECONDS, MERGE_SECONDS, NEXT_VIDEO_SECONDS, REFRESHES, timed
+from queue_cache import UserQueueCache
+from queue_invalidation import QueueInvalidations
+from redis_storage import REV_CONFLICT, RedisStorage
+from video_sources import MAX_NAME_LENGTH, SourceHealth, VideoSource
 
 logger = logging.getLogger(__name__)
 
 
-class UserQueue:
-    """Individual user's video queue"""
+class PersistedQueue(ABC):
+    """Tracks what part of a queue changed since it was last written to Redis
 
-    def __init__(self, all_videos: List[str], existing_queue: Optional[List[str]] = None, existing_index: int = 0):
-        if existing_queue and len(existing_queue) == len(all_videos):
-            # Restore from Redis
-            self.queue = existing_queue
+    The body (shuffled list or permutation parameters) only changes on a new
+    round or catalog change; between those only the cursor moves, which is
+    persisted as a small cursor update instead of a full rewrite.
+    """
+
+    body_dirty = True
+    saved_index: Optional[int] = None
+    catalog_version = 0  # Catalog version the queue reflects (see sync())
+    catalog_fingerprint: Optional[dict] = None  # Catalog.fingerprint() at that version, persisted with the body
+    revision = 0  # Redis revision this copy was loaded at or last wrote
+
+    @property
+    @abstractmethod
+    def position(self) -> int:
+        """Cursor within the current round"""
+
+    @property
+    @abstractmethod
+    def queue_size(self) -> int:
+        """Videos in the current round"""
+
+    @property
+    @abstractmethod
+    def exhausted(self) -> bool:
+        """Whether the current round has been played through"""
+
+    @abstractmethod
+    def next_video(self, catalog: Catalog) -> Optional[str]:
+        """Return the next video and advance, starting a new round when exhausted"""
+
+    @abstractmethod
+    def to_dict(self) -> dict:
+        """Serialized state for Redis"""
+
+    @abstractmethod
+    def apply_catalog_change(self, added_ids: List[int], removed_ids: Set[int]) -> bool:
+        """Add new videos and drop removed ones; returns True if the body changed"""
+
+    @abstractmethod
+    def apply_remap(self, remap: array) -> bool:
+        """Renumber held IDs after a catalog compaction"""
+
+    @abstractmethod
+    def diff_catalog(self, catalog: Catalog) -> Tuple[List[int], Set[int]]:
+        """(added, removed) IDs between this queue and the live catalog, for a full repair"""
+
+    @abstractmethod
+    def upcoming(self, catalog: Catalog, count: int) -> List[str]:
+        """URLs of the next count live videos, without advancing
+
+        Near the end of a round this continues into the start of the next
+        one over the live catalog, so its first videos are checked before
+        they are served.
+        """
+
+    @abstractmethod
+    def start_round(self, catalog: Catalog):
+        """Start a new round over the live catalog"""
+
+    def catch_up(self, steps: List[Tuple[Optional[array], List[int], Set[int]]]) -> bool:
+        """Apply Catalog.steps_since() output; returns True if the body changed"""
+        changed = False
+        for remap, added_ids, removed_ids in steps:
+            if remap is not None:
+                changed = self.apply_remap(remap) or changed
+            changed = self.apply_catalog_change(added_ids, removed_ids) or changed
+        return changed
+
+    def sync(self, catalog: Catalog) -> bool:
+        """Catch up with catalog changes since the queue last saw it; returns True if the body changed
+
+        Refreshes only append to the catalog's delta log; each queue pays
+        for the changes when it is next used. A queue the log no longer
+        reaches is repaired by diff, or starts a new round if a compaction
+        renumbered the IDs it holds.
+        """
+        if self.catalog_version == catalog.version:
+            return False
+        steps = catalog.steps_since(self.catalog_version)
+        if steps is None:
+            if not catalog.ids_compatible(self.catalog_fingerprint):
+                self.start_round(catalog)
+                self._seen_catalog(catalog)
+                return True
+            steps = [(None, *self.diff_catalog(catalog))]
+        changed = self.catch_up(steps)
+        self._seen_catalog(catalog)
+        return changed
+
+    def restore_sync(self, catalog: Catalog, fingerprint: Optional[dict]) -> bool:
+        """Repair restored state against the catalog it was saved with; False if its IDs mean nothing here
+
+        Same lineage: replay the delta log (compactions included). IDs still
+        valid (matching ID table digest): repair by diff. Either way removed
+        videos are dropped, added ones spliced in and the cursor kept. State
+        saved before fingerprints existed is assumed to use current IDs and
+        repaired by diff.
+        """
+        steps = catalog.steps_since_fingerprint(fingerprint) if fingerprint else None
+        if steps is None:
+            if fingerprint and not catalog.ids_compatible(fingerprint):
+                return False
+            steps = [(None, *self.diff_catalog(catalog))]
+        if fingerprint:
+            # Until it has caught up, the saved state refers to the catalog it was saved with
+            self.catalog_version = int(fingerprint.get("version", 0))
+            self.catalog_fingerprint = fingerprint
+        self.catch_up(steps)
+        self._seen_catalog(catalog)
+        return True
+
+    def _seen_catalog(self, catalog: Catalog):
+        self.catalog_version = catalog.version
+        self.catalog_fingerprint = catalog.fingerprint()
+
+    def mark_restored(self):
+        """Record that the current state matches what is stored in Redis"""
+        self.body_dirty = False
+        self.saved_index = self.position
+
+    @property
+    def has_pending_write(self) -> bool:
+        return self.body_dirty or self.saved_index is None or self.position != self.saved_index
+
+    def take_pending_write(self) -> Tuple[Optional[dict], int]:
+        """Return (full state if the body changed else None, cursor delta) and mark it saved
+
+        Marking happens before the write is awaited so concurrent saves never
+        count the same cursor advance twice; callers set body_dirty again if
+        the write fails so the next save rewrites the whole (idempotent) state.
+        """
+        if self.body_dirty or self.saved_index is None:
+            full, delta = self.to_dict(), 0
+        else:
+            full, delta = None, self.position - self.saved_index
+        self.mark_restored()
+        return full, delta
+
+
+class UserQueue(PersistedQueue):
+    """Individual user's video queue, stored as a compact array of catalog IDs"""
+
+    def __init__(self, catalog: Catalog, existing_queue: Optional[Iterable[int]] = None, existing_index: int = 0):
+        self._seen_catalog(catalog)
+        # Next round's order once upcoming() has looked past this one (not persisted)
+        self._next_round: Optional[array] = None
+        self._next_round_version: Optional[int] = None
+        if existing_queue:
+            # Restore from Redis (reconciled with the catalog by restore_sync())
+            self.queue = array(ID_TYPECODE, existing_queue)
             self.current_index = existing_index
+            self.mark_restored()
             logger.debug(f"Restored user queue from Redis: {len(self.queue)} videos, index {self.current_index}")
         else:
             # Create new shuffled queue
-            self.queue: List[str] = all_videos.copy()
-            random.shuffle(self.queue)
+            self.queue = self._shuffled(catalog)
             self.current_index = 0
             logger.debug(f"Created new user queue with {len(self.queue)} videos")
 
+    @staticmethod
+    def _shuffled(catalog: Catalog) -> array:
+        queue = array(ID_TYPECODE, catalog.live_ids)
+        random.shuffle(queue)
+        return queue
+
+    @property
+    def queue_size(self) -> int:
+        return len(self.queue)
+
+    @property
+    def position(self) -> int:
+        return self.current_index
+
+    @property
+    def exhausted(self) -> bool:
+        return self.current_index >= len(self.queue)
+
+    def _draw_next_round(self, catalog: Catalog) -> array:
+        if self._next_round is None:
+            self._next_round = self._shuffled(catalog)
+            self._next_round_version = catalog.version
+        return self._next_round
+
+    def start_round(self, catalog: Catalog):
+        queue, self._next_round = self._next_round, None
+        if queue is None:
+            queue = self._shuffled(catalog)
+        elif self._next_round_version != catalog.version:
+            # Drawn before the catalog last changed: drop removed videos, shuffle in new ones
+            live = set(catalog.live_ids)
+            queue = array(ID_TYPECODE, (video_id for video_id in queue if video_id in live))
+            drawn = set(queue)
+            added = array(ID_TYPECODE, (video_id for video_id in catalog.live_ids if video_id not in drawn))
+            random.shuffle(added)
+            queue.extend(added)
+        self.queue = queue
+        self.current_index = 0
+        self._seen_catalog(catalog)
+        self.body_dirty = True
+
+    def next_video(self, catalog: Catalog) -> Optional[str]:
+        """Return the next video, reshuffling a new round when the queue is exhausted"""
+        while True:
+            if self.exhausted:
+                self.start_round(catalog)
+                if not self.queue:
+                    return None
+
+            video_id = self.queue[self.current_index]
+            self.current_index += 1
+            video_url = catalog.url(video_id)
+            if video_url is not None:
+                return video_url
+
+    def apply_catalog_change(self, added_ids: List[int], removed_ids: Set[int]) -> bool:
+        """Add new videos to the current round and drop removed ones; returns True if changed"""
+        changed = False
+
+        if added_ids:
+            # Shuffle new videos and append them after the remaining (unplayed) videos
+            # This ensures new videos are added to current round
+            shuffled_new = array(ID_TYPECODE, added_ids)
+            random.shuffle(shuffled_new)
+            self.queue.extend(shuffled_new)
+            changed = True
+
+        if removed_ids:
+            original_length = len(self.queue)
+
+            # Removed videos that were already played shift the cursor back
+            played_removed = sum(1 for v in self.queue[:self.current_index] if v in removed_ids)
+
+            # Filter out removed videos
+            self.queue = array(ID_TYPECODE, (v for v in self.queue if v not in removed_ids))
+            self.current_index -= played_removed
+
+            changed = changed or len(self.queue) != original_length
+
+        if changed:
+            self.body_dirty = True
+        return changed
+
+    def apply_remap(self, remap: array) -> bool:
+        """Renumber queued IDs; IDs the compaction dropped were not live and are removed"""
+        queue = array(ID_TYPECODE)
+        played_removed = 0
+        for index, video_id in enumerate(self.queue):
+            new_id = remap[video_id] if video_id < len(remap) else NO_ID
+            if new_id == NO_ID:
+                played_removed += index < self.current_index
+            else:
+                queue.append(new_id)
+        self.queue = queue
+        self.current_index -= played_removed
+        self._next_round = None  # Drawn in the old ID space
+        self.body_dirty = True
+        return True
+
+    def upcoming(self, catalog: Catalog, count: int) -> List[str]:
+        urls = []
+        for index in range(self.current_index, len(self.queue)):
+            if len(urls) >= count:
+                break
+            url = catalog.url(self.queue[index])
+            if url is not None:
+                urls.append(url)
+        if len(urls) < count and len(catalog):
+            for video_id in self._draw_next_round(catalog):
+                if len(urls) >= count:
+                    break
+                url = catalog.url(video_id)
+                if url is not None:
+                    urls.append(url)
+        return urls
+
+    def diff_catalog(self, catalog: Catalog) -> Tuple[List[int], Set[int]]:
+        queued = set(self.queue)
+        live = set(catalog.live_ids)
+        added = [video_id for video_id in catalog.live_ids if video_id not in queued]
+        return added, queued - live
+
+    def to_dict(self) -> dict:
+        """Serialize queue to dict for Redis storage (IDs packed as binary)"""
+        return {
+            "ids": pack_ids(self.queue),
+            "current_index": self.current_index,
+            "catalog": self.catalog_fingerprint
+        }
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(x: int) -> int:
+    """SplitMix64 finalizer, used as the Feistel round function"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class PermutationQueue(PersistedQueue):
+    """User queue stored as a seeded pseudo-random permutation (O(1) state)
+
+    Each round is a keyed Feistel permutation of catalog IDs [0, size).
+    The video at cursor i is catalog.url(permute(i)), so nothing is
+    materialized and the persisted state is four integers regardless of
+    catalog size. Cycle-walking keeps the permutation inside [0, size);
+    the Feistel domain is less than 4x size, so a lookup takes fewer than
+    four walks on average.
+
+    Videos added mid-round join the next round. IDs removed from the
+    catalog are skipped; since IDs are stable, removals never shift the
+    rest of the round. A round that spans a catalog compaction keeps
+    permuting the IDs it started with and maps each pick through the
+    catalog's remap (id_fingerprint names that ID space and is what gets
+    persisted); if the map is gone a new round starts. The cursor is
+    serialized as current_index like UserQueue so storage can update it in
+    place.
+    """
+
+    MODE = "permutation"
+    FEISTEL_ROUNDS = 4
+
+    def __init__(self, catalog: Catalog, seed: Optional[int] = None,
+                 round_number: int = 0, cursor: int = 0, size: Optional[int] = None):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.round = round_number
+        self.cursor = cursor
+        self.size = catalog.id_count if size is None else size
+        self._seen_catalog(catalog)
+        self.id_fingerprint: Optional[dict] = None  # ID space of this round, if compacted since
+        self._keys_round: Optional[int] = None
+        self._keys: List[int] = []
+
+    @classmethod
+    def from_dict(cls, catalog: Catalog, data: dict) -> "PermutationQueue":
+        """Restore a queue serialized by to_dict()"""
+        queue = cls(
+            catalog,
+            seed=int(data["seed"]),
+            round_number=int(data.get("round", 0)),
+            cursor=int(data.get("current_index", data.get("cursor", 0))),
+            size=int(data.get("size", catalog.id_count))
+        )
+        queue.mark_restored()
+        return queue
+
+    @property
+    def queue_size(self) -> int:
+        return self.size
+
+    @property
+    def position(self) -> int:
+        return self.cursor
+
+    @property
+    def exhausted(self) -> bool:
+        return self.cursor >= self.size
+
+    def _round_keys(self, round_number: int) -> List[int]:
+        """Feistel keys derived from seed and round number (cached for the current round)"""
+        if self._keys_round == round_number:
+            return self._keys
+        base = _mix64(self.seed ^ _mix64(round_number))
+        keys = [_mix64(base + i) for i in range(self.FEISTEL_ROUNDS)]
+        if round_number == self.round:
+            self._keys, self._keys_round = keys, round_number
+        return keys
+
+    def permute(self, index: int, round_number: Optional[int] = None, size: Optional[int] = None) -> int:
+        """Map cursor index to catalog ID for the current round (or another round and size)"""
+        size = self.size if size is None else size
+        half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        half_mask = (1 << half_bits) - 1
+        keys = self._round_keys(self.round if round_number is None else round_number)
+
+        x = index
+        while True:
+            left, right = x >> half_bits, x & half_mask
+            for key in keys:
+                left, right = right, left ^ (_mix64(right ^ key) & half_mask)
+            x = (left << half_bits) | right
+            # Cycle-walk until we land back inside [0, size)
+            if x < size:
+                return x
+
+    def video_id(self, catalog: Catalog, index: int) -> int:
+        """Current catalog ID at a cursor index (NO_ID if that video was compacted away)
+
+        Raises KeyError if the round's IDs can no longer be mapped.
+        """
+        video_id = self.permute(index)
+        if self.id_fingerprint is not None:
+            remap = catalog.remap_since(int(self.id_fingerprint["version"]))
+            if remap is not None:
+                video_id = remap[video_id]
+        return video_id
+
+    def start_round(self, catalog: Catalog):
+        self.round += 1
+        self.cursor = 0
+        self.size = catalog.id_count
+        self.id_fingerprint = None
+        self.body_dirty = True
+
+    def next_video(self, catalog: Catalog) -> Optional[str]:
+        """Return the next video, starting a new permutation round when exhausted"""
+        while True:
+            if self.exhausted:
+                if not len(catalog):
+                    return None
+                self.start_round(catalog)
+
+            try:
+                video_url = catalog.url(self.video_id(catalog, self.cursor))
+            except KeyError:
+                logger.debug("Permutation round outlived the catalog's ID remaps, starting a new round")
+                self.start_round(catalog)
+                continue
+            self.cursor += 1
+            if video_url is not None:
+                return video_url
+
+    def apply_catalog_change(self, added_ids: List[int], removed_ids: Set[int]) -> bool:
+        """Nothing to rewrite: the round keeps indexing the live catalog"""
+        return False
+
+    def apply_remap(self, remap: array) -> bool:
+        """Nothing to rewrite: picks are mapped through the catalog's remaps (see video_id())"""
+        return False
+
+    def catch_up(self, steps: List[Tuple[Optional[array], List[int], Set[int]]]) -> bool:
+        """Only compactions matter: remember which ID space the round permutes"""
+        if self.id_fingerprint is None and any(remap is not None for remap, _, _ in steps):
+            self.id_fingerprint = self.catalog_fingerprint
+        return False
+
+    def diff_catalog(self, catalog: Catalog) -> Tuple[List[int], Set[int]]:
+        return [], set()
+
+    def upcoming(self, catalog: Catalog, count: int) -> List[str]:
+        urls = []
+        try:
+            for index in range(self.cursor, self.size):
+                if len(urls) >= count:
+                    break
+                url = catalog.url(self.video_id(catalog, index))
+                if url is not None:
+                    urls.append(url)
+        except KeyError:
+            urls = []  # next_video() starts a new round right away
+        else:
+            if len(urls) >= count:
+                return urls
+        # The next round is already determined: seed, round + 1 and today's ID space
+        size = catalog.id_count
+        for index in range(size):
+            if len(urls) >= count:
+                break
+            url = catalog.url(self.permute(index, self.round + 1, size))
+            if url is not None:
+                urls.append(url)
+        return urls
+
     def to_dict(self) -> dict:
-        """Serialize queue to dict for Redis storage"""
+        """Serialize queue state to dict for Redis storage"""
         return {
-            "queue": self.queue,
-            "current_index": self.current_index
+            "mode": self.MODE,
+            "seed": self.seed,
+            "round": self.round,
+            "current_index": self.cursor,
+            "size": self.size,
+            "catalog": self.id_fingerprint or self.catalog_fingerprint
         }
 
 
 class VideoManager:
     """Manages video queues per user - ensures all videos play before repeating for each user"""
 
-    def __init__(self, json_url: str):
+    QUEUE_MODES = ("shuffle", PermutationQueue.MODE)
+    FLUSH_BATCH_SIZE = 500  # Queues per pipelined round trip
+    HTTP_POOL_SIZE = 10
+    FETCH_TIMEOUT_SECONDS = 30
+    FETCH_CHUNK_SIZE = 64 * 1024
+    MAX_CONFLICT_RETRIES = 2  # Re-picks of a click whose write found a newer revision
+    MAX_DEAD_SKIPS = 10  # Known-dead videos skipped per click before serving one anyway
+
+    def __init__(self, json_url: str, redis_storage: Optional[RedisStorage] = None, queue_mode: str = "shuffle",
+                 flush_interval: float = 0, flush_threshold: int = 100, snapshot_dir: Optional[str] = None,
+                 sources: Optional[List[Union[str, VideoSource]]] = None, refresh_concurrency: int = 4,
+                 cache_max_users: int = 0, cache_max_bytes: int = 0, cache_idle_seconds: float = 0,
+                 leader_lease_seconds: float = 0, queue_coherence: bool = False,
+                 prefetch_ahead: int = 0, link_check_concurrency: int = 4, link_check_ttl: float = 1800.0):
+        """
+        Args:
+            json_url: Default video source
+            sources: Additional sources kept resident next to the default one (URLs or VideoSource)
+            refresh_concurrency: Max catalog fetches in flight at once
+            cache_max_users / cache_max_bytes: Bounds of the in-memory queue cache (0 = unbounded)
+            cache_idle_seconds: Evict users idle this long (0 = never); needs Redis to write them back
+            flush_interval: Write-behind max staleness in seconds; 0 saves every change immediately
+            flush_threshold: Flush early once this many queues are dirty
+            snapshot_dir: Directory for on-disk catalog snapshots; None disables them
+            leader_lease_seconds: With Redis, elect one refreshing instance per source holding a
+                lease this long; the others apply its published deltas (0 = every instance fetches)
+            queue_coherence: With Redis, keep cached queues coherent with writes by other replicas
+            prefetch_ahead: Check this many upcoming videos of a user's queue in the background after
+                each click, and skip known-dead links when serving (0 = disabled)
+            link_check_concurrency / link_check_ttl: HEAD checks in flight and how long results are kept
+        """
+        if queue_mode not in self.QUEUE_MODES:
+            raise ValueError(f"Unknown queue mode '{queue_mode}', expected one of {self.QUEUE_MODES}")
+
+        self.queue_mode = queue_mode
+        self.snapshot_dir = snapshot_dir
+        # Interned catalogs per source, all kept resident: {source_url: Catalog}
+        self.catalogs: Dict[str, Catalog] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}  # Background refresh task per source
+        self._refresh_semaphore = asyncio.Semaphore(max(1, refresh_concurrency))
+        # Source settings and refresh health, keyed by URL
+        self.source_configs: Dict[str, VideoSource] = {}
+        self.source_health: Dict[str, SourceHealth] = {}
         self.json_url = json_url
-        self.all_videos: List[str] = []
+        self.sources: List[str] = []
+        self.set_sources(json_url, sources or [])
         # Changed to support multi-source queues: {user_id: {source_url: UserQueue}}
-        self.user_queues: Dict[int, Dict[str, UserQueue]] = {}
-        self.redis_storage = RedisStorage()  # Initialize Redis storage
-        self._refresh_task: Optional[asyncio.Task] = None  # Background refresh task
+        # Bounded LRU: evicted queues are written back to Redis and reloaded on next use.
+        # It also holds each user's source choice; users without one use json_url
+        self.user_queues = UserQueueCache(cache_max_users, cache_max_bytes, cache_idle_seconds)
+        self._evicting: Dict[Tuple[int, str], PersistedQueue] = {}  # Evicted, write-back pending
+        self._cache_task: Optional[asyncio.Task] = None
+        self._write_back_task: Optional[asyncio.Task] = None
+        # Initialize Redis storage (call connect() before serving)
+        self.redis_storage = redis_storage or RedisStorage()
+        # Cross-replica refresh leadership, started by connect() when Redis is available
+        self.leader_lease_seconds = leader_lease_seconds
+        self.catalog_sync: Optional[CatalogSync] = None
+        # Cross-replica queue coherence (invalidations + revision checks), also started by connect()
+        self.queue_coherence = queue_coherence
+        self.invalidations: Optional[QueueInvalidations] = None
+        self.instance_id = make_instance_id()
+        self.coherence_stats = {
+            "conflicts": 0,
+            "invalidated": 0,
+            "retried_clicks": 0
+        }
 
-    async def fetch_videos(self, merge_new: bool = False) -> bool:
-        """Fetch videos from JSON URL
+        # Write-behind state: dirty (user_id, source_url) pairs flushed in pipelined batches
+        self.flush_interval = flush_interval
+        self.flush_threshold = max(1, flush_threshold)
+        self._dirty: Set[Tuple[int, str]] = set()
+        self._pending_sources: Dict[int, Optional[str]] = {}  # Source choices not yet stored
+        self._flush_event = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flush_lock = asyncio.Lock()
+        self.flush_stats = {
+            "flushes": 0,
+            "queues_flushed": 0,
+            "failed_flushes": 0,
+            "last_flush_size": 0,
+            "max_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0
+        }
+
+        # Catalog fetching: one pooled session plus per-source HTTP validators
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Dead-link prefetch: HEAD checks of upcoming videos through the same session
+        self.prefetch_ahead = prefetch_ahead
+        self.link_checker: Optional[LinkChecker] = None
+        if prefetch_ahead > 0:
+            self.link_checker = LinkChecker(self._get_session, concurrency=link_check_concurrency,
+                                            ttl=link_check_ttl)
+        self._fetch_validators: Dict[str, dict] = {}
+        self.fetch_stats = {
+            "fetches": 0,
+            "not_modified": 0,
+            "unchanged_body": 0,
+            "errors": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+            "last_fetch_ms": 0.0,
+            "total_fetch_ms": 0.0
+        }
+
+        # Startup warm-up: queues preloaded from the activity index, and whether
+        # candidates' first accesses found them in memory (hit) or came before
+        # warm-up had loaded them and still went to Redis (miss)
+        self._warmed: Set[Tuple[int, str]] = set()
+        self._warmup_pending: Set[Tuple[int, str]] = set()  # Candidates not loaded yet
+        self.warmup_stats = {
+            "candidates": 0,
+            "loaded": 0,
+            "missing": 0,
+            "skipped": 0,
+            "duration_ms": 0.0,
+            "first_access_hits": 0,
+            "first_access_misses": 0
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Long-lived pooled HTTP session shared by all catalog fetches"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.HTTP_POOL_SIZE, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.FETCH_TIMEOUT_SECONDS)
+            )
+        return self._session
+
+    def set_sources(self, json_url: str, sources: Iterable[Union[str, VideoSource]]):
+        """Set the default and additional sources; catalogs of dropped sources are released
+
+        Plain URLs get default refresh settings (or keep their current ones).
+        """
+        explicit = {source.url: source for source in sources if isinstance(source, VideoSource)}
+        urls = [source.url if isinstance(source, VideoSource) else source for source in sources]
+
+        configs = {}
+        for url in dict.fromkeys([json_url, *urls]):
+            configs[url] = explicit.get(url) or self.source_configs.get(url) or self._plain_source(url)
+            self.source_health.setdefault(url, SourceHealth())
+
+        self.json_url = json_url
+        self.source_configs = configs
+        self.sources = list(configs)
+        for source_url in list(self.catalogs):
+            if source_url not in configs:
+                self.catalogs.pop(source_url).close()
+        for source_url in list(self.source_health):
+            if source_url not in configs:
+                del self.source_health[source_url]
+        for source_url in list(self._refresh_tasks):
+            if source_url not in configs:
+                self._refresh_tasks.pop(source_url).cancel()
+
+    @staticmethod
+    def _plain_source(url: str) -> VideoSource:
+        """Source for a bare URL, named by the URL itself (or its hash when too long for a custom_id)"""
+        name = url if len(url) <= MAX_NAME_LENGTH else "src-" + hashlib.sha1(url.encode()).hexdigest()[:12]
+        return VideoSource(name, url, label=url)
+
+    def get_source(self, name: str) -> Optional[VideoSource]:
+        """Look up a configured source by name"""
+        for source in self.source_configs.values():
+            if source.name == name:
+                return source
+        return None
+
+    async def fetch_all(self, merge_new: bool = False) -> Dict[str, bool]:
+        """Fetch every configured source concurrently; returns success per source"""
+        results = await asyncio.gather(*(self.fetch_videos(merge_new, source_url) for source_url in self.sources))
+        return dict(zip(self.sources, results))
+
+    def load_snapshots(self) -> List[str]:
+        """Load on-disk snapshots for every configured source; returns the sources loaded"""
+        return [source_url for source_url in self.sources if self.load_snapshot(source_url)]
+
+    async def fetch_videos(self, merge_new: bool = False, source_url: Optional[str] = None) -> bool:
+        """Fetch videos from a source's JSON URL (the default source if not given)
+
+        Sends If-None-Match / If-Modified-Since once the source's catalog is
+        loaded; a 304 skips parsing and merging entirely. A 200 is parsed as
+        it streams in, so its body hash is only known at the end: an
+        unchanged body still costs the parse (one dict lookup per URL, no new
+        IDs kept) but skips the merge. That trades some CPU on unchanged 200s
+        for never buffering the manifest. At most refresh_concurrency fetches
+        run at once, each bounded by its source's timeout; the outcome is
+        recorded in source_health.
 
         Args:
             merge_new: If True, merge new videos into existing queues instead of clearing
         """
+        source_url = source_url or self.json_url
+        health = self.source_health.setdefault(source_url, SourceHealth())
+
+        sync = self.catalog_sync
+        if sync and not sync.is_leader(source_url):
+            # Another replica refreshes this source: take its published catalog instead of the origin
+            start = time.perf_counter()
+            try:
+                synced = await sync.pull(source_url)
+            except Exception as e:
+                ERRORS.labels("redis").inc()
+                logger.warning(f"⚠️  Could not load the published catalog for {source_url} ({e}), fetching it")
+                synced = False
+            if synced:
+                REFRESHES.labels(self._source_label(source_url), "synced").inc()
+                health.record_success((time.perf_counter() - start) * 1000)
+                return True
+            # No leader has published yet (first deployment): fetch it ourselves
+
+        async with self._refresh_semaphore:
+            start = time.perf_counter()
+            error = await self._fetch_source(source_url, merge_new)
+            elapsed = time.perf_counter() - start
+
+        source_name = self._source_label(source_url)
+        FETCH_SECONDS.labels(source_name).observe(elapsed)
+        if error is None:
+            REFRESHES.labels(source_name, "ok").inc()
+            health.record_success(elapsed * 1000)
+            if sync and sync.is_leader(source_url):
+                await sync.ensure_published(source_url)
+            return True
+        REFRESHES.labels(source_name, "error").inc()
+        ERRORS.labels("fetch").inc()
+        health.record_failure(error, elapsed * 1000)
+        return False
+
+    def _source_label(self, source_url: str) -> str:
+        source = self.source_configs.get(source_url)
+        return source.name if source else source_url
+
+    async def _fetch_source(self, source_url: str, merge_new: bool) -> Optional[str]:
+        """Fetch and apply one source's catalog; returns an error message on failure"""
+        source = self.source_configs.get(source_url)
+        timeout = aiohttp.ClientTimeout(total=source.timeout if source else self.FETCH_TIMEOUT_SECONDS)
+        catalog = self._catalog_for(source_url)
+        validators = self._fetch_validators.get(source_url, {})
+        stats = self.fetch_stats
+
+        headers = {}
+        if len(catalog):
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        start = time.perf_counter()
+        stats["fetches"] += 1
+        update = None
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.json_url) as response:
-                    if response.status == 200:
-                        new_videos = await response.json()
-                        logger.info(f"Fetched {len(new_videos)} videos from {self.json_url}")
-
-                        if merge_new and self.all_videos:
-                            # Merge new videos into existing queues
-                            await self._merge_new_videos(new_videos)
-                        else:
-                            # Initial fetch or source switch - replace all
-                            self.all_videos = new_videos
-                            # Note: Don't clear user_queues - we keep queues for all sources
-
-                        return True
-                    else:
-                        logger.error(f"Failed to fetch videos: HTTP {response.status}")
-                        return False
+            async with self._get_session().get(source_url, headers=headers, timeout=timeout) as response:
+                if response.status == 304:
+                    stats["not_modified"] += 1
+                    stats["bytes_saved"] += validators.get("body_size", 0)
+                    logger.info(f"Video list unchanged (HTTP 304) for {source_url}")
+                    return None
+
+                if response.status != 200:
+                    stats["errors"] += 1
+                    logger.error(f"Failed to fetch videos from {source_url}: HTTP {response.status}")
+                    return f"HTTP {response.status}"
+
+                # Stream the manifest straight into the catalog: the body is
+                # never buffered, only hashed as it passes through
+                hasher = hashlib.sha256()
+                body_size = 0
+
+                async def chunks():
+                    nonlocal body_size
+                    async for chunk in response.content.iter_chunked(self.FETCH_CHUNK_SIZE):
+                        hasher.update(chunk)
+                        body_size += len(chunk)
+                        yield chunk
+
+                update = catalog.begin_update()
+                async for url in iter_catalog_urls(chunks()):
+                    update.add(url)
+
+                stats["bytes_downloaded"] += body_size
+                body_hash = hasher.hexdigest()
+                self._fetch_validators[source_url] = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "body_hash": body_hash,
+                    "body_size": body_size
+                }
+
+            if len(catalog) and body_hash == validators.get("body_hash"):
+                update.discard()
+                stats["unchanged_body"] += 1
+                logger.info(f"Video list body unchanged for {source_url}, skipping merge")
+                return None
+
+            had_videos = len(catalog) > 0
+            with MERGE_SECONDS.labels(self._source_label(source_url)).time():
+                added_ids, removed_ids = update.commit()
+                if merge_new and had_videos:
+                    # Merge new videos into existing queues
+                    await self._apply_catalog_delta(source_url, added_ids, removed_ids)
+            logger.info(f"Fetched {len(catalog)} videos from {source_url}")
+
+            if self.catalog_sync and self.catalog_sync.is_leader(source_url) and (added_ids or removed_ids):
+                await self.catalog_sync.publish(source_url, [catalog.url(video_id) for video_id in added_ids],
+                                                update.removed_urls)
+            # Otherwise: initial fetch - the catalog was replaced
+            # Note: Don't clear user_queues - we keep queues for all sources
+
+            # Keep the last good catalog on disk for the next cold start
+            await self._save_snapshot(source_url)
+            return None
         except Exception as e:
-            logger.error(f"Error fetching videos: {e}")
+            if update is not None:
+                update.discard()  # Release the IDs a broken stream interned
+            stats["errors"] += 1
+            logger.error(f"Error fetching videos from {source_url}: {e!r}")
+            return str(e) or type(e).__name__
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats["last_fetch_ms"] = elapsed_ms
+            stats["total_fetch_ms"] += elapsed_ms
+
+    def _snapshot_path(self, source_url: str) -> str:
+        source_key = hashlib.md5(source_url.encode()).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"{source_key}.catalog")
+
+    def load_snapshot(self, source_url: Optional[str] = None) -> bool:
+        """Load the on-disk snapshot of a source's catalog so it can serve before the first fetch
+
+        The snapshot is memory-mapped and verified (format version and checksum);
+        its HTTP validators are restored so the reconciling fetch can be a 304.
+        """
+        source_url = source_url or self.json_url
+        if not self.snapshot_dir or len(self._catalog_for(source_url)):
             return False
 
+        snapshot = load_snapshot(self._snapshot_path(source_url))
+        if snapshot is None:
+            return False
+        if snapshot.meta.get("source_url") != source_url:
+            logger.warning(f"⚠️  Snapshot source mismatch for {source_url}, ignoring it")
+            snapshot.close()
+            return False
+
+        replaced = self.catalogs.get(source_url)
+        self.catalogs[source_url] = Catalog.from_snapshot(snapshot)
+        if replaced is not None:
+            replaced.close()
+        self._fetch_validators[source_url] = snapshot.meta.get("validators", {})
+        logger.info(f"💾 Loaded catalog snapshot for {source_url}: {len(snapshot.live_ids)} videos")
+        return True
+
+    async def _save_snapshot(self, source_url: str):
+        """Write the source's catalog to disk off the event loop"""
+        if not self.snapshot_dir:
+            return
+
+        strings, live_ids = capture_snapshot(self._catalog_for(source_url))
+        meta = {
+            "source_url": source_url,
+            "catalog": self._catalog_for(source_url).fingerprint(),
+            "saved_at": time.time(),
+            "validators": self._fetch_validators.get(source_url, {})
+        }
+        try:
+            size = await asyncio.to_thread(write_snapshot, self._snapshot_path(source_url), strings, live_ids, meta)
+            logger.debug(f"Saved catalog snapshot for {source_url} ({size} bytes)")
+        except OSError as e:
+            logger.error(f"Failed to save catalog snapshot for {source_url}: {e}")
+
+    def get_fetch_stats(self) -> dict:
+        """Catalog refresh counters: 304 rate, bytes saved and fetch latency"""
+        stats = dict(self.fetch_stats)
+        fetches = stats["fetches"]
+        stats["not_modified_rate"] = stats["not_modified"] / fetches if fetches else 0.0
+        stats["avg_fetch_ms"] = stats["total_fetch_ms"] / fetches if fetches else 0.0
+        return stats
+
+    @property
+    def catalog(self) -> Catalog:
+        """Interned catalog for the current source"""
+        return self._catalog_for(self.json_url)
+
+    def _catalog_for(self, source_url: str) -> Catalog:
+        catalog = self.catalogs.get(source_url)
+        if catalog is None:
+            catalog = self.catalogs[source_url] = Catalog()
+        return catalog
+
+    @property
+    def all_videos(self) -> List[str]:
+        """Live video URLs of the current source"""
+        return self.catalog.video_urls()
+
+    @all_videos.setter
+    def all_videos(self, videos: List[str]):
+        # Initial fetch or source switch - replace the catalog contents, keeping IDs stable
+        self.catalog.update(videos)
+
     async def _merge_new_videos(self, new_videos: List[str]):
         """Merge new videos into existing queues intelligently"""
-        old_videos_set: Set[str] = set(self.all_videos)
-        new_videos_set: Set[str] = set(new_videos)
+        # Find added and removed videos (IDs are stable, added keeps source order)
+        with MERGE_SECONDS.labels(self._source_label(self.json_url)).time():
+            added_ids, removed_ids = self.catalog.update(new_videos)
+            await self._apply_catalog_delta(self.json_url, added_ids, removed_ids)
 
-        # Find added and removed videos
-        added_videos = list(new_videos_set - old_videos_set)
-        removed_videos = old_videos_set - new_videos_set
+    async def _apply_catalog_delta(self, source_url: str, added_ids: List[int], removed_ids: Set[int]):
+        """Report a committed catalog change
 
-        if not added_videos and not removed_videos:
+        User queues are not touched here: the change is in the catalog's
+        delta log and each queue catches up when it is next accessed, so a
+        refresh costs the same regardless of how many users there are.
+        """
+        if not added_ids and not removed_ids:
             logger.debug("No changes in video list")
             return
 
-        if added_videos:
-            logger.info(f"➕ Found {len(added_videos)} new videos")
+        if added_ids:
+            logger.info(f"➕ Found {len(added_ids)} new videos")
+        if removed_ids:
+            logger.info(f"➖ Removed {len(removed_ids)} videos from source")
 
-            # Add new videos to all user queues for current source
-            for user_id, source_queues in self.user_queues.items():
-                # Only update queue for current source
-                if self.json_url not in source_queues:
-                    continue
-                user_queue = source_queues[self.json_url]
-                # Get remaining videos (not yet played)
-                remaining_videos = user_queue.queue[user_queue.current_index:]
-
-                # Shuffle new videos
-                shuffled_new = added_videos.copy()
-                random.shuffle(shuffled_new)
-
-                # Insert new videos into remaining queue
-                # This ensures new videos are added to current round
-                user_queue.queue = (
-                    user_queue.queue[:user_queue.current_index] +  # Already played
-                    remaining_videos + shuffled_new  # Remaining + new videos
-                )
-
-                # Save updated queue to Redis
-                self._save_user_queue(user_id)
-                logger.debug(f"Added {len(added_videos)} new videos to user {user_id}'s queue")
-
-        if removed_videos:
-            logger.info(f"➖ Removed {len(removed_videos)} videos from source")
-
-            # Remove deleted videos from all user queues for current source
-            for user_id, source_queues in self.user_queues.items():
-                if self.json_url not in source_queues:
+        catalog = self._catalog_for(source_url)
+        logger.info(f"✅ Video list updated: {len(catalog)} total videos (catalog version {catalog.version})")
+
+    async def apply_remote_catalog(self, source_url: str, urls: Optional[List[str]] = None,
+                                   added: Iterable[str] = (), removed: Iterable[str] = ()):
+        """Apply a catalog published by the refresh leader: a full URL list, or an added/removed delta"""
+        catalog = self._catalog_for(source_url)
+        if urls is not None:
+            added_ids, removed_ids = catalog.update(urls)
+        else:
+            added_ids, removed_ids = catalog.apply_changes(added, removed)
+        await self._apply_catalog_delta(source_url, added_ids, removed_ids)
+        # Validators describe our own last origin fetch, which this catalog no longer matches
+        self._fetch_validators.pop(source_url, None)
+        if added_ids or removed_ids:
+            await self._save_snapshot(source_url)
+
+    async def connect(self) -> bool:
+        """Connect the Redis storage pool (and join the refresh leader election if enabled)"""
+        available = await self.redis_storage.connect()
+        if available and self.leader_lease_seconds > 0 and self.catalog_sync is None:
+            self.catalog_sync = CatalogSync(self, self.redis_storage.redis_client, self.leader_lease_seconds,
+                                            self.instance_id)
+            await self.catalog_sync.start()
+        if available and self.queue_coherence and self.invalidations is None:
+            self.invalidations = QueueInvalidations(self, self.redis_storage.redis_client, self.instance_id)
+            await self.invalidations.start()
+        return available
+
+    async def _get_user_queue(self, user_id: int, source_url: Optional[str] = None) -> PersistedQueue:
+        """Get or create a user's queue for a source, with Redis persistence"""
+        source_url = source_url or self.json_url
+
+        # Check if queue exists for this source
+        user_queue = self.user_queues.get_queue(user_id, source_url)
+        if user_queue is not None:
+            if self._warmed and (user_id, source_url) in self._warmed:
+                self._warmed.discard((user_id, source_url))
+                self.warmup_stats["first_access_hits"] += 1
+            return user_queue
+
+        # Evicted but not yet written back: reuse it rather than read stale state
+        user_queue = self._evicting.pop((user_id, source_url), None)
+        if user_queue is not None:
+            self._cache_queue(user_id, source_url, user_queue)
+            return user_queue
+
+        # Try to load from Redis first
+        if self._warmup_pending and (user_id, source_url) in self._warmup_pending:
+            self._warmup_pending.discard((user_id, source_url))
+            self.warmup_stats["first_access_misses"] += 1
+        saved_data = await self.redis_storage.load_user_queue(user_id, source_url)
+
+        # Another interaction for this user may have created the queue while we awaited
+        user_queue = self._lookup_queue(user_id, source_url)
+        if user_queue is not None:
+            return user_queue
+
+        catalog = self._catalog_for(source_url)
+        saved_data = saved_data if isinstance(saved_data, dict) else None
+        restored = self._restore_queue(saved_data, catalog) if saved_data else None
+        if restored:
+            # Restore from Redis
+            logger.info(f"Restored queue for user {user_id} source {source_url} from Redis")
+            self._cache_queue(user_id, source_url, restored)
+            return restored
+
+        # Create new queue for this source
+        logger.info(f"Creating new queue for user {user_id} source {source_url}")
+        user_queue = self._new_queue(catalog)
+        # It replaces whatever unusable state is stored: continue from that revision
+        user_queue.revision = saved_data.get("rev", 0) if saved_data else 0
+        self._cache_queue(user_id, source_url, user_queue)
+        # Save to Redis; another replica may have created one first, then use theirs
+        if not await self._save_user_queue(user_id, source_url):
+            return await self._get_user_queue(user_id, source_url)
+        return user_queue
+
+    def _lookup_queue(self, user_id: int, source_url: str) -> Optional[PersistedQueue]:
+        """In-memory queue, including one evicted but not yet written back (no LRU touch)"""
+        source_queues = self.user_queues.get(user_id)
+        if source_queues and source_url in source_queues:
+            return source_queues[source_url]
+        return self._evicting.get((user_id, source_url))
+
+    def _cache_queue(self, user_id: int, source_url: str, user_queue: PersistedQueue):
+        """Insert a queue into the cache and enforce its bounds"""
+        self.user_queues.put_queue(user_id, source_url, user_queue)
+        self._evict()
+        if self.user_queues.idle_ttl and (self._cache_task is None or self._cache_task.done()):
+            self._cache_task = asyncio.create_task(self._cache_loop())
+
+    def _evict(self):
+        """Evict users over the cache bounds (or idle) and schedule write-back of unsaved progress"""
+        # Without Redis an evicted queue is lost, so only the hard bounds apply
+        evicted = self.user_queues.evict(allow_idle=self.redis_storage.available)
+        if not evicted or not self.redis_storage.available:
+            return
+
+        pending = 0
+        for user_id, source_queues in evicted:
+            for source_url, user_queue in source_queues.items():
+                self._warmed.discard((user_id, source_url))
+                if user_queue.has_pending_write:
+                    self._evicting[(user_id, source_url)] = user_queue
+                    self._dirty.add((user_id, source_url))
+                    pending += 1
+
+        if pending:
+            logger.debug(f"Evicted {len(evicted)} users, writing back {pending} queues")
+            if self.flush_interval > 0:
+                self._ensure_flush_task()
+                self._flush_event.set()
+            elif self._write_back_task is None or self._write_back_task.done():
+                self._write_back_task = asyncio.create_task(self.flush_dirty())
+
+    async def _cache_loop(self):
+        """Background task expiring idle users even when nobody new arrives"""
+        interval = min(60.0, self.user_queues.idle_ttl)
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                self._evict()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                ERRORS.labels("queue_cache").inc()
+                logger.error(f"❌ Error in queue cache task: {e}")
+
+    def get_cache_stats(self) -> dict:
+        """Queue cache size, hit rate and evictions, plus queues awaiting write-back"""
+        stats = self.user_queues.get_stats()
+        stats["pending_write_back"] = len(self._evicting)
+        return stats
+
+    async def warm_up(self, max_age_seconds: float = 3 * 24 * 3600, max_users: int = 10000,
+                      batch_size: int = 500) -> dict:
+        """Preload recently active users' queues from Redis before they click
+
+        Candidates come from the activity index (newest first); their queues
+        are fetched with one pipelined round trip per batch. Queues a user
+        created meanwhile are never overwritten. Sources without a loaded
+        catalog are skipped (their queues still load lazily).
+        """
+        stats = self.warmup_stats
+        start = time.perf_counter()
+        source_keys = {self.redis_storage._get_source_key(url): url for url in self.sources}
+
+        active = await self.redis_storage.get_active_users(max_age_seconds, max_users)
+        candidates = []
+        for user_id, source_key in active:
+            source_url = source_keys.get(source_key)
+            if source_url is None or not len(self._catalog_for(source_url)):
+                stats["skipped"] += 1
+            elif self._lookup_queue(user_id, source_url) is None:
+                candidates.append((user_id, source_url))
+        stats["candidates"] += len(candidates)
+        self._warmup_pending.update(candidates)
+
+        try:
+            await self._warm_up_batches(candidates, batch_size)
+        finally:
+            # Later first accesses are ordinary cache misses, not warm-up misses
+            self._warmup_pending.clear()
+
+        stats["duration_ms"] = (time.perf_counter() - start) * 1000
+        logger.info(f"🔥 Warmed up {stats['loaded']}/{len(candidates)} user queues in {stats['duration_ms']:.1f}ms")
+        return self.get_warmup_stats()
+
+    async def _warm_up_batches(self, candidates: List[Tuple[int, str]], batch_size: int):
+        stats = self.warmup_stats
+        for i in range(0, len(candidates), batch_size):
+            batch = candidates[i:i + batch_size]
+            for (user_id, source_url), saved_data in zip(batch, await self.redis_storage.load_user_queues(batch)):
+                self._warmup_pending.discard((user_id, source_url))
+                if self._lookup_queue(user_id, source_url) is not None:
+                    continue  # The user clicked while we were loading
+                restored = self._restore_queue(saved_data, self._catalog_for(source_url)) if saved_data else None
+                if restored is None:
+                    stats["missing"] += 1
                     continue
-                user_queue = source_queues[self.json_url]
-                original_length = len(user_queue.queue)
-
-                # Filter out removed videos
-                user_queue.queue = [v for v in user_queue.queue if v not in removed_videos]
-
-                # Adjust current index if needed
-                if user_queue.current_index > len(user_queue.queue):
-                    user_queue.current_index = len(user_queue.queue)
-
-                removed_count = original_length - len(user_queue.queue)
-                if removed_count > 0:
-                    self._save_user_queue(user_id)
-                    logger.debug(f"Removed {removed_count} videos from user {user_id}'s queue")
-
-        # Update master list
-        self.all_videos = new_videos
-        logger.info(f"✅ Video list updated: {len(self.all_videos)} total videos")
-
-    def _get_user_queue(self, user_id: int) -> UserQueue:
-        """Get or create a user's queue for current source, with Redis persistence"""
-        # Initialize user's source dict if not exists
-        if user_id not in self.user_queues:
-            self.user_queues[user_id] = {}
-
-        # Check if queue exists for current source
-        if self.json_url not in self.user_queues[user_id]:
-            # Try to load from Redis first
-            saved_data = self.redis_storage.load_user_queue(user_id, self.json_url)
-            if saved_data and isinstance(saved_data, dict):
-                # Restore from Redis
-                queue_data = saved_data.get("queue", [])
-                index = saved_data.get("current_index", 0)
-                logger.info(f"Restored queue for user {user_id} source {self.json_url} from Redis")
-                self.user_queues[user_id][self.json_url] = UserQueue(self.all_videos, queue_data, index)
+                self._cache_queue(user_id, source_url, restored)
+                self._warmed.add((user_id, source_url))
+                stats["loaded"] += 1
+
+    def get_warmup_stats(self) -> dict:
+        """Warm-up counters plus the share of candidates' first accesses served from warmed queues"""
+        stats = dict(self.warmup_stats)
+        candidates = stats["candidates"]
+        first_accesses = stats["first_access_hits"] + stats["first_access_misses"]
+        stats["load_rate"] = stats["loaded"] / candidates if candidates else 0.0
+        stats["hit_rate"] = stats["first_access_hits"] / first_accesses if first_accesses else 0.0
+        return stats
+
+    def _new_queue(self, catalog: Catalog):
+        """Create a fresh queue in the configured mode"""
+        if self.queue_mode == PermutationQueue.MODE:
+            return PermutationQueue(catalog)
+        return UserQueue(catalog)
+
+    def _restore_queue(self, saved_data: dict, catalog: Catalog):
+        """Rebuild a queue from Redis data; None if it was saved in another mode"""
+        saved_mode = saved_data.get("mode", "shuffle")
+        if saved_mode != self.queue_mode:
+            return None
+
+        try:
+            index = saved_data.get("current_index", 0)
+            if saved_mode == PermutationQueue.MODE:
+                user_queue = PermutationQueue.from_dict(catalog, saved_data)
+            elif "ids" in saved_data:
+                user_queue = UserQueue(catalog, unpack_ids(saved_data["ids"]), index)
+            else:
+                # Legacy layout stored URL lists: map them onto IDs and rewrite packed on next save
+                ids = [catalog.ids[url] for url in saved_data.get("queue", []) if url in catalog.ids]
+                user_queue = UserQueue(catalog, ids, index)
+                user_queue.body_dirty = True
+
+            # Bring the queue up to date with the catalog, keeping the user's progress
+            if not user_queue.restore_sync(catalog, saved_data.get("catalog")):
+                logger.warning("Saved queue uses IDs from another catalog, starting a new queue")
+                return None
+            user_queue.revision = int(saved_data.get("rev", 0))
+            return user_queue
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Discarding malformed saved queue: {e}")
+            return None
+
+    async def _save_user_queue(self, user_id: int, source_url: Optional[str] = None) -> bool:
+        """Save user queue for a source (current source by default) to Redis
+
+        With write-behind enabled this only marks the queue dirty; the flush
+        loop persists it within flush_interval seconds. With coherence every
+        write is conditional on the revision this copy was loaded at; returns
+        False only if another replica changed the queue since, in which case
+        nothing was written and the copy has been dropped (the caller
+        reloads it). A deferred write finds that out only at the flush, after
+        the stale pick was served.
+        """
+        source_url = source_url or self.json_url
+        if self.flush_interval > 0:
+            self._mark_dirty(user_id, source_url)
+            return True
+
+        user_queue = self._lookup_queue(user_id, source_url)
+        if user_queue is None or not self.redis_storage.available:
+            return True
+
+        # Rewrite the body only when it changed; otherwise HINCRBY the cursor
+        full, delta = user_queue.take_pending_write()
+        if full is None and not delta:
+            return True
+        if self.queue_coherence:
+            # Absolute cursor: a conditional write must not depend on the stored one
+            queue = full if full is not None else {"current_index": user_queue.position}
+            revision = await self.redis_storage.save_user_queue(user_id, queue, source_url,
+                                                                expected_rev=user_queue.revision)
+        elif full is not None:
+            revision = await self.redis_storage.save_user_queue(user_id, full, source_url)
+        else:
+            result = await self.redis_storage.advance_user_cursor(user_id, source_url, delta)
+            revision = result[1] if result else None
+
+        if revision is None:
+            # Our revision stays put: if the write did land, the next one conflicts and reloads it
+            user_queue.body_dirty = True
+            return True
+        return self._check_revision(user_id, source_url, user_queue, revision)
+
+    def _check_revision(self, user_id: int, source_url: str, user_queue: PersistedQueue, revision: int) -> bool:
+        """Adopt the revision a write produced; REV_CONFLICT means another replica wrote first
+
+        A conflicting write never landed, so the stored state is intact and
+        newer than our copy: drop the copy so the next access reloads it.
+        """
+        if revision != REV_CONFLICT:
+            user_queue.revision = revision
+            return True
+
+        self.coherence_stats["conflicts"] += 1
+        logger.info(f"🔀 Queue of user {user_id} source {source_url} was changed by another replica, reloading")
+        self._drop_queue(user_id, source_url)
+        return False
+
+    def _drop_queue(self, user_id: int, source_url: str) -> bool:
+        """Forget the in-memory copy of a queue (it is reloaded from Redis on next use)"""
+        dropped = self.user_queues.discard_queue(user_id, source_url)
+        dropped = (self._evicting.pop((user_id, source_url), None) is not None) or dropped
+        self._dirty.discard((user_id, source_url))
+        self._warmed.discard((user_id, source_url))
+        return dropped
+
+    def invalidate_queue(self, user_id: int, source_url: str) -> bool:
+        """Another replica wrote this queue: drop our copy; returns whether one was cached
+
+        Unsaved local progress on it is discarded: the stored state wins.
+        """
+        if not self._drop_queue(user_id, source_url):
+            return False
+        self.coherence_stats["invalidated"] += 1
+        logger.debug(f"Invalidated cached queue of user {user_id} source {source_url}")
+        return True
+
+    def get_coherence_stats(self) -> dict:
+        """Conflicting writes detected, copies invalidated by other replicas and clicks served again"""
+        stats = dict(self.coherence_stats)
+        if self.invalidations:
+            stats.update({f"messages_{key}": value for key, value in self.invalidations.get_stats().items()})
+        return stats
+
+    def _mark_dirty(self, user_id: int, source_url: str):
+        """Queue a user's state for the next write-behind flush"""
+        if not self.redis_storage.available:
+            return
+
+        self._dirty.add((user_id, source_url))
+        self._ensure_flush_task()
+        if len(self._dirty) >= self.flush_threshold:
+            self._flush_event.set()
+
+    def _ensure_flush_task(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Background task flushing dirty queues every interval or at the dirty threshold"""
+        # The flag (not only cancel()) ends the loop: on Python 3.11 wait_for can
+        # swallow a cancellation that races with the event being set
+        while not self._closing:
+            try:
+                try:
+                    await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_event.clear()
+                await self.flush_dirty()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                ERRORS.labels("flush").inc()
+                logger.error(f"❌ Error in write-behind flush task: {e}")
+
+    async def flush_dirty(self) -> int:
+        """Persist all dirty queues with pipelined batches; returns number of queues written
+
+        Pending source choices are stored afterwards, one round trip per
+        round of choices made in the meantime.
+        """
+        async with self._flush_lock:
+            written = await self._flush_queues()
+            while self._pending_sources and await self._flush_sources():
+                pass
+            return written
+
+    async def _flush_queues(self) -> int:
+        if not self._dirty:
+            return 0
+
+        dirty, self._dirty = self._dirty, set()
+        entries = []
+        expected_revs = []
+        for user_id, source_url in dirty:
+            user_queue = self._lookup_queue(user_id, source_url)
+            if user_queue is None:
+                continue
+            full, delta = user_queue.take_pending_write()
+            if full is not None:
+                entries.append((user_id, source_url, full))
+            elif delta:
+                # Absolute cursor (HSET) keeps batch retries idempotent
+                entries.append((user_id, source_url, {"current_index": user_queue.position}))
             else:
-                # Create new queue for this source
-                logger.info(f"Creating new queue for user {user_id} source {self.json_url}")
-                self.user_queues[user_id][self.json_url] = UserQueue(self.all_videos)
-                # Save to Redis
-                self._save_user_queue(user_id)
+                continue
+            expected_revs.append(user_queue.revision)
+
+        start = time.perf_counter()
+        written = 0
+        i = 0
+        try:
+            for i in range(0, len(entries), self.FLUSH_BATCH_SIZE):
+                batch = entries[i:i + self.FLUSH_BATCH_SIZE]
+                # With coherence only entries still at their loaded revision are written
+                batch_revs = expected_revs[i:i + self.FLUSH_BATCH_SIZE] if self.queue_coherence else None
+                revisions = await self.redis_storage.save_user_queues(batch, batch_revs)
+                if revisions is not None:
+                    written += sum(revision != REV_CONFLICT for revision in revisions)
+                    for (user_id, source_url, _), revision in zip(batch, revisions):
+                        user_queue = self._lookup_queue(user_id, source_url)
+                        if user_queue is not None:
+                            self._check_revision(user_id, source_url, user_queue, revision)
+                        # Written-back evicted queues can now be dropped for good
+                        self._evicting.pop((user_id, source_url), None)
+                else:
+                    # Keep failed entries dirty so the next flush retries them
+                    self._requeue_failed(batch)
+                    self.flush_stats["failed_flushes"] += 1
+        except asyncio.CancelledError:
+            # Re-queue everything not confirmed written (rewrites are idempotent)
+            self._requeue_failed(entries[i:])
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        stats = self.flush_stats
+        stats["flushes"] += 1
+        stats["queues_flushed"] += written
+        stats["last_flush_size"] = written
+        stats["max_flush_size"] = max(stats["max_flush_size"], written)
+        stats["last_flush_ms"] = elapsed_ms
+        stats["max_flush_ms"] = max(stats["max_flush_ms"], elapsed_ms)
+        stats["total_flush_ms"] += elapsed_ms
+        logger.debug(f"Flushed {written} dirty queues in {elapsed_ms:.1f}ms")
+        return written
+
+    async def _flush_sources(self) -> bool:
+        choices, self._pending_sources = self._pending_sources, {}
+        saved = False
+        try:
+            saved = await self.redis_storage.save_user_sources(choices)
+        finally:
+            if not saved:
+                # Retried on the next flush; choices made meanwhile are newer
+                self._pending_sources = {**choices, **self._pending_sources}
+        return saved
+
+    def _requeue_failed(self, entries: List[Tuple[int, str, dict]]):
+        """Mark unwritten queues dirty again, forcing a full rewrite on the next flush"""
+        for user_id, source_url, _ in entries:
+            user_queue = self._lookup_queue(user_id, source_url)
+            if user_queue is not None:
+                user_queue.body_dirty = True
+            self._dirty.add((user_id, source_url))
 
-        return self.user_queues[user_id][self.json_url]
+    def get_flush_stats(self) -> dict:
+        """Write-behind counters: flush sizes, latency and pending dirty queues"""
+        stats = dict(self.flush_stats)
+        stats["pending"] = len(self._dirty)
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
 
-    def _save_user_queue(self, user_id: int):
-        """Save user queue for current source to Redis"""
-        if user_id in self.user_queues and self.json_url in self.user_queues[user_id]:
-            queue_data = self.user_queues[user_id][self.json_url].to_dict()
-            self.redis_storage.save_user_queue(user_id, queue_data, self.json_url)
+    def source_for(self, user_id: int) -> str:
+        """The user's selected source, or the default source"""
+        source_url = self.user_queues.get_source(user_id)
+        return source_url if source_url in self.sources else self.json_url
+
+    async def restore_source(self, user_id: int) -> str:
+        """The user's selected source, read back from Redis if this process does not know it
+
+        The choice is cached with the user's queues, so it is unknown after
+        an eviction, a restart or on another replica.
+        """
+        if not self.user_queues.has_source(user_id) and self.redis_storage.available:
+            if user_id in self._pending_sources:
+                source_url = self._pending_sources[user_id]
+            else:
+                source_key = await self.redis_storage.load_user_source(user_id)
+                source_keys = {self.redis_storage._get_source_key(url): url for url in self.sources}
+                source_url = source_keys.get(source_key)
+            # A switch made while we awaited wins
+            if not self.user_queues.has_source(user_id):
+                self.user_queues.set_source(user_id, None if source_url in (None, self.json_url) else source_url)
+                self._evict()
+        return self.source_for(user_id)
 
-    def get_next_video(self, user_id: int) -> Optional[str]:
+    @timed(NEXT_VIDEO_SECONDS.labels())
+    async def get_next_video(self, user_id: int, source_url: Optional[str] = None) -> Optional[str]:
         """Get next video from user's queue, reshuffle when queue is exhausted"""
-        if not self.all_videos:
+        # Pin the source so a concurrent switch cannot redirect this request mid-await
+        source_url = source_url or await self.restore_source(user_id)
+        catalog = self._catalog_for(source_url)
+        if not len(catalog):
             logger.warning("No videos available")
             return None
 
-        user_queue = self._get_user_queue(user_id)
+        for attempt in range(self.MAX_CONFLICT_RETRIES + 1):
+            user_queue = await self._get_user_queue(user_id, source_url)
 
-        # If user has played all videos, start a new round
-        if user_queue.current_index >= len(user_queue.queue):
-            logger.info(f"User {user_id} queue exhausted, starting new shuffle round")
-            user_queue.queue = self.all_videos.copy()
-            random.shuffle(user_queue.queue)
-            user_queue.current_index = 0
+            # Apply catalog changes made since this queue was last used
+            if user_queue.sync(catalog):
+                logger.debug(f"User {user_id} queue caught up to catalog version {catalog.version}")
 
-        video_url = user_queue.queue[user_queue.current_index]
-        user_queue.current_index += 1
+            # If user has played all videos, a new round starts inside next_video()
+            if user_queue.exhausted:
+                logger.info(f"User {user_id} queue exhausted, starting new shuffle round")
 
-        # Save to Redis after each video selection
-        self._save_user_queue(user_id)
+            video_url = self._skip_dead_links(user_queue, catalog, user_queue.next_video(catalog))
 
-        logger.debug(f"User {user_id} - Next video ({user_queue.current_index}/{len(user_queue.queue)}): {video_url}")
+            # Save to Redis after each video selection. If another replica advanced
+            # the queue meanwhile, our pick came from a stale cursor and was not
+            # written: pick again from the stored state
+            if await self._save_user_queue(user_id, source_url):
+                break
+            self.coherence_stats["retried_clicks"] += 1
+
+        if self.link_checker:
+            # The served link too: if it is dead, the next round (and other users) skip it
+            upcoming = user_queue.upcoming(catalog, self.prefetch_ahead)
+            self.link_checker.schedule([video_url, *upcoming] if video_url else upcoming)
+
+        logger.debug(f"User {user_id} - Next video ({user_queue.position}/{user_queue.queue_size}): {video_url}")
+        return video_url
+
+    def _skip_dead_links(self, user_queue: PersistedQueue, catalog: Catalog, video_url: Optional[str]) -> Optional[str]:
+        """Advance past videos the prefetcher found dead (bounded, so a dead catalog still serves)"""
+        checker = self.link_checker
+        if checker is None:
+            return video_url
+        for _ in range(self.MAX_DEAD_SKIPS):
+            if video_url is None or not checker.is_dead(video_url):
+                break
+            logger.debug(f"Skipping dead link {video_url}")
+            checker.record_skip()
+            DEAD_LINKS_SKIPPED.labels().inc()
+            video_url = user_queue.next_video(catalog)
         return video_url
 
     @staticmethod
     def extract_filename(url: str) -> str:
         """Extract and decode filename from URL"""
-        try:
-            # Get the last part of URL (filename)
-            filename = url.split('/')[-1]
-            # Decode URL encoding
-            decoded = unquote(filename)
-            return decoded
-        except Exception as e:
-            logger.error(f"Error extracting filename from {url}: {e}")
-            return "视频.mp4"
+        return extract_filename(url)
 
-    async def switch_source(self, new_json_url: str) -> bool:
-        """Switch to a different video source"""
-        logger.info(f"Switching video source to: {new_json_url}")
-        self.json_url = new_json_url
-        return await self.fetch_videos()
+    def video_message(self, video_url: str, source_url: Optional[str] = None) -> str:
+        """Precomputed message body for a video of a source (default source if omitted)"""
+        return self._catalog_for(source_url or self.json_url).message(video_url)
 
-    async def start_auto_refresh(self, interval_minutes: int = 10):
-        """Start automatic video list refresh task
+    def switch_source(self, user_id: int, source_url: str) -> bool:
+        """Switch one user to another resident source (in memory, no refetch)"""
+        if source_url not in self.sources:
+            logger.warning(f"User {user_id} asked for unknown source: {source_url}")
+            return False
+
+        choice = None if source_url == self.json_url else source_url
+        if not self.user_queues.has_source(user_id) or self.user_queues.get_source(user_id) != choice:
+            self._persist_source(user_id, choice)
+        self.user_queues.set_source(user_id, choice)
+        self._evict()
+        logger.debug(f"User {user_id} switched to source {source_url}")
+        return True
+
+    def _persist_source(self, user_id: int, source_url: Optional[str]):
+        """Store a changed source choice in the background (with the next flush under write-behind)"""
+        if not self.redis_storage.available:
+            return
+
+        self._pending_sources[user_id] = source_url
+        if self.flush_interval > 0:
+            self._ensure_flush_task()
+        elif self._write_back_task is None or self._write_back_task.done():
+            self._write_back_task = asyncio.create_task(self.flush_dirty())
+
+    async def start_auto_refresh(self, interval_minutes: Optional[float] = None):
+        """Start one refresh task per source, each on its own schedule
 
         Args:
-            interval_minutes: Refresh interval in minutes (default: 10)
+            interval_minutes: Override every source's refresh_minutes (default: per-source setting)
         """
-        if self._refresh_task and not self._refresh_task.done():
-            logger.warning("Auto-refresh task already running")
-            return
+        for source_url, source in self.source_configs.items():
+            task = self._refresh_tasks.get(source_url)
+            if task and not task.done():
+                logger.warning(f"Auto-refresh task already running for {source.name}")
+                continue
+
+            minutes = interval_minutes or source.refresh_minutes
+            logger.info(f"🔄 Starting auto-refresh task for {source.name} (every {minutes:g} minutes)")
+            self._refresh_tasks[source_url] = asyncio.create_task(self._auto_refresh_loop(source_url, minutes))
 
-        logger.info(f"🔄 Starting auto-refresh task (every {interval_minutes} minutes)")
-        self._refresh_task = asyncio.create_task(self._auto_refresh_loop(interval_minutes))
+    async def _auto_refresh_loop(self, source_url: str, interval_minutes: float):
+        """Background task to refresh one source's video list periodically
 
-    async def _auto_refresh_loop(self, interval_minutes: int):
-        """Background task to refresh video list periodically"""
+        Sources refresh independently: a slow or failing source only delays
+        itself (and holds at most one fetch slot until its timeout).
+        """
         interval_seconds = interval_minutes * 60
 
         while True:
             try:
                 await asyncio.sleep(interval_seconds)
-                logger.info("🔄 Auto-refreshing video list...")
-                success = await self.fetch_videos(merge_new=True)
+                logger.info(f"🔄 Auto-refreshing video list: {source_url}")
+                success = await self.fetch_videos(merge_new=True, source_url=source_url)
 
                 if success:
-                    logger.info("✅ Auto-refresh completed successfully")
+                    logger.info(f"✅ Auto-refresh completed successfully: {source_url}")
                 else:
-                    logger.warning("⚠️  Auto-refresh failed, will retry next interval")
+                    logger.warning(f"⚠️  Auto-refresh failed for {source_url}, will retry next interval")
 
             except asyncio.CancelledError:
-                logger.info("🛑 Auto-refresh task cancelled")
+                logger.info(f"🛑 Auto-refresh task cancelled: {source_url}")
                 break
             except Exception as e:
-                logger.error(f"❌ Error in auto-refresh task: {e}")
+                ERRORS.labels("refresh").inc()
+                logger.error(f"❌ Error in auto-refresh task for {source_url}: {e}")
                 # Continue the loop even if there's an error
 
     def stop_auto_refresh(self):
-        """Stop the automatic refresh task"""
-        if self._refresh_task and not self._refresh_task.done():
-            self._refresh_task.cancel()
-            logger.info("🛑 Stopped auto-refresh task")
+        """Stop all automatic refresh tasks"""
+        tasks, self._refresh_tasks = self._refresh_tasks, {}
+        running = [task for task in tasks.values() if not task.done()]
+        for task in running:
+            task.cancel()
+        if running:
+            logger.info(f"🛑 Stopped {len(running)} auto-refresh task(s)")
+
+    def get_source_status(self) -> List[dict]:
+        """Per-source catalog size, refresh settings, health and last refresh times"""
+        status = []
+        for source_url, source in self.source_configs.items():
+            health = self.source_health.setdefault(source_url, SourceHealth())
+            status.append({
+                "name": source.name,
+                "label": source.label,
+                "url": source_url,
+                "videos": len(self._catalog_for(source_url)),
+                "refresh_minutes": source.refresh_minutes,
+                "timeout": source.timeout,
+                **health.to_dict()
+            })
+        return status
+
+    async def close(self):
+        """Stop background tasks, flush pending writes and release the HTTP session and Redis pool"""
+        self.stop_auto_refresh()
+        if self.catalog_sync:
+            await self.catalog_sync.stop()
+        if self.invalidations:
+            await self.invalidations.stop()
+
+        if self.link_checker:
+            await self.link_checker.close()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+        if self._cache_task and not self._cache_task.done():
+            self._cache_task.cancel()
+
+        self._closing = True
+        self._flush_event.set()
+        for task in (self._flush_task, self._write_back_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        # Force a final flush so write-behind never loses acknowledged progress
+        await self.flush_dirty()
+        if self._dirty:
+            logger.warning(f"⚠️  {len(self._dirty)} queues could not be flushed on shutdown")
+        if self._pending_sources:
+            logger.warning(f"⚠️  {len(self._pending_sources)} source choices could not be saved on shutdown")
+
+        await self.redis_storage.close()
+        for catalog in self.catalogs.values():
+            catalog.close()
 
     def get_queue_status(self, user_id: int) -> dict:
-        """Get user's queue status for current source"""
-        if user_id not in self.user_queues or self.json_url not in self.user_queues[user_id]:
+        """Get user's queue status for their current source"""
+        source_url = self.source_for(user_id)
+        catalog = self._catalog_for(source_url)
+        user_queue = self._lookup_queue(user_id, source_url)
+        if user_queue is None:
             return {
-                "total_videos": len(self.all_videos),
+                "total_videos": len(catalog),
                 "queue_size": 0,
                 "current_position": 0,
-                "videos_remaining": len(self.all_videos)
+                "videos_remaining": len(catalog)
             }
 
-        user_queue = self.user_queues[user_id][self.json_url]
+        user_queue.sync(catalog)
         return {
-            "total_videos": len(self.all_videos),
-            "queue_size": len(user_queue.queue),
-            "current_position": user_queue.current_index,
-            "videos_remaining": len(user_queue.queue) - user_queue.current_index
+            "total_videos": len(catalog),
+            "queue_size": user_queue.queue_size,
+            "current_position": user_queue.position,
+            "videos_remaining": user_queue.queue_size - user_queue.position
         }
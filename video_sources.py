@@ -0,0 +1,111 @@
+"""
+Video source definitions and per-source refresh health
+"""
+import json
+import logging
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_MINUTES = 10
+DEFAULT_TIMEOUT_SECONDS = 30
+# Names are encoded in button custom_ids (max 100 characters, with prefix and user ID)
+MAX_NAME_LENGTH = 64
+
+
+class VideoSource:
+    """One configured video catalog with its own refresh schedule"""
+
+    def __init__(self, name: str, url: str, label: Optional[str] = None, emoji: Optional[str] = None,
+                 refresh_minutes: float = DEFAULT_REFRESH_MINUTES, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        if not name or not url:
+            raise ValueError("Video source needs a name and a url")
+        if len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f"Video source name '{name}' is longer than {MAX_NAME_LENGTH} characters")
+        if refresh_minutes <= 0 or timeout <= 0:
+            raise ValueError(f"Video source '{name}' needs a positive refresh_minutes and timeout")
+
+        self.name = name
+        self.url = url
+        self.label = label or name
+        self.emoji = emoji
+        self.refresh_minutes = float(refresh_minutes)
+        self.timeout = float(timeout)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VideoSource":
+        return cls(
+            name=data.get("name"),
+            url=data.get("url"),
+            label=data.get("label"),
+            emoji=data.get("emoji"),
+            refresh_minutes=float(data.get("refresh_minutes", DEFAULT_REFRESH_MINUTES)),
+            timeout=float(data.get("timeout", DEFAULT_TIMEOUT_SECONDS))
+        )
+
+    def __repr__(self):
+        return f"VideoSource({self.name}, {self.url}, every {self.refresh_minutes:g}min)"
+
+
+class SourceHealth:
+    """Outcome of a source's recent refreshes"""
+
+    def __init__(self):
+        self.last_refresh: Optional[float] = None  # Wall-clock time of the last attempt
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.last_duration_ms = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.last_success is not None and self.consecutive_failures == 0
+
+    def record_success(self, duration_ms: float):
+        self.last_refresh = self.last_success = time.time()
+        self.last_error = None
+        self.consecutive_failures = 0
+        self.last_duration_ms = duration_ms
+
+    def record_failure(self, error: str, duration_ms: float):
+        self.last_refresh = time.time()
+        self.last_error = error
+        self.consecutive_failures += 1
+        self.last_duration_ms = duration_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "last_refresh": self.last_refresh,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "last_duration_ms": self.last_duration_ms
+        }
+
+
+def default_sources(video_json_url: str, streamable_json_url: Optional[str]) -> List[VideoSource]:
+    """The two built-in sources (VIDEO_JSON_URL / STREAMABLE_JSON_URL)"""
+    sources = [VideoSource("default", video_json_url, label="默认源", emoji="📹")]
+    if streamable_json_url and streamable_json_url != video_json_url:
+        sources.append(VideoSource("streamable", streamable_json_url, label="Streamable源", emoji="💻"))
+    return sources
+
+
+def parse_sources(raw: str) -> List[VideoSource]:
+    """Parse VIDEO_SOURCES: a JSON list of source objects; the first one is the default
+
+    Each object needs "name" and "url" and may set "label", "emoji",
+    "refresh_minutes" and "timeout" (seconds).
+    """
+    data = json.loads(raw)
+    if not isinstance(data, list) or not data:
+        raise ValueError("VIDEO_SOURCES must be a non-empty JSON list")
+
+    sources = [VideoSource.from_dict(item) for item in data]
+    names = [source.name for source in sources]
+    urls = [source.url for source in sources]
+    if len(set(names)) != len(names) or len(set(urls)) != len(urls):
+        raise ValueError("VIDEO_SOURCES names and urls must be unique")
+    return sources